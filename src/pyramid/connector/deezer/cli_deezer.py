@@ -1,7 +1,12 @@
 import abc
 import asyncio
+import json
+import logging
 import time
 from abc import ABC
+from collections import deque
+from contextvars import ContextVar
+from enum import IntEnum
 from typing import Any, Generic, Literal, Self
 from urllib.parse import parse_qs, urlparse
 
@@ -10,34 +15,138 @@ from deezer import Album, Artist, Client, Playlist, Resource, Track
 from deezer.exceptions import DeezerAPIException, DeezerErrorResponse
 from deezer.pagination import ResourceType
 
+from pyramid.connector.deezer.response_cache import ResponseCache
+from pyramid.tools.http_session import PooledSession
+from pyramid.tools.single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+
+class RequestPriority(IntEnum):
+	# Requests a user is waiting for, as a search
+	INTERACTIVE = 0
+	# Requests made in numbers, as the resolution of a playlist
+	BULK = 1
+
+
+# Priority of the requests sent by the current task
+request_priority: ContextVar[RequestPriority] = ContextVar(
+	"request_priority", default=RequestPriority.INTERACTIVE
+)
+
 
 class AsyncRateLimiter:
-	def __init__(self, max_requests, time_interval):
-		self.max_requests = max_requests
-		self.time_interval = time_interval
-		self.requests: list[float] = []
-		self.lock = asyncio.Lock()
+	"""
+	Sliding window limiter, allowing `max_requests` per `time_interval` seconds.
 
-	def _clean_old_requests(self):
-		current_time = time.time()
-		self.requests = [t for t in self.requests if self.time_interval > current_time - t]
+	A slot is reserved when `check` returns, before the request is sent. Requests
+	waiting for a slot are served in FIFO order, interactive ones before bulk ones.
+	After a rate limit error, no slot is given for a backoff time which doubles on each
+	error and is reset once requests pass again.
+	"""
 
-	async def _wait_if_needed(self):
-		async with self.lock:
-			self._clean_old_requests()
-			if len(self.requests) >= self.max_requests:
-				sleep_time = self.requests[0] + self.time_interval - time.time()
-				if sleep_time > 0:
-					# logging.warning("Detect Deezer RateLimit - wait %f secs", sleep_time)
-					await asyncio.sleep(sleep_time)
-					self._clean_old_requests()
+	def __init__(
+		self,
+		max_requests: int,
+		time_interval: float,
+		min_backoff: float = 1,
+		max_backoff: float = 30,
+	):
+		self.max_requests = max_requests
+		self.time_interval = time_interval
+		self.min_backoff = min_backoff
+		self.max_backoff = max_backoff
+		self.backoff = 0.0
+		self.penalties = 0
+		self.__requests: deque[float] = deque()
+		self.__waiters: dict[RequestPriority, deque[asyncio.Future]] = {
+			priority: deque() for priority in RequestPriority
+		}
+		self.__blocked_until = 0.0
+		self.__timer: asyncio.TimerHandle | None = None
+
+	async def check(self, priority: RequestPriority | None = None):
+		if priority is None:
+			priority = request_priority.get()
+		if not self.__has_waiters() and self.__acquire(time.monotonic()):
+			return
+
+		future = asyncio.get_running_loop().create_future()
+		self.__waiters[priority].append(future)
+		self.__schedule()
+		try:
+			await future
+		except asyncio.CancelledError:
+			if future in self.__waiters[priority]:
+				self.__waiters[priority].remove(future)
+			raise
+
+	def available(self) -> int:
+		"""
+		Number of requests which can be sent now without waiting.
+		"""
+		now = time.monotonic()
+		if self.__has_waiters() or now < self.__blocked_until:
+			return 0
+		self.__prune(now)
+		return max(0, self.max_requests - len(self.__requests))
 
-	async def check(self):
-		await self._wait_if_needed()
+	def penalize(self):
+		"""
+		Called when the API answers that the rate limit is exceeded.
+		"""
+		now = time.monotonic()
+		self.penalties += 1
+		if now < self.__blocked_until:
+			# Answer to a request sent before the current backoff
+			return
+		self.backoff = min(self.max_backoff, self.backoff * 2 if self.backoff else self.min_backoff)
+		self.__blocked_until = now + self.backoff
+
+	def __has_waiters(self) -> bool:
+		return any(self.__waiters.values())
+
+	def __prune(self, now: float):
+		while self.__requests and now - self.__requests[0] >= self.time_interval:
+			self.__requests.popleft()
+
+	def __acquire(self, now: float) -> bool:
+		if now < self.__blocked_until:
+			return False
+		if self.backoff and now - self.__blocked_until >= self.time_interval:
+			# A whole window has passed without error since the last one
+			self.backoff = 0.0
+		self.__prune(now)
+		if len(self.__requests) >= self.max_requests:
+			return False
+		self.__requests.append(now)
+		return True
+
+	def __schedule(self):
+		if self.__timer is not None:
+			return
+		now = time.monotonic()
+		for priority in RequestPriority:
+			waiters = self.__waiters[priority]
+			while waiters:
+				if waiters[0].done():
+					waiters.popleft()
+					continue
+				if not self.__acquire(now):
+					self.__wait(now)
+					return
+				waiters.popleft().set_result(None)
+
+	def __wait(self, now: float):
+		if now < self.__blocked_until:
+			delay = self.__blocked_until - now
+		else:
+			delay = self.__requests[0] + self.time_interval - now
+		self.__timer = asyncio.get_running_loop().call_later(max(0, delay), self.__wake)
 
-	async def add(self):
-		async with self.lock:
-			self.requests.append(time.time())
+	def __wake(self):
+		self.__timer = None
+		self.__schedule()
 
 
 class ACliDeezer(ABC):
@@ -56,6 +165,9 @@ class ACliDeezer(ABC):
 
 
 class CliPaginatedList(Generic[ResourceType]):
+	# Number of elements of a page when no limit is requested
+	DEFAULT_LIMIT = 25
+
 	def __init__(
 		self,
 		client: ACliDeezer,
@@ -70,6 +182,7 @@ class CliPaginatedList(Generic[ResourceType]):
 		self.__next_params: dict[str, Any] = params
 		self.__parent = parent
 		self.__total: int | None = None
+		self.__iterated = False
 
 	async def get_first(self) -> ResourceType | None:
 		return await self.get_single(0)
@@ -94,12 +207,51 @@ class CliPaginatedList(Generic[ResourceType]):
 
 		return elements
 
-	async def get_all(self) -> list[ResourceType]:
-		elements: list[ResourceType] = []
+	async def get_all(self, max_in_flight: int = 4) -> list[ResourceType]:
+		"""
+		Get all the elements, in order.
 
-		while self._could_grow():
+		Once the first page gives the total, the other pages are requested at the same time
+		by their index, within the rate limiter of the client.
+
+		:param max_in_flight: Maximum number of pages requested at the same time.
+		"""
+		if 1 > max_in_flight:
+			raise ValueError("max_in_flight can't be less than 1. (%d received)", max_in_flight)
+
+		elements: list[ResourceType] = []
+		# The offsets are only known from the start of the list
+		from_start = not self.__iterated
+		if self._could_grow():
 			elements.extend(await self._async_fetch_next_page())
 
+		total = self.__total
+		if max_in_flight == 1 or not from_start or total is None or not elements:
+			while self._could_grow():
+				elements.extend(await self._async_fetch_next_page())
+			return elements
+		if not self._could_grow():
+			return elements
+
+		# Pages can have less elements than requested, their offsets follow the limit
+		page_size = int(self.__base_params.get("limit", self.DEFAULT_LIMIT))
+		semaphore = asyncio.Semaphore(max_in_flight)
+
+		async def fetch_page(index: int) -> list[ResourceType]:
+			async with semaphore:
+				return await self._req(False, {"index": index, "limit": page_size})
+
+		tasks = [
+			asyncio.create_task(fetch_page(index)) for index in range(page_size, total, page_size)
+		]
+		try:
+			for task in tasks:
+				elements.extend(await task)
+		finally:
+			for task in tasks:
+				task.cancel()
+		self.__next_path = None
+
 		return elements
 
 	async def get_page(self, item_per_page: int, page: int):
@@ -136,6 +288,7 @@ class CliPaginatedList(Generic[ResourceType]):
 		return self.__next_path is not None
 
 	async def _async_fetch_next_page(self) -> list[ResourceType]:
+		self.__iterated = True
 		return await self._req(True)
 
 	async def _req(
@@ -181,7 +334,19 @@ class CliPaginatedList(Generic[ResourceType]):
 
 
 class CliDeezer(ACliDeezer, Client):
-	def __init__(self, app_id=None, app_secret=None, access_token=None, headers=None, **kwargs):
+	def __init__(
+		self,
+		app_id=None,
+		app_secret=None,
+		access_token=None,
+		headers=None,
+		limit: int = 100,
+		limit_per_host: int = 10,
+		keepalive_timeout: float = 30,
+		ttl_dns_cache: int | None = 300,
+		response_cache: ResponseCache | None = None,
+		**kwargs,
+	):
 		# super().__init__(app_id, app_secret, access_token, headers, **kwargs)
 
 		self.app_id = app_id
@@ -192,8 +357,17 @@ class CliDeezer(ACliDeezer, Client):
 		# headers = headers or {}
 		# self.session.headers.update(headers)
 		# self.session.close()
-		# self.async_session = aiohttp.ClientSession()
+		self.async_session = PooledSession(
+			limit=limit,
+			limit_per_host=limit_per_host,
+			keepalive_timeout=keepalive_timeout,
+			ttl_dns_cache=ttl_dns_cache,
+			headers=headers,
+		)
 		self.rate_limiter = AsyncRateLimiter(max_requests=50, time_interval=5)
+		# Public lookups are the same for every guild, they are shared for a while
+		self.response_cache = response_cache if response_cache is not None else ResponseCache()
+		self.in_flight = SingleFlight()
 
 		def get_paginated_list(
 			self,
@@ -339,26 +513,29 @@ class CliDeezer(ACliDeezer, Client):
 		if self.access_token is not None:
 			params["access_token"] = str(self.access_token)
 
-		async with aiohttp.ClientSession() as session:
-			await self.rate_limiter.check()
-			async with session.request(
-				method,
-				f"{self.base_url}/{path}",
-				params=params,
-			) as response:
-				await self.rate_limiter.add()
-				try:
-					response.raise_for_status()
-				except aiohttp.ClientResponseError as exc:
-					raise CliDeezerHTTPError.from_status_code(exc) from exc
-
-				json_data = await response.json()
+		cache_key = None
+		if method != "GET":
+			body = await self.__fetch(method, path, params)
+		else:
+			key = ResponseCache.key(method, path, params)
+			body = self.response_cache.get(key) if self.response_cache is not None else None
+			if body is None:
+				cache_key = key
+				# Identical requests sent at the same time share the same response
+				body = await self.in_flight.run(key, lambda: self.__fetch(method, path, params))
+
+		json_data = json.loads(body)
+		if cache_key is not None and self.response_cache is not None:
+			self.__cache_response(cache_key, body, json_data)
 
 		if not isinstance(json_data, dict):
 			return json_data
 
 		if "error" in json_data and json_data["error"]:
-			raise CliDeezerErrorResponse.from_body(json_data)
+			error = CliDeezerErrorResponse.from_body(json_data)
+			if isinstance(error, CliDeezerRateLimitError):
+				self.rate_limiter.penalize()
+			raise error
 
 		return self._process_json(
 			json_data,
@@ -368,6 +545,39 @@ class CliDeezer(ACliDeezer, Client):
 			paginate_list=paginate_list,
 		)
 
+	async def __fetch(self, method: str, path: str, params: dict[str, Any]) -> bytes:
+		session = self.async_session.get()
+		await self.rate_limiter.check()
+		async with session.request(
+			method,
+			f"{self.base_url}/{path}",
+			params=params,
+		) as response:
+			try:
+				response.raise_for_status()
+			except aiohttp.ClientResponseError as exc:
+				raise CliDeezerHTTPError.from_status_code(exc) from exc
+
+			return await response.read()
+
+	def __cache_response(self, cache_key, body: bytes, json_data: Any):
+		assert self.response_cache is not None
+		if isinstance(json_data, dict) and json_data.get("error"):
+			# Only the lack of data is known to last, other errors are retried
+			if isinstance(CliDeezerErrorResponse.from_body(json_data), CliDeezerNoDataException):
+				self.response_cache.put(cache_key, body, negative=True)
+			return
+		self.response_cache.put(cache_key, body)
+
+	async def close(self):
+		"""
+		Close the pooled connections used by `async_request`.
+		"""
+		if self.response_cache is not None:
+			logger.info("Deezer response cache %s", self.response_cache.stats)
+		logger.info("Deezer requests %s", self.in_flight)
+		await self.async_session.close()
+
 
 class CliDeezerHTTPError(DeezerAPIException):
 	"""Specialisation wrapping HTTPError from the requests library."""
@@ -0,0 +1,159 @@
+import asyncio
+import logging
+import time
+import traceback
+
+from pyramid.connector.deezer.py_deezer import PyDeezer
+from pyramid.data.exceptions import (
+	DeezerTokenInvalidException,
+	DeezerTokenOverflowException,
+	DeezerTokensUnavailableException,
+)
+from pyramid.tools.generate_token import DeezerTokenProvider
+from pyramid.tools.http_session import PooledSession
+
+logger = logging.getLogger(__name__)
+
+
+class PooledClient:
+	def __init__(self, client: PyDeezer, local: bool):
+		self.client = client
+		self.local = local
+		self.validated_at = time.time()
+		self.lock = asyncio.Lock()
+
+
+class DeezerClientPool:
+	"""
+	Keeps authenticated PyDeezer clients to avoid validating an ARL before each download.
+
+	Clients are used in turn to spread the load between accounts. A client is validated
+	again once its TTL is over, and dropped as soon as its ARL is reported invalid.
+	"""
+
+	def __init__(
+		self,
+		arls: list[str] | None,
+		transport: PooledSession,
+		ttl: float = 3600,
+		remote_size: int = 2,
+	):
+		"""
+		Parameters:
+		- arls (list[str] | None): ARLs of the local accounts, used before the remote ones.
+		- transport (PooledSession): Transport shared by all the clients.
+		- ttl (float): Seconds a client is used before its ARL is validated again.
+		- remote_size (int): Number of remote accounts kept when no local account is valid.
+		"""
+		self.__arls = arls
+		self.__transport = transport
+		self.__ttl = ttl
+		self.__remote_size = remote_size
+		self.__token_provider = DeezerTokenProvider()
+		self.__clients: list[PooledClient] = []
+		self.__index = 0
+		self.__lock = asyncio.Lock()
+
+	async def get(self) -> PyDeezer:
+		while True:
+			async with self.__lock:
+				if not self.__clients:
+					await self.__fill()
+
+				self.__index %= len(self.__clients)
+				pooled = self.__clients[self.__index]
+				self.__index += 1
+
+			# Validated outside of the pool lock, so the other clients can be used meanwhile
+			if await self.__validate(pooled):
+				return pooled.client
+
+	def invalidate(self, client: PyDeezer):
+		"""
+		Drop a client whose ARL has been reported invalid.
+		"""
+		self.__remove(client)
+
+	def count(self) -> int:
+		return len(self.__clients)
+
+	def __remove(self, client: PyDeezer):
+		self.__clients = [pooled for pooled in self.__clients if pooled.client is not client]
+
+	async def __validate(self, pooled: PooledClient) -> bool:
+		async with pooled.lock:
+			if self.__ttl > time.time() - pooled.validated_at:
+				return True
+			if pooled not in self.__clients:
+				# Dropped while waiting for another validation
+				return False
+			try:
+				await pooled.client.get_user_data()
+				pooled.validated_at = time.time()
+				return True
+			except DeezerTokenInvalidException:
+				logger.warning(
+					"Deezer ARL of the %s client %d is no longer valid",
+					"local" if pooled.local else "remote",
+					self.__clients.index(pooled),
+				)
+				self.__remove(pooled.client)
+				return False
+
+	async def __fill(self):
+		last_err_local = None
+		if self.__arls:
+			for arl in self.__arls:
+				deezer_dl_api = PyDeezer(arl, self.__transport)
+				try:
+					await deezer_dl_api.get_user_data()
+					self.__clients.append(PooledClient(deezer_dl_api, True))
+				except DeezerTokenInvalidException as err:
+					last_err_local = err
+					continue
+		if self.__clients:
+			return
+
+		last_err_remote = None
+		already_overflow = False
+		while self.__token_provider.count_valids_tokens() != 0 and self.__remote_size > len(
+			self.__clients
+		):
+			try:
+				token = self.__token_provider.next()
+				deezer_dl_api = PyDeezer(token.token, self.__transport)
+				await deezer_dl_api.get_user_data()
+				self.__clients.append(PooledClient(deezer_dl_api, False))
+
+			except DeezerTokenInvalidException as err:
+				last_err_remote = err
+				continue
+
+			except DeezerTokenOverflowException as err:
+				last_err_remote = err
+				if already_overflow is True:
+					break
+				already_overflow = True
+				self.__token_provider = DeezerTokenProvider()
+				continue
+
+			except DeezerTokensUnavailableException as err:
+				last_err_remote = err
+				break
+
+		if last_err_local is not None:
+			tb = traceback.TracebackException.from_exception(last_err_local)
+			formatted_tb = "".join(tb.format())
+			logger.warning("Failed to fetch valid Deezer client from local\n%s", formatted_tb)
+
+		if self.__clients:
+			return
+
+		if last_err_remote is not None:
+			tb = traceback.TracebackException.from_exception(last_err_remote)
+			formatted_tb = "".join(tb.format())
+			logger.warning("Failed to fetch valid Deezer client from remote\n%s", formatted_tb)
+			raise last_err_remote
+		if last_err_local is not None:
+			raise last_err_local
+		raise DeezerTokensUnavailableException("No Deezer account is available")
@@ -1,140 +1,292 @@
 import asyncio
+import copy
 import logging
 import os
+import sys
+import time
 import traceback
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 from typing import Optional
 
-import pydeezer.util
+from pyramid.connector.deezer.client_pool import DeezerClientPool
 from pyramid.connector.deezer.downloader_progress_bar import DownloaderProgressBar
 from pyramid.connector.deezer.py_deezer import PyDeezer
+from pyramid.connector.deezer.track_cache import TrackCache
 from pyramid.data.track import Track
-from pyramid.tools.generate_token import DeezerTokenProvider
+from pyramid.tools.file_stream import FileStream
+from pyramid.tools.single_flight import SingleFlight
 from pydeezer.constants import track_formats
 from urllib3.exceptions import MaxRetryError
 
-from pyramid.data.exceptions import CustomException, DeezerTokensUnavailableException, DeezerTokenInvalidException, DeezerTokenOverflowException
+from pyramid.data.exceptions import CustomException, DeezerTokenInvalidException
+
+logger = logging.getLogger(__name__)
+
+
+class PendingDownload:
+	"""
+	Download of a track running in background, shared by the requests of the track.
+	"""
+
+	def __init__(self, file_stream: FileStream):
+		self.file_stream = file_stream
+		self.task: asyncio.Task | None = None
+		# Requests waiting for the download
+		self.waiters = 0
+		# Given as a stream, its reader needs the download to go until its end
+		self.streamed = False
+
+	async def wait_for(self, size: int) -> bool:
+		"""
+		Wait for `size` bytes of the download. If the last request waiting for it is
+		cancelled, the download is cancelled too.
+		"""
+		self.waiters += 1
+		try:
+			return await self.file_stream.wait_for(size)
+		except asyncio.CancelledError:
+			if self.waiters == 1 and not self.streamed and self.task is not None:
+				self.task.cancel()
+			raise
+		finally:
+			self.waiters -= 1
 
 
 class DeezerDownloader:
-	def __init__(self, folder: str, arl: Optional[str] = None):
+	def __init__(
+		self,
+		folder: str,
+		arl: Optional[str] = None,
+		cache_size: int = 4 * 1024 * 1024 * 1024,
+		stream_buffer_size: int = 256 * 1024,
+		decrypt_workers: int = 2,
+		decrypt_processes: bool = False,
+		http_connections: int = 100,
+		http_connections_per_host: int = 10,
+	):
+		"""
+		:param folder: Directory where tracks are downloaded.
+		:param arl: ARL of the local Deezer account.
+		:param cache_size: Bytes the downloaded tracks can take in the folder.
+		:param stream_buffer_size: Bytes written before a streamed track is returned.
+		:param decrypt_workers: Number of workers decrypting and writing the downloads.
+		:param decrypt_processes: Decrypt in a process pool instead of a thread pool.
+		:param http_connections: Maximum number of connections of the downloads.
+		:param http_connections_per_host: Maximum number of connections to the same host.
+		"""
 		self.folder_path = folder
+		self.stream_buffer_size = stream_buffer_size
 		if arl is not None and arl != "":
 			self.__arls = [arl]
 		else:
 			self.__arls = None
-		self.__token_provider = DeezerTokenProvider()
 		self.music_format = track_formats.MP3_128
-		os.makedirs(self.folder_path, exist_ok=True)
-		self.__deezer_dl_api = None
+		self.__cache = TrackCache(self.folder_path, cache_size)
+		self.__transport = PyDeezer.create_transport(http_connections, http_connections_per_host)
+		self.__clients = DeezerClientPool(self.__arls, self.__transport)
+		self.__streamed_downloads: set[asyncio.Task] = set()
+		self.__downloads = SingleFlight(cancel_abandoned=True)
+		self.__downloading: dict[str, PendingDownload] = {}
+		self.__decrypt_executor: Executor
+		if decrypt_processes:
+			self.__decrypt_executor = ProcessPoolExecutor(decrypt_workers)
+		else:
+			self.__decrypt_executor = ThreadPoolExecutor(decrypt_workers, "Decrypt")
+
+	async def close(self):
+		for stats in self.__transport.stats.values():
+			logger.info("Downloader HTTP %s", stats)
+		logger.info("Downloader cache %s", self.__cache.stats)
+		logger.info("Downloader downloads %s", self.__downloads)
+		await self.__transport.close()
+		self.__cache.flush()
+		self.__decrypt_executor.shutdown(wait=False, cancel_futures=True)
+
+	async def dl_track_by_id(self, track_id, stream: bool = False) -> Track | None:
+		"""
+		Download a track, or get it from the cache if it has already been downloaded.
 
-	async def dl_track_by_id(self, track_id) -> Track | None:
-		client = await self._get_client()
-		# try:
-		track_info = await client.get_track_info(track_id)
-		# except APIRequestError as err:
-		# 	logging.warn(f"Unable to download deezer song {track_id} : {err}", exc_info=True)
-		# 	return None  # Track unvailable in this country
+		Concurrent calls for the same track share the same download, each caller
+		getting its own Track. Once all of them are cancelled, the download is cancelled,
+		unless the track has already been given as a stream.
+
+		:param track_id: Deezer id of the track.
+		:param stream: Return the track as soon as the beginning of the file is written.
+			The download continues in background and its progress is given by `Track.stream`.
+		"""
+		# Streamed and complete tracks are returned at different times, yet share the download
+		track = await self.__downloads.run(
+			(TrackCache.key(track_id, self.music_format), stream),
+			lambda: self.__dl_track_by_id(track_id, stream),
+		)
+		if track is None:
+			return None
+		return copy.copy(track)
+
+	async def __dl_track_by_id(self, track_id, stream: bool) -> Track | None:
+		start = time.perf_counter()
+		cached = self.__cache.get_track_info(TrackCache.key(track_id, self.music_format))
+		if cached is not None:
+			file_path, track_info = cached
+			track_downloaded = Track(track_info, file_path)
+			self.__cache.stats.add_hit(time.perf_counter() - start)
+			return track_downloaded
+		self.__cache.stats.add_miss()
+
+		while True:
+			client = await self.__clients.get()
+			try:
+				track_info = await client.get_track_info(track_id)
+				break
+			except DeezerTokenInvalidException:
+				self.__clients.invalidate(client)
 
 		if not track_info:
-			logging.error(f"Unable to find deezer song to download {track_id} : Unknown error")
+			logger.error(f"Unable to find deezer song to download {track_id} : Unknown error")
 			return None
 
-		file_name = pydeezer.util.clean_filename(
-			f"{track_info['ART_NAME']} - {track_info['SNG_TITLE']}"
-		)
-		file_path = os.path.join(self.folder_path, file_name) + ".mp3"
+		cache_key = TrackCache.key(track_info["SNG_ID"], self.music_format)
+		file_path = self.__cache.get(cache_key)
+		if file_path is not None:
+			return Track(track_info, file_path)
 
-		if os.path.exists(file_path) is False:
-			is_dl = await self.__dl_track(track_info, file_name)
-			if not is_dl:
+		# A track is downloaded once, even if it is requested again while downloading
+		download = self.__downloading.get(cache_key)
+		if download is None:
+			download = self.__start_download(client, track_info, cache_key)
+		file_stream = download.file_stream
+		file_path = self.__cache.path(cache_key)
+
+		if not stream:
+			if not await download.wait_for(sys.maxsize):
 				return None
+			return Track(track_info, file_path)
 
+		if not await download.wait_for(self.stream_buffer_size):
+			return None
 		track_downloaded = Track(track_info, file_path)
+		if not file_stream.finished:
+			download.streamed = True
+			track_downloaded.stream = file_stream
 		return track_downloaded
 
-	async def __dl_track(self, track_info, file_name: str) -> bool:
-		try:
-			client = await self._get_client()
-			await client.download_track(
-				track_info,
-				self.folder_path,
-				self.music_format,
-				True,  # fallback quality if not available
-				file_name,
-				False,  # renew track info
-				False,  # metadata
-				False,  # lyrics
-				", ",  # separator for multiple artists
-				False,  # show messages
-				DownloaderProgressBar(),  # Custom progress bar
-			)
-			return True
-		except MaxRetryError:
-			track = Track(track_info, None)
-			logging.warning("Downloader MaxRetryError %s", track)
-			await asyncio.sleep(5)
-			return await self.__dl_track(track_info, file_name)
+	def __start_download(self, client: PyDeezer, track_info, cache_key: str) -> PendingDownload:
+		"""
+		Download a track in background. It is written to a temporary file, renamed once
+		complete and verified, so the path of a cached track never leads to a partial file.
+		"""
+		file_path = self.__cache.path(cache_key)
+		tmp_name = f"{cache_key}.part"
+		file_stream = FileStream(self.__cache.path(tmp_name))
+		pending = PendingDownload(file_stream)
+		self.__downloading[cache_key] = pending
 
-		except CustomException as error:
-			trace = "".join(traceback.format_exception(type(error), error, error.__traceback__))
-			logging.warning("%s :\n%s", error.msg, trace)
-			return False
+		partial_paths = [file_stream.file_path]
+
+		async def download():
+			is_dl = False
+			try:
+				tmp_path = await self.__dl_track(client, track_info, tmp_name, file_stream)
+				if tmp_path is not None:
+					partial_paths.append(tmp_path)
+					os.replace(tmp_path, file_path)
+					partial_paths.append(file_path)
+					# Readers already opened keep reading the renamed file
+					file_stream.file_path = file_path
+					self.__cache.add(cache_key, file_path, track_info)
+					is_dl = True
+			finally:
+				del self.__downloading[cache_key]
+				file_stream.finish(is_dl)
+
+		def on_done(task: asyncio.Task):
+			self.__streamed_downloads.discard(task)
+			if not task.cancelled() and task.exception() is not None:
+				track = Track(track_info, None)
+				logger.warning("Unable to dl track %s", track, exc_info=task.exception())
+			if not file_stream.success:
+				for partial_path in set(partial_paths):
+					self.__remove_partial(partial_path)
 
-		except Exception:
+		pending.task = asyncio.create_task(download())
+		self.__streamed_downloads.add(pending.task)
+		pending.task.add_done_callback(on_done)
+		return pending
+
+	def __remove_partial(self, file_path: str):
+		try:
+			os.remove(file_path)
+		except FileNotFoundError:
+			pass
+		except OSError as e:
+			logger.warning("Failed to delete %s due to %s", file_path, e)
+
+	def __verify(self, file_path: str, track_info, quality_key: str) -> bool:
+		"""
+		Check the size of a downloaded track against the one given by Deezer for its quality.
+		"""
+		size = os.path.getsize(file_path)
+		expected = int(track_info.get(f"FILESIZE_{quality_key}") or 0)
+		if size == 0 or (expected != 0 and size != expected):
 			track = Track(track_info, None)
-			logging.warning("Unable to dl track %s", track, exc_info=True)
+			logger.warning(
+				"Downloaded track %s is corrupted : %d bytes instead of %d", track, size, expected
+			)
 			return False
-	
-	async def _get_client(self) -> PyDeezer:
-		return await self._define_client()
-	
-	async def _define_client(self) -> PyDeezer:
-		last_err_local = None
-		if self.__arls:
-			for arl in self.__arls:
-				deezer_dl_api = PyDeezer(arl)
-				try:
-					await deezer_dl_api.get_user_data()
-					return deezer_dl_api
-				except DeezerTokenInvalidException as err:
-					last_err_local = err
-					continue
-
-		last_err_remote = None
-		already_overflow = False
-		while self.__token_provider.count_valids_tokens() != 0:
+		return True
+
+	async def __dl_track(
+		self, client: PyDeezer, track_info, file_name: str, stream: FileStream | None = None
+	) -> str | None:
+		"""
+		Returns:
+		- str | None: Path of the downloaded and verified track, None if it has failed.
+		"""
+		retries = 0
+		while True:
 			try:
-				token = self.__token_provider.next()
-				deezer_dl_api = PyDeezer(token.token)
-				await deezer_dl_api.get_user_data()
-				return deezer_dl_api
-
-			except DeezerTokenInvalidException as err:
-				last_err_remote = err
-				continue
-
-			except DeezerTokenOverflowException as err:
-				last_err_remote = err
-				if already_overflow is True:
-					break
-				already_overflow = True
-				self.__token_provider = DeezerTokenProvider()
-				continue
-
-			except DeezerTokensUnavailableException as err:
-				last_err_remote = err
-				break
+				file_path, quality_key = await client.download_track(
+					track_info,
+					self.folder_path,
+					self.music_format,
+					True,  # fallback quality if not available
+					file_name,
+					False,  # renew track info
+					False,  # metadata
+					False,  # lyrics
+					", ",  # separator for multiple artists
+					False,  # show messages
+					DownloaderProgressBar(),  # Custom progress bar
+					stream,
+					self.__decrypt_executor,
+				)
+				if not self.__verify(file_path, track_info, quality_key):
+					self.__remove_partial(file_path)
+					return None
+				return file_path
+			except MaxRetryError:
+				track = Track(track_info, None)
+				if retries >= client.download_retries:
+					logger.warning("Downloader MaxRetryError %s, giving up", track)
+					return None
+				retries += 1
+				logger.warning("Downloader MaxRetryError %s, retry %d", track, retries)
+				await asyncio.sleep(client._retry_delay(retries))
 
-		if last_err_local is not None:
-			tb = traceback.TracebackException.from_exception(last_err_local)
-			formatted_tb = ''.join(tb.format())
-			logging.warning("Failed to fetch valid Deezer client from local\n%s", formatted_tb)
+			except DeezerTokenInvalidException:
+				self.__clients.invalidate(client)
+				if retries >= client.download_retries:
+					logger.warning("No valid Deezer client to download %s", Track(track_info, None))
+					return None
+				retries += 1
+				client = await self.__clients.get()
 
-		if last_err_remote is not None:
-			tb = traceback.TracebackException.from_exception(last_err_remote)
-			formatted_tb = ''.join(tb.format())
-			logging.warning("Failed to fetch valid Deezer client from remote\n%s", formatted_tb)
+			except CustomException as error:
+				trace = "".join(traceback.format_exception(type(error), error, error.__traceback__))
+				logger.warning("%s :\n%s", error.msg, trace)
+				return None
 
-		if last_err_remote is not None and last_err_local is not None:
-			raise last_err_remote
-		raise Exception("Unknown func exit")
+			except Exception:
+				track = Track(track_info, None)
+				logger.warning("Unable to dl track %s", track, exc_info=True)
+				return None
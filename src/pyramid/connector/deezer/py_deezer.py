@@ -1,15 +1,22 @@
 import asyncio
 import hashlib
 import logging
+import random
+import time
 import warnings
+from collections import OrderedDict
+from collections.abc import Callable
+from concurrent.futures import Executor, ProcessPoolExecutor
+from io import BufferedWriter
 from os import path
 
-import aiofiles
 import aiohttp
 from cryptography.hazmat.backends import default_backend
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
 
 from pyramid.data.exceptions import CustomException, DeezerTokenInvalidException
+from pyramid.tools.file_stream import FileStream
+from pyramid.tools.http_session import PooledSession
 
 with warnings.catch_warnings():
 	warnings.simplefilter("ignore")
@@ -20,93 +27,268 @@ from pydeezer.constants import api_methods, api_urls, networking_settings, track
 from pydeezer.exceptions import APIRequestError, DownloadLinkDecryptionError
 from pydeezer.ProgressHandler import BaseProgressHandler, DefaultProgressHandler
 
+logger = logging.getLogger(__name__)
+
 
 class DlDeezerNotUrlFoundException(CustomException):
 	pass
 
 
+class DlDeezerInterruptedException(CustomException):
+	"""
+	The download has stopped before the end of the file. The file is decrypted and written
+	up to `position`, the end of the last complete chunk, from which it can be resumed.
+	"""
+
+	def __init__(self, position: int, *args: object):
+		super().__init__(*args)
+		self.position = position
+
+
+def decrypt_data(blowfish_key: bytes, data: bytes) -> bytes:
+	"""
+	Decrypt a buffer starting at a chunk boundary, usable from a process pool.
+	"""
+	buffer = bytearray(data)
+	decrypter = DecryptDeezer(blowfish_key, None, len(buffer) // 6144 + 1)  # type: ignore
+	decrypter.decrypt_buffer(memoryview(buffer))
+	return bytes(buffer)
+
+
 class DecryptDeezer:
-	def __init__(self, blowfish_key: bytes, progress_handler: BaseProgressHandler) -> None:
+	"""
+	Decrypt a Deezer audio stream into a file.
+
+	The stream is split in chunks of 6144 bytes, only the first 2048 bytes of each chunk
+	are encrypted with Blowfish CBC, each one starting from the same IV. The data received
+	is gathered in a preallocated buffer, whose encrypted stripes are all decrypted in a single
+	pass before the buffer is written at once.
+
+	Decryption and writes run in an executor, so the event loop only receives the data. While
+	a buffer is processed the next one is filled, and at most one buffer is waiting for the
+	executor at a time.
+	"""
+
+	def __init__(
+		self,
+		blowfish_key: bytes,
+		progress_handler: BaseProgressHandler,
+		buffer_chunks: int = 32,
+		executor: Executor | None = None,
+	) -> None:
 		self.chunk_length = 6144
 		self.decrypt_chunk_length = 2048
+		self.blowfish_key = blowfish_key
+		self.iv = bytes([i for i in range(8)])
 		self.cipher = Cipher(
 			Blowfish(blowfish_key),
-			modes.CBC(bytes([i for i in range(8)])),
+			modes.CBC(self.iv),
 			default_backend(),
 		)
 		self.progress_handler = progress_handler
-
-	async def output_file(self, filesize: int, file_path: str, res: aiohttp.ClientResponse):
-		async with aiofiles.open(file_path, "wb") as f:
-			await f.seek(0)
-
-			chunk_index = 0
-			downloaded_size = 0
-			previous_chunk = None
-			async for chunk, _ in res.content.iter_chunks():
-				chunk_size = len(chunk)
-				self.progress_handler.update(current_chunk_size=chunk_size)
-
-				downloaded_size += chunk_size
-				if previous_chunk:
-					previous_chunk, chunks_used = await self._transform_chunk(
-						f, previous_chunk + chunk
-					)
-				else:
-					previous_chunk, chunks_used = await self._transform_chunk(f, chunk)
-				chunk_index += chunks_used
-
-			if previous_chunk:
-				await self._write_file(f, previous_chunk)
-			if downloaded_size != filesize:
-				missing = filesize - downloaded_size
-				raise Exception("[%s] %d bytes are missing" % (filesize, missing))
-
-	async def _transform_chunk(
-		self, f: aiofiles.threadpool.binary.AsyncBufferedIOBase, bytes_chunked: bytes
-	) -> tuple[bytes, int] | tuple[None, int]:
-		# Calculate the number of chunks needed
-		length_bytes = len(bytes_chunked)
-		chunks_nb = int(length_bytes / self.chunk_length) + 1
-
-		# Iterate over the chunks and call the callback for each one
-		for i in range(chunks_nb - 1):
-			chunk = bytes_chunked[i * self.chunk_length : (i + 1) * self.chunk_length]
-			await self._write_file(f, chunk)
-
-		last_chunk_start = (chunks_nb - 1) * self.chunk_length
-		last_chunk = bytes_chunked[last_chunk_start:]
-		last_length = len(last_chunk)
-
-		if last_length == self.chunk_length:
-			await self._write_file(f, last_chunk)
-			return None, chunks_nb
-		elif last_length < self.chunk_length:
-			return last_chunk, chunks_nb - 1
-		raise Exception(
-			"Last chunk has wrong size %d (under %d is excepted)", last_length, self.chunk_length
-		)
-
-	async def _write_file(
-		self, f: aiofiles.threadpool.binary.AsyncBufferedIOBase, new_chunk: bytes
+		self.executor = executor
+		self.buffers = [bytearray(self.chunk_length * buffer_chunks) for _ in range(2)]
+		self.__iv_int = int.from_bytes(self.iv, "big")
+		self.__encrypted = bytearray(self.decrypt_chunk_length * buffer_chunks)
+		# update_into needs a block size of margin
+		self.__decrypted = bytearray(self.decrypt_chunk_length * buffer_chunks + 7)
+
+	async def output_file(
+		self,
+		filesize: int,
+		file_path: str,
+		res: aiohttp.ClientResponse,
+		stream: FileStream | None = None,
+		start: int = 0,
 	):
-		chunk_size = len(new_chunk)
-		if self.decrypt_chunk_length > chunk_size:
-			await f.write(new_chunk)
+		"""
+		Parameters:
+		- filesize (int): Size of the whole file.
+		- file_path (str): Path of the file written.
+		- res (aiohttp.ClientResponse): Response whose content starts at `start`.
+		- stream (FileStream | None): Progress of the file given to its readers.
+		- start (int): Position to resume from, at a chunk boundary. The file is kept up to it.
+
+		Raises:
+		- DlDeezerInterruptedException: The response has ended before the end of the file.
+		"""
+		if start % self.chunk_length != 0:
+			raise ValueError(f"Resume position {start} is not at a chunk boundary")
+		buffers = [memoryview(buffer) for buffer in self.buffers]
+		buffer_index = 0
+		buffer = buffers[buffer_index]
+		buffer_length = len(buffer)
+		pending: asyncio.Future[None] | None = None
+		written = start
+		interrupted: Exception | None = None
+
+		async def write(f: BufferedWriter, data: memoryview):
+			nonlocal written
+			await self._write_buffer(f, data, stream is not None)
+			written += len(data)
+			if stream is not None:
+				stream.update(written)
+
+		# Opened without awaiting : after a disconnection, aiohttp raises the error on the next
+		# read even if data received before it has not been read yet
+		with open(file_path, "r+b" if start else "wb") as f:  # noqa: ASYNC230
+			if start:
+				# Drop what has been written after the resume position
+				f.truncate(start)
+				f.seek(start)
+			try:
+				downloaded_size = start
+				buffered = 0
+				try:
+					async for chunk, _ in res.content.iter_chunks():
+						chunk_size = len(chunk)
+						self.progress_handler.update(current_chunk_size=chunk_size)
+
+						downloaded_size += chunk_size
+						chunk_view = memoryview(chunk)
+						offset = 0
+						while offset < chunk_size:
+							length = min(buffer_length - buffered, chunk_size - offset)
+							buffer[buffered : buffered + length] = chunk_view[offset : offset + length]
+							buffered += length
+							offset += length
+
+							if buffered == buffer_length:
+								if pending is not None:
+									await pending
+								pending = asyncio.ensure_future(write(f, buffer))
+								buffer_index = (buffer_index + 1) % len(buffers)
+								buffer = buffers[buffer_index]
+								buffered = 0
+				except (aiohttp.ClientError, TimeoutError) as error:
+					interrupted = error
+
+				if pending is not None:
+					await pending
+				if interrupted is not None or downloaded_size < filesize:
+					# Only complete chunks are kept, so the decryption can resume at the next one
+					buffered -= buffered % self.chunk_length
+				if buffered != 0:
+					await write(f, buffer[:buffered])
+			finally:
+				# The file can't be closed while the executor writes into it
+				if pending is not None and not pending.done():
+					await asyncio.wait([pending])
+
+		if interrupted is not None or downloaded_size < filesize:
+			raise DlDeezerInterruptedException(
+				written,
+				"[%s] %d bytes are missing : %s",
+				filesize,
+				filesize - written,
+				interrupted or "end of the response",
+			)
+		if downloaded_size != filesize:
+			raise Exception(f"[{filesize}] {downloaded_size - filesize} bytes are unexpected")
+
+	async def _write_buffer(self, f: BufferedWriter, buffer: memoryview, flush: bool):
+		loop = asyncio.get_running_loop()
+		if isinstance(self.executor, ProcessPoolExecutor):
+			data = await loop.run_in_executor(
+				self.executor, decrypt_data, self.blowfish_key, bytes(buffer)
+			)
+			await loop.run_in_executor(None, self._write, f, data, flush)
 		else:
-			chunk_to_decrypt = new_chunk[: self.decrypt_chunk_length]
-			decryptor = self.cipher.decryptor()
-			dec_data = decryptor.update(chunk_to_decrypt) + decryptor.finalize()
-			await f.write(dec_data)
-			await f.write(new_chunk[self.decrypt_chunk_length :])
+			await loop.run_in_executor(self.executor, self._decrypt_and_write, f, buffer, flush)
+
+	def _decrypt_and_write(self, f: BufferedWriter, buffer: memoryview, flush: bool):
+		self.decrypt_buffer(buffer)
+		self._write(f, buffer, flush)
+
+	def _write(self, f: BufferedWriter, data: bytes | memoryview, flush: bool):
+		f.write(data)
+		if flush:
+			# Make decrypted data visible to the stream readers
+			f.flush()
+
+	def decrypt_buffer(self, buffer: memoryview):
+		"""
+		Decrypt in place the encrypted stripes of a buffer starting at a chunk boundary.
+		"""
+		stripe_length = self.decrypt_chunk_length
+		stripes = range(0, len(buffer) - stripe_length + 1, self.chunk_length)
+		if not stripes:
+			return
+
+		encrypted = memoryview(self.__encrypted)
+		for i, start in enumerate(stripes):
+			encrypted[i * stripe_length : (i + 1) * stripe_length] = buffer[start : start + stripe_length]
+		encrypted_length = len(stripes) * stripe_length
+
+		decryptor = self.cipher.decryptor()
+		decryptor.update_into(encrypted[:encrypted_length], self.__decrypted)
+		decrypted = memoryview(self.__decrypted)
+
+		for i, start in enumerate(stripes):
+			offset = i * stripe_length
+			buffer[start : start + stripe_length] = decrypted[offset : offset + stripe_length]
+			if i != 0:
+				# CBC chained the first block to the previous stripe instead of the IV
+				previous_block = int.from_bytes(encrypted[offset - 8 : offset], "big")
+				first_block = int.from_bytes(buffer[start : start + 8], "big")
+				buffer[start : start + 8] = (first_block ^ previous_block ^ self.__iv_int).to_bytes(
+					8, "big"
+				)
 
 
 class PyDeezer(Deezer):
-	def __init__(self, arl=None):
+	def __init__(
+		self,
+		arl=None,
+		transport: PooledSession | None = None,
+		download_retries: int = 5,
+		retry_backoff: float = 0.5,
+		max_retry_backoff: float = 8,
+		download_url_ttl: float = 3600,
+		max_download_urls: int = 1024,
+		read_timeout: float = 30,
+	):
+		"""
+		Parameters:
+		- arl (str | None): ARL of the Deezer account.
+		- transport (PooledSession | None): Transport shared between clients.
+		- download_retries (int): Retries of a download before giving up.
+		- retry_backoff (float): Seconds waited before the first retry, doubled at each one.
+		- max_retry_backoff (float): Maximum seconds waited between two retries.
+		- download_url_ttl (float): Seconds the URL found for a track is kept.
+		- max_download_urls (int): Number of track URLs kept.
+		- read_timeout (float): Seconds without data before a download is considered stalled.
+		"""
 		super().__init__()
 		self.arl = arl
+		self.download_retries = download_retries
+		self.retry_backoff = retry_backoff
+		self.max_retry_backoff = max_retry_backoff
+		self.download_url_ttl = download_url_ttl
+		self.max_download_urls = max_download_urls
+		self.read_timeout = read_timeout
+		self.__download_urls: OrderedDict[tuple, tuple[str, str, float]] = OrderedDict()
 		self.token = None
 		self.set_cookie("arl", arl)
+		if transport is None:
+			transport = PyDeezer.create_transport()
+		self.transport = transport
+
+	@staticmethod
+	def create_transport(limit: int = 100, limit_per_host: int = 10) -> PooledSession:
+		"""
+		Create a transport which can be shared between several clients.
+
+		Connections are pooled by host (www.deezer.com, api.deezer.com and each CDN proxy).
+		Cookies are not stored by the transport since each client keeps the ones of its own
+		account and sends them with every request.
+		"""
+		return PooledSession(
+			limit=limit,
+			limit_per_host=limit_per_host,
+			store_cookies=False,
+			headers=networking_settings.HTTP_HEADERS,
+		)
 
 	# def get_cookies(self):
 	# 	return {"arl": self.arl}
@@ -124,6 +306,8 @@ class PyDeezer(Deezer):
 		tag_separator=", ",
 		show_messages=True,
 		progress_handler: BaseProgressHandler | None = None,
+		stream: FileStream | None = None,
+		executor: Executor | None = None,
 		**kwargs,
 	):
 		if with_lyrics:
@@ -141,11 +325,61 @@ class PyDeezer(Deezer):
 
 		track = track["DATA"] if "DATA" in track else track
 
-		res = await self.get_track_download_url(
+		# The first response found is the download itself, the URL isn't probed beforehand
+		res, url, quality_key = await self._open_download(
 			track, quality, fallback=fallback, renew=renew, **kwargs
 		)
-		url, quality_key = res
+		try:
+			download_path = await self.__download(
+				res,
+				url,
+				quality_key,
+				track,
+				download_dir,
+				filename,
+				show_messages,
+				progress_handler,
+				stream,
+				executor,
+			)
+		finally:
+			res.release()
+		quality = track_formats.TRACK_FORMAT_MAP[quality_key]
+		ext = quality["ext"]
+		filename = path.basename(download_path)
+
+		if with_metadata:
+			tags = await self.get_track_tags(track, separator=tag_separator)
+			if ext.lower() == ".flac":
+				self._write_flac_tags(download_path, track, tags=tags)
+			else:
+				self._write_mp3_tags(download_path, track, tags=tags)
+
+		if with_lyrics:
+			lyrics_path = path.join(download_dir, filename[: -len(ext)])
+			self.save_lyrics(lyric_data, lyrics_path)  # type: ignore
+
+		if show_messages:
+			print("Track downloaded to:", download_path)
+
+		return download_path, quality_key
 
+	async def __download(
+		self,
+		res: aiohttp.ClientResponse,
+		url: str,
+		quality_key: str,
+		track,
+		download_dir,
+		filename,
+		show_messages: bool,
+		progress_handler: BaseProgressHandler | None,
+		stream: FileStream | None,
+		executor: Executor | None,
+	) -> str:
+		"""
+		Write the track of a CDN response in the download folder, and return its path.
+		"""
 		blowfish_key = util.get_blowfish_key(track["SNG_ID"])
 
 		# quality = self._select_valid_quality(track, quality)
@@ -171,61 +405,249 @@ class PyDeezer(Deezer):
 		if show_messages:
 			print("Starting download of:", title)
 
-		async with aiohttp.ClientSession() as session:
-			async with session.get(
-				url,
-				cookies=self.get_cookies(),
-				timeout=None,
-				headers=networking_settings.HTTP_HEADERS,
-				chunked=True,
-				ssl=None,
-			) as res:
-				total_filesize = int(res.headers["Content-Length"])
-
-				if not progress_handler:
-					progress_handler = DefaultProgressHandler()
-
-				progress_handler.initialize(
-					None,
-					title,
-					quality_key,
-					total_filesize,
-					0,
-					track_id=track["SNG_ID"],  # type: ignore
-				)
-				decrytor = DecryptDeezer(blowfish_key, progress_handler)
-				await decrytor.output_file(total_filesize, download_path, res)
-
-		if with_metadata:
-			tags = await self.get_track_tags(track, separator=tag_separator)
-			if ext.lower() == ".flac":
-				self._write_flac_tags(download_path, track, tags=tags)
-			else:
-				self._write_mp3_tags(download_path, track, tags=tags)
-
-		if with_lyrics:
-			lyrics_path = path.join(download_dir, filename[: -len(ext)])
-			self.save_lyrics(lyric_data, lyrics_path)  # type: ignore
-
-		if show_messages:
-			print("Track downloaded to:", download_path)
+		if not progress_handler:
+			progress_handler = DefaultProgressHandler()
+
+		def initialize_progress(total_filesize: int):
+			progress_handler.initialize(
+				None,
+				title,
+				quality_key,
+				total_filesize,
+				0,
+				track_id=track["SNG_ID"],  # type: ignore
+			)
 
+		decrytor = DecryptDeezer(blowfish_key, progress_handler, executor=executor)
+		expected_size = int(track.get(f"FILESIZE_{quality_key}") or 0) or None
+		total_filesize = await self._download_resumable(
+			url, download_path, decrytor, stream, initialize_progress, res, expected_size
+		)
 		progress_handler.close(track_id=track["SNG_ID"], size_downloaded=total_filesize)
+		return download_path
+
+	async def _download_resumable(
+		self,
+		url: str,
+		download_path: str,
+		decryptor: DecryptDeezer,
+		stream: FileStream | None,
+		on_size: Callable[[int], None],
+		response: aiohttp.ClientResponse | None = None,
+		expected_size: int | None = None,
+	) -> int:
+		"""
+		Download and decrypt a track. When the CDN stream drops, the download is resumed with
+		a range request from the last chunk written, after an exponential backoff with jitter.
+
+		Parameters:
+		- response (aiohttp.ClientResponse | None): Response of the whole track already requested.
+		- expected_size (int | None): Size given by Deezer, used if the CDN doesn't give it.
+
+		Returns:
+		- int: Size of the track.
+		"""
+		session = self.transport.get()
+		total_filesize: int | None = None
+		position = 0
+		retries = 0
+		while True:
+			headers = {"Range": f"bytes={position}-"} if position else None
+			try:
+				if response is None:
+					response = await session.get(
+						url,
+						cookies=self.get_cookies(),
+						headers=headers,
+						timeout=self._download_timeout(),
+						ssl=None,
+					)
+				async with response as res:
+					response = None
+					res.raise_for_status()
+					if position and not self._is_range_from(res, position):
+						logger.warning("CDN has not resumed %s at %d, restarting", url, position)
+						position = 0
+					size = self._response_size(res, position, expected_size)
+					if size is None:
+						raise Exception(f"Size of {url} is unknown")
+					if total_filesize is None:
+						total_filesize = size
+						on_size(total_filesize)
+					elif size != total_filesize:
+						raise Exception(f"[{total_filesize}] size has changed to {size}")
+					await decryptor.output_file(
+						total_filesize, download_path, res, stream, position
+					)
+					return total_filesize
+			except DlDeezerInterruptedException as error:
+				position = error.position
+				if retries >= self.download_retries:
+					raise
+				logger.info(
+					"Download of %s interrupted, resumed at %d : %s", url, position, error.msg
+				)
+			except (aiohttp.ClientConnectionError, TimeoutError) as error:
+				if retries >= self.download_retries:
+					raise
+				logger.info("Download of %s failed, retried at %d : %s", url, position, error)
+			retries += 1
+			await asyncio.sleep(self._retry_delay(retries))
+
+	def _download_timeout(self) -> aiohttp.ClientTimeout:
+		"""
+		A track takes as long as needed to download, but a stalled stream raises a
+		TimeoutError, so the download is resumed instead of waiting forever.
+		"""
+		return aiohttp.ClientTimeout(total=None, sock_read=self.read_timeout)
+
+	def _retry_delay(self, retries: int) -> float:
+		"""
+		Exponential backoff with jitter, so concurrent downloads don't retry together.
+		"""
+		delay = min(self.max_retry_backoff, self.retry_backoff * 2 ** (retries - 1))
+		return random.uniform(delay / 2, delay)
+
+	@staticmethod
+	def _response_size(
+		res: aiohttp.ClientResponse, position: int, expected_size: int | None
+	) -> int | None:
+		"""
+		Size of the whole track, from the length of a response starting at `position`, else
+		from the total of its range, else the size expected.
+		"""
+		if res.content_length is not None:
+			return position + res.content_length
+		total = res.headers.get("Content-Range", "").rpartition("/")[2]
+		if total.isdigit():
+			return int(total)
+		return expected_size
+
+	@staticmethod
+	def _is_range_from(res: aiohttp.ClientResponse, position: int) -> bool:
+		content_range = res.headers.get("Content-Range", "")
+		return res.status == 206 and content_range.startswith(f"bytes {position}-")
 
 	async def get_track_download_url(
 		self, track, quality=None, fallback=True, renew=False, **kwargs
 	):
-		# if renew:
-		# track = self.get_track(track["SNG_ID"])["info"]
+		"""
+		URL and quality of the first quality available of a track. Each quality is probed with
+		a request of its first byte only. The URL found is cached for the next downloads.
+		"""
+		track = track["DATA"] if "DATA" in track else track
+		if not quality:
+			quality = track_formats.MP3_128
+			fallback = True
+
+		cache_key = (track["SNG_ID"], quality, fallback)
+		cached = None if renew else self.__get_download_url(cache_key)
+		if cached is not None:
+			return cached
+
+		candidates = self._download_url_candidates(track, quality, fallback, **kwargs)
+		if not fallback:
+			return candidates[0]
+
+		url_try: list[str] = []
+		cookies = self.get_cookies()
+		session = self.transport.get()
+		for url, key in candidates:
+			async with session.get(url, cookies=cookies, headers={"Range": "bytes=0-0"}) as res:
+				if res.status == 206 or self._has_content(res):
+					self.__put_download_url(cache_key, url, key)
+					return (url, key)
+			url_try.append(url)
 
+		raise DlDeezerNotUrlFoundException(
+			"Can't find valid URL to download '%s'. URLs try :\n- %s", track, "\n -".join(url_try)
+		)
+
+	async def _open_download(
+		self, track, quality=None, fallback=True, renew=False, **kwargs
+	) -> tuple[aiohttp.ClientResponse, str, str]:
+		"""
+		Request the whole track from the CDN, for the first quality available. The URL of the
+		quality found is cached, so the next downloads of the track request it directly.
+
+		Returns:
+		- tuple[aiohttp.ClientResponse, str, str]: The response to read, its URL and quality.
+		"""
 		if not quality:
 			quality = track_formats.MP3_128
 			fallback = True
 
-		try:
-			# Just in case they passed in the whole dictionary from get_track()
-			track = track["DATA"] if "DATA" in track else track
+		cache_key = (track["SNG_ID"], quality, fallback)
+		cached = None if renew else self.__get_download_url(cache_key)
+		if cached is not None:
+			candidates = [cached]
+		else:
+			candidates = self._download_url_candidates(track, quality, fallback, **kwargs)
+
+		url_try: list[str] = []
+		cookies = self.get_cookies()
+		session = self.transport.get()
+		for url, key in candidates:
+			res = await self._request_download(session, url, cookies)
+			if not fallback or self._has_content(res):
+				if res.ok:
+					self.__put_download_url(cache_key, url, key)
+				return res, url, key
+			res.release()
+			url_try.append(url)
+
+		if cached is not None:
+			# The URL cached is no longer valid, the qualities are tried again
+			self.__download_urls.pop(cache_key, None)
+			return await self._open_download(track, quality, fallback, True, **kwargs)
+		raise DlDeezerNotUrlFoundException(
+			"Can't find valid URL to download '%s'. URLs try :\n- %s", track, "\n -".join(url_try)
+		)
 
+	async def _request_download(
+		self, session: aiohttp.ClientSession, url: str, cookies
+	) -> aiohttp.ClientResponse:
+		"""
+		Request a track from the CDN. A failed connection is retried after a backoff,
+		like an interrupted download.
+		"""
+		retries = 0
+		while True:
+			try:
+				return await session.get(
+					url, cookies=cookies, timeout=self._download_timeout(), ssl=None
+				)
+			except (aiohttp.ClientConnectionError, TimeoutError) as error:
+				if retries >= self.download_retries:
+					raise
+				logger.info("Request of %s failed, retried : %s", url, error)
+			retries += 1
+			await asyncio.sleep(self._retry_delay(retries))
+
+	@staticmethod
+	def _has_content(res: aiohttp.ClientResponse) -> bool:
+		return res.status == 200 and int(res.headers.get("Content-Length", 0)) > 0
+
+	def _download_url_candidates(
+		self, track, quality: str, fallback: bool, **kwargs
+	) -> list[tuple[str, str]]:
+		"""
+		URLs of a track to try in order, with their quality.
+		"""
+		qualities = [quality]
+		if fallback:
+			if "fallback_qualities" in kwargs:
+				qualities += kwargs["fallback_qualities"]
+			else:
+				qualities += track_formats.FALLBACK_QUALITIES
+		return [
+			(self._download_url(track, track_formats.TRACK_FORMAT_MAP[key]["code"]), key)
+			for key in qualities
+		]
+
+	@staticmethod
+	def _download_url(track, quality_code) -> str:
+		try:
 			if "MD5_ORIGIN" not in track:
 				raise DownloadLinkDecryptionError("MD5 of track is needed to decrypt the download link.")
 
@@ -237,51 +659,41 @@ class PyDeezer(Deezer):
 				'You have passed an invalid argument. This method needs the "DATA" value in the dictionary returned by the get_track() method.'
 			)
 
-		def decrypt_url(quality_code):
-			magic_char = "¤"
-			step1 = magic_char.join((md5_origin, str(quality_code), track_id, media_version))
-			m = hashlib.md5()
-			m.update(bytes([ord(x) for x in step1]))
-
-			step2 = m.hexdigest() + magic_char + step1 + magic_char
-			step2 = step2.ljust(80, " ")
-
-			cipher = Cipher(
-				algorithms.AES(bytes("jo6aey6haid2Teih", "ascii")), modes.ECB(), default_backend()
-			)
-
-			encryptor = cipher.encryptor()
-			step3 = encryptor.update(bytes([ord(x) for x in step2])).hex()
+		magic_char = "¤"
+		step1 = magic_char.join((md5_origin, str(quality_code), track_id, media_version))
+		m = hashlib.md5()
+		m.update(bytes([ord(x) for x in step1]))
 
-			cdn = track["MD5_ORIGIN"][0]
+		step2 = m.hexdigest() + magic_char + step1 + magic_char
+		step2 = step2.ljust(80, " ")
 
-			return f"https://e-cdns-proxy-{cdn}.dzcdn.net/mobile/1/{step3}"
+		cipher = Cipher(
+			algorithms.AES(bytes("jo6aey6haid2Teih", "ascii")), modes.ECB(), default_backend()
+		)
 
-		url_try: list[str] = []
-		url = decrypt_url(track_formats.TRACK_FORMAT_MAP[quality]["code"])
+		encryptor = cipher.encryptor()
+		step3 = encryptor.update(bytes([ord(x) for x in step2])).hex()
 
-		cookies = self.get_cookies()
-		async with aiohttp.ClientSession() as session:
-			async with session.get(url, cookies=cookies) as res:
-				if not fallback or (res.status == 200 and int(res.headers["Content-length"]) > 0):
-					return (url, quality)
-			url_try.append(url)
-			if "fallback_qualities" in kwargs:
-				fallback_qualities = kwargs["fallback_qualities"]
-			else:
-				fallback_qualities = track_formats.FALLBACK_QUALITIES
+		cdn = track["MD5_ORIGIN"][0]
 
-			for key in fallback_qualities:
-				url = decrypt_url(track_formats.TRACK_FORMAT_MAP[key]["code"])
+		return f"https://e-cdns-proxy-{cdn}.dzcdn.net/mobile/1/{step3}"
 
-				async with session.get(url, cookies=cookies) as res2:
-					if res2.status == 200 and int(res2.headers["Content-length"]) > 0:
-						return (url, key)
-					url_try.append(url)
+	def __get_download_url(self, cache_key: tuple) -> tuple[str, str] | None:
+		entry = self.__download_urls.get(cache_key)
+		if entry is None:
+			return None
+		url, quality, expires_at = entry
+		if time.monotonic() >= expires_at:
+			del self.__download_urls[cache_key]
+			return None
+		self.__download_urls.move_to_end(cache_key)
+		return url, quality
 
-		raise DlDeezerNotUrlFoundException(
-			"Can't find valid URL to download '%s'. URLs try :\n- %s", track, "\n -".join(url_try)
-		)
+	def __put_download_url(self, cache_key: tuple, url: str, quality: str):
+		self.__download_urls[cache_key] = (url, quality, time.monotonic() + self.download_url_ttl)
+		self.__download_urls.move_to_end(cache_key)
+		while len(self.__download_urls) > self.max_download_urls:
+			self.__download_urls.popitem(last=False)
 
 	async def get_user_data(self):
 		data = (await self._api_call(api_methods.GET_USER_DATA))["results"]
@@ -314,28 +726,32 @@ class PyDeezer(Deezer):
 				"image": "https://e-cdns-images.dzcdn.net/images/user/250x250-000000-80-0-0.jpg",
 			}
 
-	async def _api_call(self, method, params={}):
+	async def _api_call(self, method, params={}, retry=True):
 		token = "null"
 		if method != api_methods.GET_USER_DATA:
 			if not self.token:
 				await self.get_user_data()
 			token = self.token
 
-		async with aiohttp.ClientSession() as session:
-			async with session.post(
-				api_urls.API_URL,
-				json=params,
-				params={"api_version": "1.0", "api_token": token, "input": "3", "method": method},
-				cookies=self.get_cookies(),
-			) as res:
-				data = await res.json()
+		session = self.transport.get()
+		async with session.post(
+			api_urls.API_URL,
+			json=params,
+			params={"api_version": "1.0", "api_token": token, "input": "3", "method": method},
+			cookies=self.get_cookies(),
+		) as res:
+			data = await res.json()
 
-				for key, morsel in res.cookies.items():
-					self.set_cookie(key, morsel.value)
+			for key, morsel in res.cookies.items():
+				self.set_cookie(key, morsel.value)
 
 		if "error" in data and data["error"]:
 			error_type = list(data["error"].keys())[0]
 			error_message = data["error"][error_type]
+			if error_type == "VALID_TOKEN_REQUIRED" and method != api_methods.GET_USER_DATA and retry:
+				# The session token has expired, validate the ARL again
+				self.token = None
+				return await self._api_call(method, params, False)
 			raise APIRequestError("{0} : {1}".format(error_type, error_message))
 
 		return data
@@ -416,13 +832,12 @@ class PyDeezer(Deezer):
 
 		url = f"https://e-cdns-images.dzcdn.net/images/cover/{poster_id}/{size}x{size}.{ext}"
 
-		async with aiohttp.ClientSession() as session:
-			async with session.get(
-				url,
-				headers=networking_settings.HTTP_HEADERS,
-				cookies=self.get_cookies(),
-			) as res:
-				image = await res.text()
+		session = self.transport.get()
+		async with session.get(
+			url,
+			cookies=self.get_cookies(),
+		) as res:
+			image = await res.text()
 		return {
 			"image": image,
 			"size": (size, size),
@@ -457,20 +872,20 @@ class PyDeezer(Deezer):
 
 	async def _legacy_api_call(self, method, params={}):
 		url = "{0}/{1}".format(api_urls.LEGACY_API_URL, method)
-		async with aiohttp.ClientSession() as session:
-			async with session.get(
-				url,
-				params=params,
-				cookies=self.get_cookies(),
-			) as res:
-				data = await res.json()
+		session = self.transport.get()
+		async with session.get(
+			url,
+			params=params,
+			cookies=self.get_cookies(),
+		) as res:
+			data = await res.json()
 
 		if "error" in data and data["error"]:
 			error_type = data["error"]["type"]
 			error_message = data["error"]["message"]
 			error_code = data["error"]["code"]
 			if error_code == 4:
-				logging.warning("Download RateLimit '%s'", url)
+				logger.warning("Download RateLimit '%s'", url)
 				await asyncio.sleep(5)
 				return await self._legacy_api_call(method, params)
 
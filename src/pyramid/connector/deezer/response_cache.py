@@ -0,0 +1,106 @@
+import time
+from collections import OrderedDict
+from collections.abc import Hashable
+from typing import Any
+
+
+class ResponseCacheStats:
+	def __init__(self):
+		self.hits = 0
+		self.negative_hits = 0
+		self.misses = 0
+		self.evictions = 0
+		self.expirations = 0
+
+	def hit_rate(self) -> float:
+		total = self.hits + self.negative_hits + self.misses
+		if total == 0:
+			return 0.0
+		return (self.hits + self.negative_hits) / total
+
+	def __str__(self):
+		return (
+			f"{self.hits} hits, {self.negative_hits} negative hits, {self.misses} misses, "
+			f"{self.evictions} evictions, {self.expirations} expirations, "
+			f"hit rate {self.hit_rate() * 100:.1f}%"
+		)
+
+
+class ResponseCacheEntry:
+	def __init__(self, payload: bytes, size: int, expires_at: float, negative: bool):
+		self.payload = payload
+		self.size = size
+		self.expires_at = expires_at
+		self.negative = negative
+
+
+class ResponseCache:
+	"""
+	In-memory LRU cache of the raw JSON payloads of an API, bounded by their size.
+	They are kept as received, so each hit is parsed again into objects the caller owns.
+
+	Payloads expire after `ttl` seconds. Negative ones, meaning the API has no data for
+	the request, expire after `negative_ttl` seconds.
+	"""
+
+	def __init__(
+		self, max_size: int = 16 * 1024 * 1024, ttl: float = 300, negative_ttl: float = 60
+	):
+		"""
+		Parameters:
+		- max_size (int): Maximum size in bytes of the payloads kept, as received.
+		- ttl (float): Seconds a payload is kept.
+		- negative_ttl (float): Seconds a payload without data is kept.
+		"""
+		self.max_size = max_size
+		self.ttl = ttl
+		self.negative_ttl = negative_ttl
+		self.size = 0
+		self.stats = ResponseCacheStats()
+		self.__entries: OrderedDict[Hashable, ResponseCacheEntry] = OrderedDict()
+
+	@staticmethod
+	def key(method: str, path: str, params: dict[str, Any]) -> Hashable:
+		return (method, path, tuple(sorted((k, str(v)) for k, v in params.items())))
+
+	def get(self, key: Hashable) -> bytes | None:
+		entry = self.__entries.get(key)
+		if entry is None:
+			self.stats.misses += 1
+			return None
+		if time.monotonic() >= entry.expires_at:
+			self.__remove(key)
+			self.stats.expirations += 1
+			self.stats.misses += 1
+			return None
+		self.__entries.move_to_end(key)
+		if entry.negative:
+			self.stats.negative_hits += 1
+		else:
+			self.stats.hits += 1
+		return entry.payload
+
+	def put(self, key: Hashable, payload: bytes, negative: bool = False):
+		size = len(payload)
+		if size > self.max_size:
+			return
+		if key in self.__entries:
+			self.__remove(key)
+		ttl = self.negative_ttl if negative else self.ttl
+		self.__entries[key] = ResponseCacheEntry(payload, size, time.monotonic() + ttl, negative)
+		self.size += size
+		while self.size > self.max_size:
+			oldest = next(iter(self.__entries))
+			self.__remove(oldest)
+			self.stats.evictions += 1
+
+	def count(self) -> int:
+		return len(self.__entries)
+
+	def clear(self):
+		self.__entries.clear()
+		self.size = 0
+
+	def __remove(self, key: Hashable):
+		entry = self.__entries.pop(key)
+		self.size -= entry.size
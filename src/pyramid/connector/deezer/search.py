@@ -1,12 +1,13 @@
 import asyncio
 import logging
 import re
+from collections.abc import AsyncIterator, Callable
 from enum import Enum
 import aiohttp
 
 import deezer
 from pyramid.data.a_engine_tools import AEngineTools
-from pyramid.data.a_search import ASearch, ASearchId
+from pyramid.data.a_search import ASearch, ASearchId, single_page
 from pyramid.data.track import TrackMinimalDeezer
 
 from pyramid.connector.deezer.cli_deezer import (
@@ -14,13 +15,35 @@ from pyramid.connector.deezer.cli_deezer import (
 	CliDeezerNoDataException,
 	CliDeezerRateLimitError,
 	CliPaginatedList,
+	RequestPriority,
+	request_priority,
 )
 
+logger = logging.getLogger(__name__)
+
+
+class CascadeMode(Enum):
+	# Each query is sent once the previous one has found nothing
+	SEQUENTIAL = 1
+	# Queries with the artist, then the ones without it
+	WAVES = 2
+	# All the queries at once
+	PARALLEL = 3
+
 
 class DeezerSearch(ASearchId, ASearch):
-	def __init__(self, default_limit: int):
+	def __init__(
+		self,
+		default_limit: int,
+		resolve_workers: int = 10,
+		cascade: CascadeMode = CascadeMode.WAVES,
+		http_connections: int = 100,
+		http_connections_per_host: int = 10,
+	):
 		self.default_limit = default_limit
-		self.client = CliDeezer()
+		self.resolve_workers = resolve_workers
+		self.cascade = cascade
+		self.client = CliDeezer(limit=http_connections, limit_per_host=http_connections_per_host)
 		self.tools = DeezerTools()
 		self.strict = False
 
@@ -69,36 +92,119 @@ class DeezerSearch(ASearchId, ASearch):
 		return [TrackMinimalDeezer(element) for element in tracks]
 
 	async def get_playlist_tracks_by_id(
-		self, playlist_id: int
+		self, playlist_id: int, progress: Callable[[int, int], None] | None = None
 	) -> tuple[list[TrackMinimalDeezer], list[TrackMinimalDeezer]] | None:
+		"""
+		Get the tracks of a playlist, in the playlist order.
+
+		:param playlist_id: Deezer id of the playlist.
+		:param progress: Called with the number of tracks resolved and unresolved
+			each time a track is searched.
+		"""
+		real_tracks: list[TrackMinimalDeezer] = []
+		unfindable_track: list[TrackMinimalDeezer] = []
+		found = False
+		pages = self.iter_playlist_tracks_by_id(playlist_id, progress)
+		async for page_tracks, page_unfindable in pages:
+			found = True
+			real_tracks.extend(page_tracks)
+			unfindable_track.extend(page_unfindable)
+		if not found:
+			return None
+
+		logger.info(
+			"Playlist %s resolved : %d tracks found, %d unfindable",
+			playlist_id,
+			len(real_tracks),
+			len(unfindable_track),
+		)
+		return real_tracks, unfindable_track
+
+	async def iter_playlist_tracks_by_id(
+		self, playlist_id: int, progress: Callable[[int, int], None] | None = None
+	) -> AsyncIterator[tuple[list[TrackMinimalDeezer], list[TrackMinimalDeezer]]]:
+		"""
+		Get the tracks of a playlist page by page, each page once all its tracks are searched.
+		"""
 		playlist = await self.client.async_get_playlist(playlist_id)  # TODO handle HTTP errors
 		if not playlist:
-			return None
+			return
 		# Tracks id are the not the good one
 		playlist_tracks: CliPaginatedList[deezer.Track] = playlist.get_tracks()  # type: ignore
 
 		# So we search the id for same name and artist
-		real_tracks: list[TrackMinimalDeezer] = []
-		unfindable_track: list[TrackMinimalDeezer] = []
-
-		async for chunk_tracks in playlist_tracks:
-			for t in chunk_tracks:
-				track = await self.search_exact_track(t.artist.name, t.album.title, t.title)
-				# logging.info("DEBUG song '%s' - '%s' - '%s'", t.artist.name, t.title, t.album.title)
-				if track is None:
-					if not t.readable:
-						logging.warning(
-							"Unavailable track in playlist '%s' - '%s'", t.artist.name, t.title
-						)
+		semaphore = asyncio.Semaphore(self.resolve_workers)
+		resolved = 0
+		unresolved = 0
+
+		async def resolve(t: deezer.Track) -> TrackMinimalDeezer | None:
+			nonlocal resolved, unresolved
+			# The searches of the users go first
+			request_priority.set(RequestPriority.BULK)
+			async with semaphore:
+				# Tracks are already searched concurrently, speculative queries would only use the quota
+				track = await self.search_exact_track(
+					t.artist.name, t.album.title, t.title, CascadeMode.SEQUENTIAL
+				)
+			# logging.info("DEBUG song '%s' - '%s' - '%s'", t.artist.name, t.title, t.album.title)
+			if track is None:
+				if not t.readable:
+					logger.warning(
+						"Unavailable track in playlist '%s' - '%s'", t.artist.name, t.title
+					)
+				else:
+					logger.warning(
+						"Unknown track searched in playlist '%s' - '%s'", t.artist.name, t.title
+					)
+				unresolved += 1
+			else:
+				resolved += 1
+			if progress is not None:
+				progress(resolved, unresolved)
+			return track
+
+		# Tracks are searched while the next pages are fetched, a few pages ahead at most
+		pages: asyncio.Queue[list[tuple[deezer.Track, asyncio.Task]] | Exception | None] = (
+			asyncio.Queue(maxsize=2)
+		)
+		tasks: set[asyncio.Task] = set()
+
+		async def fetch_pages():
+			try:
+				async for chunk_tracks in playlist_tracks:
+					page = []
+					for t in chunk_tracks:
+						task = asyncio.create_task(resolve(t))
+						tasks.add(task)
+						page.append((t, task))
+					await pages.put(page)
+				await pages.put(None)
+			except Exception as err:  # noqa: BLE001 - raised by the consumer
+				await pages.put(err)
+
+		fetcher = asyncio.create_task(fetch_pages())
+		try:
+			while True:
+				page = await pages.get()
+				if page is None:
+					break
+				if isinstance(page, Exception):
+					raise page
+
+				real_tracks: list[TrackMinimalDeezer] = []
+				unfindable_track: list[TrackMinimalDeezer] = []
+				for t, task in page:
+					track = await task
+					tasks.discard(task)
+					if track is None:
+						unfindable_track.append(TrackMinimalDeezer(t))
 					else:
-						logging.warning(
-							"Unknown track searched in playlist '%s' - '%s'", t.artist.name, t.title
-						)
-					unfindable_track.append(TrackMinimalDeezer(t))
-					continue
-				real_tracks.append(track)
-
-		return real_tracks, unfindable_track
+						real_tracks.append(track)
+				yield real_tracks, unfindable_track
+		finally:
+			fetcher.cancel()
+			for task in tasks:
+				task.cancel()
 
 	async def get_album_tracks(self, album_name) -> list[TrackMinimalDeezer] | None:
 		pagination_results = self.client.search_albums(query=album_name, strict=self.strict)
@@ -119,6 +225,16 @@ class DeezerSearch(ASearchId, ASearch):
 		tracks = await pagination_tracks.get_all()
 		return [TrackMinimalDeezer(element) for element in tracks], []
 
+	async def iter_album_tracks_by_id(
+		self, album_id: int
+	) -> AsyncIterator[tuple[list[TrackMinimalDeezer], list[TrackMinimalDeezer]]]:
+		album = await self.client.async_get_album(album_id)  # TODO handle HTTP errors
+		if not album:
+			return
+		pagination_tracks: CliPaginatedList[deezer.Track] = album.get_tracks()  # type: ignore
+		async for chunk_tracks in pagination_tracks:
+			yield [TrackMinimalDeezer(element) for element in chunk_tracks], []
+
 	async def get_top_artist(
 		self, artist_name, limit: int | None = None
 	) -> list[TrackMinimalDeezer] | None:
@@ -175,28 +291,103 @@ class DeezerSearch(ASearchId, ASearch):
 
 		return tracks
 
+	async def get_by_url_stream(
+		self, url, progress: Callable[[int, int], None] | None = None
+	) -> (
+		AsyncIterator[tuple[list[TrackMinimalDeezer], list[TrackMinimalDeezer]]]
+		| TrackMinimalDeezer
+		| None
+	):
+		id, type = await self.tools.extract_from_url(url)
+
+		if id is None:
+			return None
+		if type is None:
+			raise NotImplementedError(f"The type of deezer info '{url}' is not implemented")
+
+		if type == DeezerType.PLAYLIST:
+			return self.iter_playlist_tracks_by_id(id, progress)
+		elif type == DeezerType.ALBUM:
+			return self.iter_album_tracks_by_id(id)
+		elif type == DeezerType.ARTIST:
+			tracks = await self.get_top_artist_by_id(id)
+			if tracks is None:
+				return None
+			return single_page(tracks)  # type: ignore
+		elif type == DeezerType.TRACK:
+			return await self.get_track_by_id(id)
+		else:
+			raise NotImplementedError(f"The type of deezer info '{type}' can't be resolve")
+
+	async def close(self):
+		await self.client.close()
+
 	async def search_exact_track(
-		self, artist_name, album_title, track_title
+		self, artist_name, album_title, track_title, cascade: CascadeMode | None = None
 	) -> TrackMinimalDeezer | None:
+		"""
+		Search a track, with less criteria each time nothing is found.
+
+		:param cascade: How the queries are sent, `self.cascade` by default.
+		"""
+		if cascade is None:
+			cascade = self.cascade
 		clean_artist = self.__remove_special_chars(artist_name)
 		clean_album = self.__remove_special_chars(album_title)
 		clean_track = self.__remove_special_chars(track_title)
 		# logging.info("Song CLEANED '%s' - '%s' - '%s'", clean_artist, clean_track, clean_album)
 
-		track = await self._search_exact_track(clean_artist, clean_album, clean_track)
-		if track is None:
-			track = await self._search_exact_track(clean_artist, None, clean_track)
-			if track is None:
-				track = await self._search_exact_track(None, clean_album, clean_track)
-				if track is None:
-					track = await self._search_exact_track(None, None, clean_track)
-					# if track is not None:
-					# logging.warning("Find with title '%s' - '%s' - '%s'", clean_artist, clean_track, clean_album)
-				# else:
-				# logging.warning("Find with album & title '%s' - '%s' - '%s'", clean_artist, clean_track, clean_album)
-			# else:
-			# logging.warning("Find with artist & title '%s' - '%s' - '%s'", clean_artist, clean_track, clean_album)
-		return track
+		queries: list[tuple[str | None, str | None, str | None]] = []
+		for query in [
+			(clean_artist, clean_album, clean_track),
+			(clean_artist, None, clean_track),
+			(None, clean_album, clean_track),
+			(None, None, clean_track),
+		]:
+			# Without artist or album, some queries are the same
+			if query not in queries:
+				queries.append(query)
+
+		if cascade == CascadeMode.PARALLEL:
+			waves = [queries]
+		elif cascade == CascadeMode.WAVES:
+			with_artist = [q for q in queries if q[0] is not None]
+			without_artist = [q for q in queries if q[0] is None]
+			waves = [wave for wave in (with_artist, without_artist) if wave]
+		else:
+			waves = [[query] for query in queries]
+
+		for wave in waves:
+			track = await self.__search_first_hit(wave)
+			if track is not None:
+				return track
+		return None
+
+	async def __search_first_hit(
+		self, queries: list[tuple[str | None, str | None, str | None]]
+	) -> TrackMinimalDeezer | None:
+		"""
+		Send the queries at once and return the result of the first one, in the order given,
+		which finds a track. The queries left are cancelled.
+		"""
+		if len(queries) > self.client.rate_limiter.available():
+			# Speculative queries would wait for the quota, they are sent one by one
+			for query in queries:
+				track = await self._search_exact_track(*query)
+				if track is not None:
+					return track
+			return None
+
+		tasks = [asyncio.create_task(self._search_exact_track(*query)) for query in queries]
+		try:
+			for task in tasks:
+				track = await task
+				if track is not None:
+					return track
+			return None
+		finally:
+			for task in tasks:
+				task.cancel()
 
 	async def _search_exact_track(
 		self, artist_name, album_title, track_title
@@ -205,15 +396,15 @@ class DeezerSearch(ASearchId, ASearch):
 			pagination_results = self.client.search(
 				artist=artist_name, album=album_title, track=track_title
 			)
-			logging.info("_search_exact_track %s - %s - %s", artist_name, album_title, track_title)
+			logger.info("_search_exact_track %s - %s - %s", artist_name, album_title, track_title)
 			track = await pagination_results.get_first()
 			if track is None:
 				return None
 			return TrackMinimalDeezer(track)
 
 		except CliDeezerRateLimitError:
-			logging.error("Search Deezer RateLimit %s - %s", artist_name, track_title)
-			await asyncio.sleep(5)
+			logger.error("Search Deezer RateLimit %s - %s", artist_name, track_title)
+			# The rate limiter backs off before the next request
 			return await self._search_exact_track(artist_name, album_title, track_title)
 
 	def __remove_special_chars(
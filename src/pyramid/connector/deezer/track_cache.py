@@ -0,0 +1,350 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+
+from pyramid.tools import utils
+
+logger = logging.getLogger(__name__)
+
+# Fields of the Deezer track info needed to build a Track
+TRACK_INFO_FIELDS = [
+	"SNG_ID",
+	"SNG_TITLE",
+	"ART_NAME",
+	"ART_PICTURE",
+	"ALB_TITLE",
+	"ALB_PICTURE",
+	"DURATION",
+	"FILESIZE",
+	"PHYSICAL_RELEASE_DATE",
+]
+
+
+class CacheStats:
+	"""
+	Hits and misses of the cache, with the time taken to serve a hit.
+	"""
+
+	def __init__(self):
+		self.hits = 0
+		self.misses = 0
+		self.total_latency = 0.0
+		self.max_latency = 0.0
+
+	def add_hit(self, latency: float):
+		self.hits += 1
+		self.total_latency += latency
+		self.max_latency = max(self.max_latency, latency)
+
+	def add_miss(self):
+		self.misses += 1
+
+	def average_latency(self) -> float:
+		if self.hits == 0:
+			return 0.0
+		return self.total_latency / self.hits
+
+	def __str__(self):
+		return (
+			f"{self.hits} hits, {self.misses} misses, "
+			f"hit avg {self.average_latency() * 1000:.2f} ms, max {self.max_latency * 1000:.2f} ms"
+		)
+
+
+class CacheEntry:
+	def __init__(
+		self,
+		file_name: str,
+		size: int,
+		last_access: float | None = None,
+		hits: int = 0,
+		info: dict | None = None,
+	):
+		self.file_name = file_name
+		self.size = size
+		self.last_access = time.time() if last_access is None else last_access
+		self.hits = hits
+		self.info = info
+
+	def to_dict(self):
+		return {
+			"file": self.file_name,
+			"size": self.size,
+			"last_access": self.last_access,
+			"hits": self.hits,
+			"info": self.info,
+		}
+
+	@classmethod
+	def from_dict(cls, data: dict) -> "CacheEntry":
+		return cls(
+			data["file"],
+			int(data["size"]),
+			float(data["last_access"]),
+			int(data["hits"]),
+			data.get("info"),
+		)
+
+
+class TrackCache:
+	"""
+	Persistent cache of the downloaded tracks, keyed by Deezer SNG_ID and quality.
+
+	An index stored next to the files keeps their size, last access and hit count, so that
+	tracks survive a restart. It also keeps the track info needed to build a Track, so that
+	a cached track is served without calling Deezer. The least recently used tracks are
+	removed once the cache exceeds its byte budget or the disk is running out of space,
+	except the ones used recently, which can be queued or playing.
+	Tracks of the folder which are not in the index, like an interrupted download, are
+	removed on load.
+
+	Within an event loop, the index is saved a few seconds after a change, in an executor,
+	so a burst of downloads only writes it once. `flush` saves what is pending.
+	"""
+
+	def __init__(
+		self,
+		folder: str,
+		max_size: int,
+		min_free_space: int = 512 * 1024 * 1024,
+		index_name: str = "cache_index.json",
+		save_delay: float = 5,
+		min_age: float = 3600,
+	):
+		"""
+		Parameters:
+		- folder (str): Directory of the cached tracks.
+		- max_size (int): Bytes the cached tracks can take.
+		- min_free_space (int): Bytes to keep available on the disk.
+		- index_name (str): Name of the index file, in the folder.
+		- save_delay (float): Seconds between a change and the save of the index.
+		- min_age (float): Seconds since their last access before tracks can be evicted.
+		"""
+		self.folder = folder
+		self.max_size = max_size
+		self.min_free_space = min_free_space
+		self.index_path = os.path.join(folder, index_name)
+		self.size = 0
+		self.stats = CacheStats()
+		self.save_delay = save_delay
+		self.min_age = min_age
+		self.__entries: dict[str, CacheEntry] = {}
+		self.__save_timer: asyncio.TimerHandle | None = None
+		self.__saving: asyncio.Future[None] | None = None
+		self.__write_lock = threading.Lock()
+		# Versions of the index dumped and written, an older dump is never written over a newer one
+		self.__dumped = 0
+		self.__written = 0
+		os.makedirs(folder, exist_ok=True)
+		self.load()
+
+	@staticmethod
+	def key(track_id: int | str, quality: str) -> str:
+		return f"{track_id}_{quality}"
+
+	def path(self, key: str) -> str:
+		"""
+		Path where the track of a key is downloaded.
+		"""
+		return os.path.join(self.folder, f"{key}.mp3")
+
+	def get(self, key: str) -> str | None:
+		"""
+		Path of a cached track, or None if it is not in the cache.
+		"""
+		entry = self.__entries.get(key)
+		if entry is None:
+			return None
+		file_path = os.path.join(self.folder, entry.file_name)
+		if not os.path.isfile(file_path):
+			self.__remove(key)
+			self.schedule_save()
+			return None
+		entry.last_access = time.time()
+		entry.hits += 1
+		# The last access decides what is evicted after a restart
+		self.schedule_save()
+		return file_path
+
+	def get_track_info(self, key: str) -> tuple[str, dict] | None:
+		"""
+		Path and track info of a cached track, or None if it is not in the cache
+		or its info is unknown.
+		"""
+		entry = self.__entries.get(key)
+		if entry is None or entry.info is None:
+			return None
+		file_path = self.get(key)
+		if file_path is None:
+			return None
+		return file_path, entry.info
+
+	def add(self, key: str, file_path: str, track_info: dict | None = None):
+		"""
+		Register a track fully downloaded, then evict other tracks if needed.
+		"""
+		size = os.path.getsize(file_path)
+		previous = self.__entries.get(key)
+		if previous is not None:
+			self.size -= previous.size
+		info = None
+		if track_info is not None:
+			info = {field: track_info[field] for field in TRACK_INFO_FIELDS if field in track_info}
+			info["ARTISTS"] = [
+				{"ART_NAME": artist["ART_NAME"]} for artist in track_info.get("ARTISTS", [])
+			]
+		self.__entries[key] = CacheEntry(os.path.basename(file_path), size, info=info)
+		self.size += size
+		self.evict(keep=key)
+		self.schedule_save()
+
+	def evict(self, keep: str | None = None):
+		"""
+		Remove the least recently used tracks until the cache fits in its budget.
+		Tracks accessed within `min_age` are kept, the queued and playing tracks have been
+		downloaded or accessed a few tracks before being played.
+		"""
+		available_space = utils.get_available_space(self.folder)
+		if self.max_size >= self.size and available_space >= self.min_free_space:
+			return
+		oldest_access = time.time() - self.min_age
+		candidates = sorted(
+			(
+				key
+				for key, entry in self.__entries.items()
+				if key != keep and entry.last_access <= oldest_access
+			),
+			key=lambda key: self.__entries[key].last_access,
+		)
+		for key in candidates:
+			if self.max_size >= self.size and available_space >= self.min_free_space:
+				return
+			entry = self.__entries[key]
+			logger.info(
+				"Track cache evicts %s (%d bytes, %d hits)", entry.file_name, entry.size, entry.hits
+			)
+			self.__remove(key)
+			try:
+				os.remove(os.path.join(self.folder, entry.file_name))
+				available_space += entry.size
+			except FileNotFoundError:
+				pass
+			except OSError as e:
+				logger.warning("Failed to delete %s due to %s", entry.file_name, e)
+		if self.max_size < self.size or available_space < self.min_free_space:
+			logger.warning(
+				"Track cache takes %d bytes with %d bytes available, its other tracks are in use",
+				self.size,
+				available_space,
+			)
+
+	def count(self) -> int:
+		return len(self.__entries)
+
+	def load(self):
+		self.__entries = {}
+		self.size = 0
+		try:
+			with open(self.index_path, "r", encoding="utf-8") as f:
+				raw = json.load(f)
+			for key, value in raw.items():
+				self.__entries[key] = CacheEntry.from_dict(value)
+		except FileNotFoundError:
+			pass
+		except (ValueError, KeyError, TypeError, AttributeError) as err:
+			logger.warning(
+				"Track cache index '%s' is invalid, the cache is cleared : %s", self.index_path, err
+			)
+			self.__entries = {}
+
+		indexed = set()
+		for key, entry in list(self.__entries.items()):
+			file_path = os.path.join(self.folder, entry.file_name)
+			if not os.path.isfile(file_path):
+				del self.__entries[key]
+				continue
+			size = os.path.getsize(file_path)
+			if entry.size > 0 and size != entry.size:
+				# Changed since it has been indexed, it is deleted with the unindexed files
+				logger.warning("Cached track '%s' has been altered, it is removed", file_path)
+				del self.__entries[key]
+				continue
+			entry.size = size
+			self.size += entry.size
+			indexed.add(entry.file_name)
+
+		for file_name in os.listdir(self.folder):
+			# Other files of the folder, like the index, are not tracks
+			if file_name in indexed or not file_name.endswith(".mp3"):
+				continue
+			file_path = os.path.join(self.folder, file_name)
+			try:
+				if os.path.isfile(file_path):
+					os.remove(file_path)
+			except OSError as e:
+				logger.warning("Failed to delete %s due to %s", file_path, e)
+
+		self.evict()
+		self.save()
+
+	def save(self):
+		self.__write(*self.__dump())
+
+	def schedule_save(self):
+		"""
+		Save the index after `save_delay`, or right now outside of an event loop.
+		"""
+		try:
+			loop = asyncio.get_running_loop()
+		except RuntimeError:
+			self.save()
+			return
+		if self.__save_timer is None:
+			self.__save_timer = loop.call_later(self.save_delay, self.__save_in_executor)
+
+	def flush(self):
+		"""
+		Save the index now, instead of the pending save.
+		"""
+		if self.__save_timer is not None:
+			self.__save_timer.cancel()
+			self.__save_timer = None
+		self.save()
+
+	def __save_in_executor(self):
+		loop = asyncio.get_running_loop()
+		if self.__saving is not None and not self.__saving.done():
+			# The previous save is still being written
+			self.__save_timer = loop.call_later(self.save_delay, self.__save_in_executor)
+			return
+		self.__save_timer = None
+		# Serialized on the loop, the entries can't change while they are dumped
+		self.__saving = loop.run_in_executor(None, self.__write, *self.__dump())
+		self.__saving.add_done_callback(self.__saved)
+
+	def __saved(self, future: asyncio.Future[None]):
+		if not future.cancelled() and future.exception() is not None:
+			logger.warning("Unable to save the track cache index", exc_info=future.exception())
+
+	def __dump(self) -> tuple[int, str]:
+		self.__dumped += 1
+		entries = {key: entry.to_dict() for key, entry in self.__entries.items()}
+		return self.__dumped, json.dumps(entries)
+
+	def __write(self, version: int, data: str):
+		with self.__write_lock:
+			if version < self.__written:
+				return
+			tmp_path = self.index_path + ".tmp"
+			with open(tmp_path, "w", encoding="utf-8") as f:
+				f.write(data)
+			os.replace(tmp_path, self.index_path)
+			self.__written = version
+
+	def __remove(self, key: str):
+		entry = self.__entries.pop(key, None)
+		if entry is not None:
+			self.size -= entry.size
@@ -32,6 +32,7 @@ from pyramid.data.functional.messages.message_sender_queued import MessageSender
 from pyramid.data.health import HealthModules
 from pyramid.connector.discord.music_player_interface import MusicPlayerInterface
 from pyramid.tools.configuration.configuration import Configuration
+from pyramid.tools.loop_monitor import LoopLagMonitor
 
 
 class DiscordBot:
@@ -43,6 +44,7 @@ class DiscordBot:
 		self.__environment: Environment = config.mode
 		self.__engine_source = EngineSource(config)
 		self.__started = time.time()
+		self.__loop_monitor = LoopLagMonitor(logger=logger)
 
 		intents = discord.Intents.default()
 		# intents.members = True
@@ -138,6 +140,7 @@ class DiscordBot:
 		self.cmd.register()
 
 	async def start(self):
+		self.__loop_monitor.start()
 		try:
 			self.__logger.info("Discord bot login")
 			await self.bot.login(self.__token)
@@ -153,6 +156,11 @@ class DiscordBot:
 		# self.bot.clear()
 		logging.info("Discord bot stop")
 		await self.bot.close()
+		for instances in self.guilds_instances.values():
+			instances.data.prefetcher.close()
+		await self.__engine_source.close()
+		await self.__loop_monitor.stop()
+		self.__logger.info(self.__loop_monitor)
 		logging.info("Discord bot stopped")
 
 	def __get_guild_cmd(self, guild: Guild) -> GuildCmd:
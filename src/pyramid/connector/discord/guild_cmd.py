@@ -1,3 +1,4 @@
+import time
 from logging import Logger
 
 from discord import Interaction, Member, User, VoiceChannel
@@ -255,18 +256,32 @@ class GuildCmd(AGuildCmd, GuildCmdTools):
 
 		ms.edit_message(f"Searching **{url}** ...", "search")
 
+		searched = (0, 0)
+		last_update = 0.0
+
+		def progress(resolved: int, unresolved: int):
+			nonlocal searched, last_update
+			searched = (resolved, unresolved)
+			# A message edit for each track would only be rate limited by Discord
+			if time.monotonic() - last_update >= 1:
+				last_update = time.monotonic()
+				ms.edit_message(
+					f"Searching **{url}** ... {resolved} found, {unresolved} not found", "search"
+				)
+
 		try:
-			result = await self.data.search_engine.search_by_url(url)
+			result = await self.data.search_engine.search_by_url_stream(url, progress)
 		except DiscordMessageException as err:
 			ms.edit_message(err.msg, "search")
 			return False
 
-		if isinstance(result, tuple):
-			tracks, tracks_unfindable = result
-			self._informs_unfindable_tracks(ms, tracks_unfindable)
-			return await self._execute_play_multiple(ms, voice_channel, tracks, at_end=at_end)
-		elif isinstance(result, TrackMinimal):
+		if isinstance(result, TrackMinimal):
 			tracks = result
 			return await self._execute_play(ms, voice_channel, tracks, at_end=at_end)
-		else:
-			raise Exception("Unknown type 'res'")
+
+		played = await self._execute_play_stream(ms, voice_channel, result, at_end=at_end)
+		if searched != (0, 0):
+			ms.edit_message(
+				f"**{url}** searched : {searched[0]} found, {searched[1]} not found", "search"
+			)
+		return played
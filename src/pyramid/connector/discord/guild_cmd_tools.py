@@ -1,16 +1,19 @@
 import logging
 import traceback
+from collections.abc import AsyncIterator
 from typing import Union
 from discord.abc import Messageable
 from discord import Member, StageChannel, TextChannel, User, VoiceChannel, VoiceClient, VoiceState
 
+from pyramid.data.a_search import TracksPage
 from pyramid.data.exceptions import DeezerTokenException
-from pyramid.data.track import Track, TrackMinimal, TrackMinimalDeezer
+from pyramid.data.track import Track, TrackMinimal
 from pyramid.data.guild_data import GuildData
 from pyramid.data.tracklist import TrackList
 from pyramid.connector.discord.guild_queue import GuildQueue
 from pyramid.data.functional.messages.message_sender_queued import MessageSenderQueued
 from pyramid.data.functional.engine_source import EngineSource
+from pyramid.data.functional.track_prefetcher import PrefetchProgress
 
 
 class GuildCmdTools:
@@ -113,53 +116,56 @@ class GuildCmdTools:
 					)
 				)
 
-	async def _execute_play_multiple(
+	async def _execute_play_stream(
 		self,
 		ms: MessageSenderQueued,
 		voice_channel: VoiceChannel,
-		tracks: list[TrackMinimal] | list[TrackMinimalDeezer],
+		pages: AsyncIterator[TracksPage],
 		at_end=True,
 	) -> bool:
 		tl: TrackList = self.data.track_list
 
-		length = len(tracks)
-		ms.edit_message(f"Downloading ... 0/{length}", "download")
-
-		cant_dl = 0
-		for i, track in enumerate(tracks):
-			try:
-				track_downloaded: Track | None = await self.engine_source.download_track(track)
-			except DeezerTokenException as err:
-				ms.add_message("😥 **There are currently no music accounts available**. Try again later.")
-				return False
-			except Exception as err:
-				ms.add_message("😓 **Unable to connect to music API**. Try again later.")
-				return False
-			if not track_downloaded:
-				ms.add_message(content=f"ERROR > **{track.get_full_name()}** can't be downloaded.")
-				cant_dl += 1
-				continue
-			if (at_end and not tl.add_track(track_downloaded)) or (
-				not at_end and not tl.add_track_after(track_downloaded)
-			):
-				ms.add_message(
-					content=f"ERROR > **{track.get_full_name()}** can't be add to the queue."
-				)
-				cant_dl += 1
-				continue
-			ms.edit_message(f"Downloading ... {i + 1 - cant_dl}/{length - cant_dl}", "download")
-			if i == 0:
-				await self.queue.goto_channel(voice_channel)
-				await self.queue.play(ms)
-
-		if length == cant_dl:
-			ms.edit_message("None of the music could be downloaded", "download")
+		length = 0
+		searching = True
+		tracks_unfindable: list[TrackMinimal] = []
+		last: TrackMinimal | None = None
+
+		def status() -> str:
+			text = f"**{length}** tracks have been added to the queue"
+			if searching:
+				text += " ..."
+			if progress.downloaded != 0:
+				# Only the next tracks of the queue are downloaded, not the whole playlist
+				text += f"\n**{progress.downloaded}** downloaded and ready to play"
+			return text
+
+		progress = PrefetchProgress(lambda _: ms.edit_message(status(), "download"))
+		try:
+			async for tracks, page_unfindable in pages:
+				tracks_unfindable.extend(page_unfindable)
+				if not tracks:
+					continue
+				# Tracks are queued with their metadata, the prefetcher downloads the next ones
+				tl.add_pending_tracks(tracks, at_end, last)
+				progress.add(tracks)
+				self.data.prefetcher.watch(progress)
+				self.data.prefetcher.refresh()
+				last = tracks[-1]
+				first_page = length == 0
+				length += len(tracks)
+				ms.edit_message(status(), "download")
+				# The music starts while the next pages are searched
+				if first_page:
+					await self.queue.goto_channel(voice_channel)
+					await self.queue.play(ms)
+		finally:
+			self._informs_unfindable_tracks(ms, tracks_unfindable)
+
+		searching = False
+		if length == 0:
+			ms.edit_message("None of the music could be found", "download")
 			return False
-
-		await self.queue.goto_channel(voice_channel)
-
-		if await self.queue.play(ms) is False:
-			ms.edit_message(f"**{length}** tracks have been added to the queue", "download")
+		ms.edit_message(status(), "download")
 		return True
 
 	async def _execute_play(
@@ -169,7 +175,9 @@ class GuildCmdTools:
 		ms.edit_message(f"**{track.get_full_name()}** found ! Downloading ...", "download")
 
 		try:
-			track_downloaded: Track | None = await self.engine_source.download_track(track)
+			track_downloaded: Track | None = await self.engine_source.download_track(
+				track, tl.is_empty()
+			)
 		except DeezerTokenException as err:
 			ms.add_message("😥 **There are currently no music accounts available**. Try again later.")
 			return False
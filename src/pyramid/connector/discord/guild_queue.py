@@ -4,6 +4,7 @@ import sys
 import discord
 from discord import VoiceChannel, VoiceClient
 
+from pyramid.data.exceptions import DeezerTokenException
 from pyramid.data.track import Track
 from pyramid.data.tracklist import TrackList
 from pyramid.data.guild_data import GuildData
@@ -18,6 +19,7 @@ class GuildQueue(AGuildQueue):
 		self.ffmpeg = ffmpeg_path
 		self.song_end_action = self.__song_end_continue
 		self.mpi = mpi
+		self.__play_lock = asyncio.Lock()
 
 	def is_playing(self) -> bool:
 		return self.data.voice_client.is_playing()
@@ -37,6 +39,11 @@ class GuildQueue(AGuildQueue):
 		return False
 
 	async def play(self, msg_sender: MessageSenderQueued) -> bool:
+		# The first track may be downloaded before playing, it must not be started twice
+		async with self.__play_lock:
+			return await self.__play(msg_sender)
+
+	async def __play(self, msg_sender: MessageSenderQueued) -> bool:
 		tl: TrackList = self.data.track_list
 		vc: VoiceClient = self.data.voice_client
 
@@ -54,12 +61,21 @@ class GuildQueue(AGuildQueue):
 			vc.resume()
 			return True
 
-		track: Track = tl.first_song()
+		track = await self.__first_track(msg_sender)
+		self.data.prefetcher.refresh()
+		if track is None:
+			return False
 
 		# Prepare codex to play song
-		original_source = discord.FFmpegPCMAudio(
-			track.file_local, executable=self.ffmpeg, stderr=sys.stderr
-		)
+		if track.stream is not None and not track.stream.finished:
+			# Track still downloading, FFmpeg follows the file as it is written
+			original_source = discord.FFmpegPCMAudio(
+				track.stream.open(), pipe=True, executable=self.ffmpeg, stderr=sys.stderr
+			)
+		else:
+			original_source = discord.FFmpegPCMAudio(
+				track.file_local, executable=self.ffmpeg, stderr=sys.stderr
+			)
 		source = discord.PCMVolumeTransformer(original_source)
 		source.volume = float(0.025)
 
@@ -75,6 +91,36 @@ class GuildQueue(AGuildQueue):
 		await self.mpi.send_player(msg_sender.txt_channel, track, msg_sender.ctx.locale)
 		return True
 
+	async def __first_track(self, msg_sender: MessageSenderQueued) -> Track | None:
+		"""
+		First track of the queue, downloaded if it was queued with its metadata only.
+		Entries which can't be downloaded are removed from the queue.
+		"""
+		tl: TrackList = self.data.track_list
+
+		while not tl.is_empty():
+			entry = tl.first_song()
+			if isinstance(entry, Track):
+				return entry
+
+			try:
+				track = await self.data.prefetcher.get(entry)
+			except DeezerTokenException:
+				msg_sender.add_message(
+					"😥 **There are currently no music accounts available**. Try again later."
+				)
+				return None
+			except Exception:  # noqa: BLE001 - logged by the prefetcher
+				msg_sender.add_message("😓 **Unable to connect to music API**. Try again later.")
+				return None
+
+			if track is not None:
+				return track
+			msg_sender.add_message(f"ERROR > **{entry.get_full_name()}** can't be downloaded.")
+			if tl.contains(entry):
+				tl.remove_song()
+		return None
+
 	def stop(self) -> bool:
 		vc: VoiceClient = self.data.voice_client
 		if vc is None:
@@ -92,6 +138,7 @@ class GuildQueue(AGuildQueue):
 			return False
 		if vc.is_connected():
 			await vc.disconnect()
+			self.data.prefetcher.close()
 			return True
 		return False
 
@@ -135,6 +182,7 @@ class GuildQueue(AGuildQueue):
 		tl: TrackList = self.data.track_list
 		if vc is None or not tl.shuffle(vc.is_playing() or vc.is_paused()):
 			return False
+		self.data.prefetcher.refresh()
 		return True
 
 	def remove(self, index: int) -> Track | None:
@@ -143,7 +191,9 @@ class GuildQueue(AGuildQueue):
 		if vc is None:
 			return None
 
-		return tl.remove(index)
+		track = tl.remove(index)
+		self.data.prefetcher.refresh()
+		return track
 
 	def goto(self, index: int) -> int:
 		vc: VoiceClient = self.data.voice_client
@@ -152,6 +202,7 @@ class GuildQueue(AGuildQueue):
 			return -1
 		tracks_removed = tl.remove_to(index)
 		if tracks_removed > 0:
+			self.data.prefetcher.refresh()
 			self.next()
 		return tracks_removed
 
@@ -179,11 +230,10 @@ class GuildQueue(AGuildQueue):
 		if tl.is_empty() is False:
 			tl.remove_song()
 
-		if tl.is_empty():
+		if tl.is_empty() or (await self.play(msg_sender) is False and tl.is_empty()):
 			await vc.disconnect()
+			self.data.prefetcher.close()
 			msg_sender.add_message("Bye bye")
-		else:
-			await self.play(msg_sender)
 
 	async def __song_end_next(self, err: Exception | None, msg_sender: MessageSenderQueued):
 		tl: TrackList = self.data.track_list
@@ -199,3 +249,4 @@ class GuildQueue(AGuildQueue):
 		tl: TrackList = self.data.track_list
 
 		tl.clear()
+		self.data.prefetcher.refresh()
@@ -1,13 +1,50 @@
+import asyncio
 import json
 import logging
-from venv import logger
+from collections import deque
+from collections.abc import AsyncIterator
+from typing import Any
+from urllib.parse import parse_qs, urlencode, urlparse
 
 import aiohttp
 from spotipy import Spotify
 from spotipy.exceptions import SpotifyException
+from spotipy.oauth2 import SpotifyClientCredentials
+
+from pyramid.connector.spotify.client_credentials import AsyncClientCredentials
+from pyramid.tools.http_session import PooledSession
+from pyramid.tools.single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
 
 
 class CliSpotify(Spotify):
+	# Longest Retry-After waited on a 429 response, a longer one is raised
+	max_retry_after: float = 60
+
+	def __init__(self, *args, limit: int = 100, limit_per_host: int = 10, **kwargs):
+		super().__init__(*args, **kwargs)
+		self.async_session = PooledSession(limit=limit, limit_per_host=limit_per_host)
+		self.in_flight = SingleFlight()
+		# The token of the client credentials is got without blocking the event loop
+		self.async_credentials: AsyncClientCredentials | None = None
+		if isinstance(self.auth_manager, SpotifyClientCredentials):
+			self.async_credentials = AsyncClientCredentials(
+				self.auth_manager.client_id, self.auth_manager.client_secret, self.async_session
+			)
+
+	async def close(self):
+		"""
+		Close the pooled connections used by the async calls.
+		"""
+		for stats in self.async_session.stats.values():
+			logger.info("Spotify HTTP %s", stats)
+		logger.info("Spotify requests %s", self.in_flight)
+		if self.async_credentials is not None:
+			logger.info("Spotify token %s", self.async_credentials.stats)
+			await self.async_credentials.close()
+		await self.async_session.close()
+
 	async def async_search(self, q, limit=10, offset=0, type="track", market=None):
 		return await self._get_async(
 			"search", q=q, limit=limit, offset=offset, type=type, market=market
@@ -17,6 +54,22 @@ class CliSpotify(Spotify):
 		trid = self._get_id("track", track_id)
 		return await self._get_async("tracks/" + trid, market=market)
 
+	async def async_tracks(self, track_ids: list[str], market=None) -> list[dict[str, Any] | None]:
+		"""
+		Get several tracks, in the given order, with one request per 50 tracks.
+		Tracks not found are None.
+		"""
+		tlist = [self._get_id("track", t) for t in track_ids]
+		return await self._get_several_async("tracks", "tracks", tlist, 50, market=market)
+
+	async def async_albums(self, album_ids: list[str], market=None) -> list[dict[str, Any] | None]:
+		"""
+		Get several albums, in the given order, with one request per 20 albums.
+		Albums not found are None.
+		"""
+		tlist = [self._get_id("album", a) for a in album_ids]
+		return await self._get_several_async("albums", "albums", tlist, 20, market=market)
+
 	async def async_playlist_items(
 		self,
 		playlist_id,
@@ -52,17 +105,89 @@ class CliSpotify(Spotify):
 		else:
 			return None
 
+	async def async_page(self, result: dict[str, Any], offset: int):
+		"""
+		Get the page of a paginated result which starts at `offset`, with the same limit.
+		"""
+		url = urlparse(result["href"])
+		query = parse_qs(url.query)
+		query["offset"] = [str(offset)]
+		query["limit"] = [str(result["limit"])]
+		return await self._get_async(url._replace(query=urlencode(query, doseq=True)).geturl())
+
+	async def async_iter_pages(
+		self,
+		result: dict[str, Any],
+		max_in_flight: int = 4,
+		max_items: int | None = None,
+		page_key: str | None = None,
+	) -> AsyncIterator[dict[str, Any]]:
+		"""
+		Pages of a paginated result in order, starting with the given one.
+
+		Spotify gives the total and the offset of each page, so the pages left are
+		requested by offset, up to `max_in_flight` at the same time.
+
+		:param max_items: Stop once this number of items is reached.
+		:param page_key: Key of the page in the responses, as 'tracks' for a search.
+		"""
+
+		async def get_page(coroutine) -> dict[str, Any]:
+			response = await coroutine
+			return response[page_key] if page_key is not None and response else response
+
+		yield result
+		if not result.get("next"):
+			return
+
+		total = result.get("total")
+		limit = result.get("limit")
+		if total is None or not limit or not result.get("href"):
+			while result and result["next"]:
+				result = await get_page(self.async_next(result))
+				if result:
+					yield result
+			return
+
+		end = total if max_items is None else min(total, result["offset"] + max_items)
+		pending: deque[asyncio.Task] = deque()
+		try:
+			for offset in range(result["offset"] + limit, end, limit):
+				pending.append(asyncio.create_task(get_page(self.async_page(result, offset))))
+				if len(pending) >= max_in_flight:
+					yield await pending.popleft()
+			while pending:
+				yield await pending.popleft()
+		finally:
+			for task in pending:
+				task.cancel()
+
+	async def _get_several_async(
+		self, url: str, key: str, ids: list[str], batch_size: int, **kwargs
+	) -> list[Any]:
+		batches = [ids[i : i + batch_size] for i in range(0, len(ids), batch_size)]
+		results = await asyncio.gather(
+			*(self._get_async(url, ids=",".join(batch), **kwargs) for batch in batches)
+		)
+		return [element for result in results for element in result[key]]
+
 	async def _get_async(self, url, args=None, payload=None, **kwargs):
 		if args:
 			kwargs.update(args)
 
-		return await self._async_internal_call("GET", url, payload, kwargs)
+		if payload is not None:
+			return await self._async_internal_call("GET", url, payload, kwargs)
+		# Identical requests sent at the same time share the same results, which are not copied
+		key = (url, tuple(sorted((k, str(v)) for k, v in kwargs.items())))
+		return await self.in_flight.run(
+			key, lambda: self._async_internal_call("GET", url, payload, kwargs)
+		)
 
 	async def _async_internal_call(self, method, url, payload, params):
 		args = dict(params=params)
 		if not url.startswith("http"):
 			url = self.prefix + url
-		headers = self._auth_headers()
+		headers = await self._async_auth_headers()
 
 		if "content_type" in args["params"]:
 			headers["Content-Type"] = args["params"]["content_type"]
@@ -82,7 +207,7 @@ class CliSpotify(Spotify):
 			if "params" in args
 			else dict()
 		)
-		logging.debug(
+		logger.debug(
 			"Sending %s to %s with Params: %s Headers: %s and Body: %r ",
 			method,
 			url,
@@ -90,7 +215,9 @@ class CliSpotify(Spotify):
 			headers,
 			args.get("data"),
 		)
-		async with aiohttp.ClientSession() as session:
+		session = self.async_session.get()
+		retries = 0
+		while True:
 			async with session.request(
 				method,
 				url,
@@ -99,6 +226,15 @@ class CliSpotify(Spotify):
 				timeout=self.requests_timeout,
 				params=params,
 			) as response:
+				retry_after = self._retry_after(response, retries)
+				if retry_after is not None:
+					logger.warning(
+						"Spotify rate limit for %s to %s - wait %.1f secs", method, url, retry_after
+					)
+					retries += 1
+					await asyncio.sleep(retry_after)
+					continue
+
 				try:
 					response.raise_for_status()
 					results = await response.json()
@@ -108,7 +244,7 @@ class CliSpotify(Spotify):
 						error = json_response.get("error", {})
 						msg = error.get("message")
 						reason = error.get("reason")
-					except json.JSONDecodeError:
+					except (json.JSONDecodeError, aiohttp.ContentTypeError):
 						msg = await response.text() or None
 						reason = None
 
@@ -127,6 +263,33 @@ class CliSpotify(Spotify):
 						reason=reason,
 						headers=response.headers,
 					)
+				break
 
 		logger.debug("RESULTS: %s", results)
 		return results
+
+	async def _async_auth_headers(self) -> dict[str, str]:
+		if self._auth:
+			return {"Authorization": f"Bearer {self._auth}"}
+		if self.async_credentials is not None:
+			token = await self.async_credentials.get_access_token()
+			return {"Authorization": f"Bearer {token}"}
+		if not self.auth_manager:
+			return {}
+		# Other auth managers are synchronous and may request a token
+		return await asyncio.to_thread(self._auth_headers)
+
+	def _retry_after(self, response: aiohttp.ClientResponse, retries: int) -> float | None:
+		"""
+		Seconds to wait before sending again a request which has been rate limited,
+		None if the response must be handled as is.
+		"""
+		if response.status != 429 or retries >= self.retries:
+			return None
+		try:
+			retry_after = float(response.headers.get("Retry-After", 1))
+		except ValueError:
+			retry_after = 1
+		if retry_after > self.max_retry_after:
+			return None
+		return max(0, retry_after)
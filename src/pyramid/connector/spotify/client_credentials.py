@@ -0,0 +1,124 @@
+import asyncio
+import base64
+import logging
+import time
+
+import aiohttp
+from spotipy.oauth2 import SpotifyOauthError
+
+from pyramid.tools.http_session import PooledSession
+
+logger = logging.getLogger(__name__)
+
+
+class TokenStats:
+	def __init__(self):
+		self.refreshes = 0
+		self.failures = 0
+		self.waits = 0
+		self.total_latency = 0.0
+
+	def average_latency(self) -> float:
+		if self.refreshes == 0:
+			return 0.0
+		return self.total_latency / self.refreshes
+
+	def __str__(self):
+		return (
+			f"{self.refreshes} refreshes ({self.failures} failures), "
+			f"avg {self.average_latency() * 1000:.1f} ms, {self.waits} requests waited for a token"
+		)
+
+
+class AsyncClientCredentials:
+	"""
+	Client credentials flow of Spotify, without blocking the event loop.
+
+	The token is cached until it expires. Once it is about to expire, it is refreshed in
+	the background while the current one is still given, so requests only wait for a token
+	when there is none valid. Concurrent callers share the same refresh.
+	"""
+
+	OAUTH_TOKEN_URL = "https://accounts.spotify.com/api/token"
+
+	def __init__(
+		self,
+		client_id: str,
+		client_secret: str,
+		session: PooledSession,
+		refresh_margin: float = 300,
+		token_url: str = OAUTH_TOKEN_URL,
+	):
+		"""
+		Parameters:
+		- client_id (str): Id of the Spotify application.
+		- client_secret (str): Secret of the Spotify application.
+		- session (PooledSession): Session used to request the token.
+		- refresh_margin (float): Seconds before the expiration from which the token is refreshed.
+		- token_url (str): URL of the token endpoint.
+		"""
+		self.client_id = client_id
+		self.client_secret = client_secret
+		self.session = session
+		self.refresh_margin = refresh_margin
+		self.token_url = token_url
+		self.stats = TokenStats()
+		self.__token: str | None = None
+		self.__expires_at = 0.0
+		self.__refresh_task: asyncio.Task | None = None
+
+	async def get_access_token(self) -> str:
+		now = time.time()
+		if self.__token is not None and now < self.__expires_at:
+			if now >= self.__expires_at - self.refresh_margin:
+				self.__start_refresh()
+			return self.__token
+
+		self.stats.waits += 1
+		return await asyncio.shield(self.__start_refresh())
+
+	async def close(self):
+		if self.__refresh_task is not None:
+			self.__refresh_task.cancel()
+			self.__refresh_task = None
+
+	def __start_refresh(self) -> asyncio.Task:
+		if self.__refresh_task is None or self.__refresh_task.done():
+			self.__refresh_task = asyncio.create_task(self.__refresh())
+			self.__refresh_task.add_done_callback(self.__refresh_done)
+		return self.__refresh_task
+
+	def __refresh_done(self, task: asyncio.Task):
+		if not task.cancelled() and task.exception() is not None:
+			logger.warning("Spotify token refresh failed : %s", task.exception())
+
+	async def __refresh(self) -> str:
+		auth = base64.b64encode(f"{self.client_id}:{self.client_secret}".encode("ascii"))
+		headers = {"Authorization": f"Basic {auth.decode('ascii')}"}
+		start = time.perf_counter()
+		try:
+			async with self.session.get().post(
+				self.token_url, data={"grant_type": "client_credentials"}, headers=headers
+			) as response:
+				if response.status != 200:
+					try:
+						error = await response.json()
+					except (ValueError, aiohttp.ContentTypeError):
+						error = {}
+					raise SpotifyOauthError(
+						f"error: {error.get('error')}, "
+						f"error_description: {error.get('error_description')}",
+						error=error.get("error"),
+						error_description=error.get("error_description"),
+					)
+				token_info = await response.json()
+		except Exception:
+			self.stats.failures += 1
+			raise
+
+		self.stats.refreshes += 1
+		self.stats.total_latency += time.perf_counter() - start
+		self.__token = token_info["access_token"]
+		self.__expires_at = time.time() + token_info["expires_in"]
+		logger.debug("Spotify token refreshed, expires in %d secs", token_info["expires_in"])
+		return token_info["access_token"]
@@ -1,9 +1,10 @@
 import re
+from collections.abc import AsyncIterator, Callable
 from enum import Enum
 from typing import Any
 
 from pyramid.data.a_engine_tools import AEngineTools
-from pyramid.data.a_search import ASearch, ASearchId
+from pyramid.data.a_search import ASearch, ASearchId, single_page
 from pyramid.data.track import TrackMinimalSpotify
 from spotipy.oauth2 import SpotifyClientCredentials
 
@@ -11,51 +12,82 @@ from pyramid.connector.spotify.cli_spotify import CliSpotify
 
 
 class SpotifySearchBase(ASearch):
-	def __init__(self, default_limit: int, client_id: str, client_secret: str):
+	def __init__(
+		self,
+		default_limit: int,
+		client_id: str,
+		client_secret: str,
+		max_pages_in_flight: int = 4,
+		http_connections: int = 100,
+		http_connections_per_host: int = 10,
+	):
+		"""
+		:param max_pages_in_flight: Maximum number of pages of a result requested at the same time.
+		:param http_connections: Maximum number of connections of the async calls.
+		:param http_connections_per_host: Maximum number of connections to the same host.
+		"""
 		self.default_limit = default_limit
 		self.client_id = client_id
 		self.client_secret = client_secret
+		self.max_pages_in_flight = max_pages_in_flight
 		self.client_credentials_manager = SpotifyClientCredentials(
 			client_id=self.client_id, client_secret=self.client_secret
 		)
-		self.client = CliSpotify(client_credentials_manager=self.client_credentials_manager)
+		self.client = CliSpotify(
+			client_credentials_manager=self.client_credentials_manager,
+			limit=http_connections,
+			limit_per_host=http_connections_per_host,
+		)
 		self.tools = SpotifyTools()
 
+	async def close(self):
+		await self.client.close()
+
 	async def items(
 		self, results: dict[str, Any], item_name="items"
 	) -> None | list[dict[str, Any]]:
 		if not results:
 			return None
-		tracks: list = results[item_name]
-
-		while results["next"]:
-			results = await self.client.async_next(results)  # type: ignore
-			tracks.extend(results[item_name])
-
+		tracks: list = []
+		async for page in self.iter_items(results, item_name):
+			tracks.extend(page)
 		return tracks
 
-	async def items_max(self, results: dict[str, Any], limit: int | None = None, item_name="items"):
-		if not results or not results.get("tracks") or not results["tracks"].get(item_name):
-			return None
+	async def iter_items(
+		self, results: dict[str, Any], item_name="items"
+	) -> AsyncIterator[list[dict[str, Any]]]:
+		"""
+		Same as `items`, but each page is given, in order, as soon as it is received.
+		"""
+		if not results:
+			return
+		async for page in self.client.async_iter_pages(results, self.max_pages_in_flight):
+			yield page[item_name]
 
+	async def items_max(self, results: dict[str, Any], limit: int | None = None, item_name="items"):
 		if limit is None:
 			limit = self.default_limit
-		tracks: list[Any] = results["tracks"][item_name]
-
-		results_tracks: dict[str, Any] = results["tracks"]
-		while results["tracks"]["next"] and limit > len(tracks):
-			results = await self.client.async_next(results_tracks)  # type: ignore
-			tracks.extend(results_tracks[item_name])
-
-		if len(tracks) > limit:
-			return tracks[:limit]
-
-		return tracks
+		return await collect_items(self.client, results, limit, item_name, self.max_pages_in_flight)
 
 
 class SpotifySearchId(ASearchId, SpotifySearchBase):
-	def __init__(self, default_limit: int, client_id: str, client_secret: str):
-		super().__init__(default_limit, client_id, client_secret)
+	def __init__(
+		self,
+		default_limit: int,
+		client_id: str,
+		client_secret: str,
+		max_pages_in_flight: int = 4,
+		http_connections: int = 100,
+		http_connections_per_host: int = 10,
+	):
+		super().__init__(
+			default_limit,
+			client_id,
+			client_secret,
+			max_pages_in_flight,
+			http_connections,
+			http_connections_per_host,
+		)
 
 	async def get_track_by_id(self, track_id: str) -> TrackMinimalSpotify | None:
 		result = await self.client.async_track(track_id=track_id)
@@ -66,28 +98,49 @@ class SpotifySearchId(ASearchId, SpotifySearchBase):
 	async def get_playlist_tracks_by_id(
 		self, playlist_id: str
 	) -> tuple[list[TrackMinimalSpotify], list[TrackMinimalSpotify]] | None:
-		tracks_playlist = await self.items(
-			await self.client.async_playlist_items(playlist_id=playlist_id)
-		)
-		if not tracks_playlist:
-			return None
-		return [TrackMinimalSpotify(element["track"]) for element in tracks_playlist], []
+		return await self.__collect(self.iter_playlist_tracks_by_id(playlist_id))
+
+	async def iter_playlist_tracks_by_id(
+		self, playlist_id: str
+	) -> AsyncIterator[tuple[list[TrackMinimalSpotify], list[TrackMinimalSpotify]]]:
+		results = await self.client.async_playlist_items(playlist_id=playlist_id)
+		async for tracks_playlist in self.iter_items(results):
+			if tracks_playlist:
+				yield [TrackMinimalSpotify(element["track"]) for element in tracks_playlist], []
 
 	async def get_album_tracks_by_id(
 		self, album_id: str
 	) -> tuple[list[TrackMinimalSpotify], list[TrackMinimalSpotify]] | None:
-		tracks = await self.items(await self.client.async_album_tracks(album_id=album_id))
-		if not tracks:
-			return None
+		return await self.__collect(self.iter_album_tracks_by_id(album_id))
 
-		readable_tracks = []
-		unreadable_tracks = []
-		for t in tracks:
-			track = await self.get_track_by_id(t["id"])
-			if track is None:
-				unreadable_tracks.append(t)
-			else:
-				readable_tracks.append(track)
+	async def iter_album_tracks_by_id(
+		self, album_id: str
+	) -> AsyncIterator[tuple[list[TrackMinimalSpotify], list[TrackMinimalSpotify]]]:
+		results = await self.client.async_album_tracks(album_id=album_id)
+		async for tracks in self.iter_items(results):
+			if not tracks:
+				continue
+			# The tracks of an album lack the album and the ISRC, they are got all at once
+			full_tracks = await self.client.async_tracks([t["id"] for t in tracks])
+			readable_tracks = []
+			unreadable_tracks = []
+			for t, full_track in zip(tracks, full_tracks):
+				if full_track is None:
+					unreadable_tracks.append(t)
+				else:
+					readable_tracks.append(TrackMinimalSpotify(full_track))
+			yield readable_tracks, unreadable_tracks
+
+	async def __collect(
+		self, pages: AsyncIterator[tuple[list[TrackMinimalSpotify], list[TrackMinimalSpotify]]]
+	) -> tuple[list[TrackMinimalSpotify], list[TrackMinimalSpotify]] | None:
+		readable_tracks: list[TrackMinimalSpotify] = []
+		unreadable_tracks: list[TrackMinimalSpotify] = []
+		async for page_readable, page_unreadable in pages:
+			readable_tracks.extend(page_readable)
+			unreadable_tracks.extend(page_unreadable)
+		if not readable_tracks and not unreadable_tracks:
+			return None
 		return readable_tracks, unreadable_tracks
 
 	async def get_top_artist_by_id(
@@ -107,33 +160,68 @@ class SpotifySearchId(ASearchId, SpotifySearchBase):
 
 
 class SpotifyResponse:
-	def __init__(self, client: CliSpotify, default_limit: int, item_name="items") -> None:
+	def __init__(
+		self,
+		client: CliSpotify,
+		default_limit: int,
+		item_name="items",
+		max_pages_in_flight: int = 4,
+	) -> None:
 		self.client = client
 		self.default_limit = default_limit
 		self.item_name = item_name
+		self.max_pages_in_flight = max_pages_in_flight
 
 	async def items(self, results: dict[str, Any], limit: int | None = None):
-		if not results or not results.get("tracks") or not results["tracks"].get(self.item_name):
-			return None
-
 		if limit is None:
 			limit = self.default_limit
-		tracks: list[Any] = results["tracks"][self.item_name]
+		return await collect_items(
+			self.client, results, limit, self.item_name, self.max_pages_in_flight
+		)
 
-		results_tracks: dict[str, Any] = results["tracks"]
-		while results["tracks"]["next"] and limit > len(tracks):
-			results = await self.client.async_next(results_tracks)  # type: ignore
-			tracks.extend(results_tracks[self.item_name])
 
-		if len(tracks) > limit:
-			return tracks[:limit]
+async def collect_items(
+	client: CliSpotify,
+	results: dict[str, Any],
+	limit: int,
+	item_name="items",
+	max_pages_in_flight: int = 4,
+) -> list[Any] | None:
+	"""
+	The first `limit` items of a search result, whose pages are under the key 'tracks'.
+	"""
+	if not results or not results.get("tracks") or not results["tracks"].get(item_name):
+		return None
 
-		return tracks
+	tracks: list[Any] = []
+	pages = client.async_iter_pages(results["tracks"], max_pages_in_flight, limit, "tracks")
+	async for page in pages:
+		tracks.extend(page[item_name])
+
+	if len(tracks) > limit:
+		return tracks[:limit]
+
+	return tracks
 
 
 class SpotifySearch(SpotifySearchId):
-	def __init__(self, default_limit: int, client_id: str, client_secret: str):
-		super().__init__(default_limit, client_id, client_secret)
+	def __init__(
+		self,
+		default_limit: int,
+		client_id: str,
+		client_secret: str,
+		max_pages_in_flight: int = 4,
+		http_connections: int = 100,
+		http_connections_per_host: int = 10,
+	):
+		super().__init__(
+			default_limit,
+			client_id,
+			client_secret,
+			max_pages_in_flight,
+			http_connections,
+			http_connections_per_host,
+		)
 
 	async def search_tracks(
 		self, search, limit: int | None = None
@@ -226,6 +314,34 @@ class SpotifySearch(SpotifySearchId):
 
 		return tracks
 
+	async def get_by_url_stream(
+		self, url, progress: Callable[[int, int], None] | None = None
+	) -> (
+		AsyncIterator[tuple[list[TrackMinimalSpotify], list[TrackMinimalSpotify]]]
+		| TrackMinimalSpotify
+		| None
+	):
+		id, type = self.tools.extract_from_url(url)
+
+		if id is None:
+			return None
+		if type is None:
+			raise NotImplementedError(f"The type of spotify info '{url}' is not implemented")
+
+		if type == SpotifyType.PLAYLIST:
+			return self.iter_playlist_tracks_by_id(id)
+		elif type == SpotifyType.ALBUM:
+			return self.iter_album_tracks_by_id(id)
+		elif type == SpotifyType.ARTIST:
+			tracks = await self.get_top_artist_by_id(id)
+			if tracks is None:
+				return None
+			return single_page(tracks)  # type: ignore
+		elif type == SpotifyType.TRACK:
+			return await self.get_track_by_id(id)
+		else:
+			raise NotImplementedError(f"The type of spotify info '{type}' can't be resolve")
+
 
 class SpotifyType(Enum):
 	PLAYLIST = 1
@@ -1,8 +1,16 @@
 import abc
 from abc import ABC
+from collections.abc import AsyncIterator, Callable
 
 from pyramid.data.track import TrackMinimal
 
+# Tracks found and tracks unfindable of a part of a playlist, album or top
+TracksPage = tuple[list[TrackMinimal], list[TrackMinimal]]
+
+
+async def single_page(page: TracksPage) -> AsyncIterator[TracksPage]:
+	yield page
+
 
 class ASearch(ABC):
 	@abc.abstractmethod
@@ -31,6 +39,21 @@ class ASearch(ABC):
 	) -> tuple[list[TrackMinimal], list[TrackMinimal]] | TrackMinimal | None:
 		pass
 
+	async def get_by_url_stream(
+		self, url, progress: Callable[[int, int], None] | None = None
+	) -> AsyncIterator[TracksPage] | TrackMinimal | None:
+		"""
+		Same as `get_by_url`, but multiple tracks are given page by page as soon as they
+		are found. Engines which can't stream give all the tracks in a single page.
+
+		:param progress: Called with the number of tracks resolved and unresolved, by the
+			engines which search the tracks of a playlist one by one.
+		"""
+		result = await self.get_by_url(url)
+		if isinstance(result, tuple):
+			return single_page(result)
+		return result
+
 
 class ASearchId(ABC):
 	@abc.abstractmethod
@@ -54,3 +77,19 @@ class ASearchId(ABC):
 		self, artist_id: int | str, limit: int | None = None
 	) -> tuple[list[TrackMinimal], list[TrackMinimal]] | None:
 		pass
+
+	async def iter_playlist_tracks_by_id(self, playlist_id: int | str) -> AsyncIterator[TracksPage]:
+		"""
+		Tracks of a playlist, page by page. Nothing is yielded if the playlist is not found.
+		"""
+		result = await self.get_playlist_tracks_by_id(playlist_id)
+		if result:
+			yield result
+
+	async def iter_album_tracks_by_id(self, album_id: int | str) -> AsyncIterator[TracksPage]:
+		"""
+		Tracks of an album, page by page. Nothing is yielded if the album is not found.
+		"""
+		result = await self.get_album_tracks_by_id(album_id)
+		if result:
+			yield result
@@ -1,3 +1,7 @@
+import asyncio
+import logging
+import os
+from collections.abc import AsyncIterator, Callable
 from enum import Enum
 from typing import Dict
 
@@ -6,9 +10,12 @@ from pyramid.connector.deezer.search import DeezerSearch
 from pyramid.connector.spotify.search import SpotifySearch
 from pyramid.data.a_search import ASearch
 from pyramid.data.exceptions import EngineSourceNotFoundException, TrackNotFoundException
+from pyramid.data.functional.equivalence_cache import EquivalenceCache
 from pyramid.data.track import Track, TrackMinimal, TrackMinimalDeezer
 from pyramid.tools.configuration.configuration import Configuration
 
+logger = logging.getLogger(__name__)
+
 
 class SourceType(Enum):
 	Spotify = 1
@@ -17,10 +24,33 @@ class SourceType(Enum):
 
 class EngineSource:
 	def __init__(self, config: Configuration):
-		self.__downloader = DeezerDownloader(config.deezer__folder, config.deezer__arl)
-		self.__deezer_search = DeezerSearch(config.general__limit_tracks)
+		http_connections = max(1, config.general__http_connections)
+		http_connections_per_host = max(1, config.general__http_connections_per_host)
+		self.__downloader = DeezerDownloader(
+			config.deezer__folder,
+			config.deezer__arl,
+			config.deezer__cache_size * 1024 * 1024,
+			http_connections=http_connections,
+			http_connections_per_host=http_connections_per_host,
+		)
+		self.__deezer_search = DeezerSearch(
+			config.general__limit_tracks,
+			http_connections=http_connections,
+			http_connections_per_host=http_connections_per_host,
+		)
 		self.__spotify_search = SpotifySearch(
-			config.general__limit_tracks, config.spotify__client_id, config.spotify__client_secret
+			config.general__limit_tracks,
+			config.spotify__client_id,
+			config.spotify__client_secret,
+			http_connections=http_connections,
+			http_connections_per_host=http_connections_per_host,
+		)
+		self.__download_limit = asyncio.Semaphore(max(1, config.general__download_workers))
+		self.download_workers_guild = max(1, config.general__download_workers_guild)
+		self.prefetch_tracks = max(0, config.general__prefetch_tracks)
+		self.convert_workers = max(1, config.general__convert_workers)
+		self.equivalences = EquivalenceCache(
+			os.path.join(config.deezer__folder, "equivalences.json")
 		)
 		self.__default_source: ASearch = self.__deezer_search
 		self.__downloader_source = self.__deezer_search
@@ -31,7 +61,17 @@ class EngineSource:
 			}
 		)
 
-	async def download_track(self, track: TrackMinimal) -> Track | None:
+	async def close(self):
+		"""
+		Release the network resources held by the search engines.
+		"""
+		await self.__deezer_search.close()
+		await self.__spotify_search.close()
+		await self.__downloader.close()
+		logger.info("Equivalence cache %s", self.equivalences.stats)
+		self.equivalences.save()
+
+	async def download_track(self, track: TrackMinimal, stream: bool = False) -> Track | None:
 		track_used: TrackMinimalDeezer
 
 		if not isinstance(track, TrackMinimalDeezer):
@@ -43,7 +83,25 @@ class EngineSource:
 		else:
 			track_used = track
 
-		return await self.__downloader.dl_track_by_id(track_used.id)
+		await self.__download_limit.acquire()
+		try:
+			track = await self.__downloader.dl_track_by_id(track_used.id, stream)
+		except BaseException:
+			self.__download_limit.release()
+			raise
+		self.release_after_download(self.__download_limit, track)
+		return track
+
+	@staticmethod
+	def release_after_download(limit: asyncio.Semaphore, track: Track | None):
+		"""
+		Release a download slot once the track is completely downloaded.
+		A streamed track is returned before the end of its download, which goes on in background.
+		"""
+		if track is not None and track.stream is not None:
+			track.stream.add_done_callback(lambda _: limit.release())
+		else:
+			limit.release()
 
 	async def search_by_url(self, url: str):
 		"""
@@ -71,6 +129,70 @@ class EngineSource:
 
 		raise ValueError("The type of result 'get_by_url' is unknown.")
 
+	async def search_by_url_stream(
+		self, url: str, progress: Callable[[int, int], None] | None = None
+	) -> AsyncIterator[tuple[list[TrackMinimalDeezer], list[TrackMinimal]]] | TrackMinimalDeezer:
+		"""
+		Same as `search_by_url`, but the tracks of a playlist or an album are given page by page,
+		converted to Deezer, as soon as they are found.
+
+		:param url: The URL to search for.
+		:param progress: Called with the number of tracks resolved and unresolved
+			while the tracks of a playlist are searched.
+		"""
+		result = None
+		for engine in self.__sources.values():
+			result = await engine.get_by_url_stream(url, progress)
+			if result:
+				break
+
+		if not result:
+			raise TrackNotFoundException("URL **%s** not found.", url)
+
+		if isinstance(result, TrackMinimal):
+			if not isinstance(result, TrackMinimalDeezer):
+				return await self._equivalent_for_download(result)
+			return result
+
+		pages = self.__convert_pages(result)
+		# The first page tells if the URL really leads to something
+		try:
+			first_page = await anext(pages)
+		except StopAsyncIteration:
+			raise TrackNotFoundException("URL **%s** not found.", url)
+		return self.__chain_page(first_page, pages)
+
+	async def __convert_pages(
+		self, pages: AsyncIterator[tuple[list[TrackMinimal], list[TrackMinimal]]]
+	) -> AsyncIterator[tuple[list[TrackMinimalDeezer], list[TrackMinimal]]]:
+		async for tracks, tracks_unfindable in pages:
+			if all(isinstance(t, TrackMinimalDeezer) for t in tracks):
+				yield tracks, tracks_unfindable  # type: ignore
+				continue
+
+			# Converted tracks are given in small chunks, so the first ones are queued
+			# while the rest of the page is converted
+			unfindable = list(tracks_unfindable)
+			given = 0
+			chunk: list[TrackMinimalDeezer] = []
+			async for track in self._iter_equivalents_for_download(tracks, unfindable):
+				chunk.append(track)
+				if len(chunk) >= self.convert_workers:
+					yield chunk, unfindable[given:]
+					given = len(unfindable)
+					chunk = []
+			if chunk or given < len(unfindable):
+				yield chunk, unfindable[given:]
+
+	async def __chain_page(
+		self,
+		first_page: tuple[list[TrackMinimalDeezer], list[TrackMinimal]],
+		pages: AsyncIterator[tuple[list[TrackMinimalDeezer], list[TrackMinimal]]],
+	) -> AsyncIterator[tuple[list[TrackMinimalDeezer], list[TrackMinimal]]]:
+		yield first_page
+		async for page in pages:
+			yield page
+
 	async def search_track(self, input: str, engine: SourceType | None) -> TrackMinimalDeezer:
 		search_engine = self._resolve_engine(engine)
 		search_engine_name = self._get_engine_name(search_engine)
@@ -121,6 +243,23 @@ class EngineSource:
 		return custom_engine
 
 	async def _equivalent_for_download(self, track: TrackMinimal) -> TrackMinimalDeezer:
+		known, track_equiv = self.equivalences.get(track)
+		if not known:
+			try:
+				track_equiv = await self._search_equivalent_for_download(track)
+			except TrackNotFoundException:
+				self.equivalences.put(track, None)
+				raise
+			self.equivalences.put(track, track_equiv)
+
+		if track_equiv is None:
+			dl_engine_name = self._get_engine_name(self.__downloader_source)
+			raise TrackNotFoundException(
+				"Track **%s** has not been found on %s.", track, dl_engine_name
+			)
+		return track_equiv
+
+	async def _search_equivalent_for_download(self, track: TrackMinimal) -> TrackMinimalDeezer:
 		track_exact_equiv = await self._equivalent_for_download_isrc(track)
 		if track_exact_equiv:
 			if track_exact_equiv.available:
@@ -136,7 +275,6 @@ class EngineSource:
 			raise TrackNotFoundException(
 				"Track **%s** has not been found on %s.", track, dl_engine_name
 			)
-			## TODO SAVE THIS
 		return track_search_equiv
 
 	async def _equivalent_for_download_str(self, track: TrackMinimal) -> TrackMinimalDeezer | None:
@@ -156,19 +294,55 @@ class EngineSource:
 	async def _equivalents_for_download(
 		self, tracks: list[TrackMinimal], tracks_unfindable: list[TrackMinimal]
 	) -> list[TrackMinimalDeezer]:
-		tracks_downloadable: list[TrackMinimalDeezer] = [] * len(tracks)
+		return [t async for t in self._iter_equivalents_for_download(tracks, tracks_unfindable)]
 
-		for t in tracks:
-			try:
-				if isinstance(t, TrackMinimalDeezer):
-					tracks_downloadable.append(t)
-				else:
-					track_dl_search = await self._equivalent_for_download(t)
-					if track_dl_search.available is False:
-						tracks_unfindable.append(t)
-					else:
-						tracks_downloadable.append(track_dl_search)
+	async def _iter_equivalents_for_download(
+		self, tracks: list[TrackMinimal], tracks_unfindable: list[TrackMinimal]
+	) -> AsyncIterator[TrackMinimalDeezer]:
+		"""
+		Convert tracks to their Deezer equivalent, yielded in order as soon as they are found.
 
-			except TrackNotFoundException:
-				tracks_unfindable.append(t)
-		return tracks_downloadable
+		At most `convert_workers` tracks are searched at the same time, and the conversions
+		don't run too far ahead of the consumer. Tracks with the same ISRC are searched once.
+		Tracks which can't be converted are added to `tracks_unfindable`.
+		"""
+		semaphore = asyncio.Semaphore(self.convert_workers)
+		window = self.convert_workers * 2
+		searches: dict[str, asyncio.Task[TrackMinimalDeezer | None]] = {}
+		tasks: list[asyncio.Task[TrackMinimalDeezer | None] | None] = []
+
+		async def convert(t: TrackMinimal) -> TrackMinimalDeezer | None:
+			async with semaphore:
+				try:
+					return await self._equivalent_for_download(t)
+				except TrackNotFoundException:
+					return None
+
+		def start(t: TrackMinimal):
+			if isinstance(t, TrackMinimalDeezer):
+				tasks.append(None)
+				return
+			isrc = getattr(t, "isrc", None)
+			key = f"isrc:{isrc}" if isrc else f"{t.author_name}|{t.album_title}|{t.name}"
+			task = searches.get(key)
+			if task is None:
+				task = asyncio.create_task(convert(t))
+				searches[key] = task
+			tasks.append(task)
+
+		try:
+			for i, t in enumerate(tracks):
+				while len(tasks) < min(i + window, len(tracks)):
+					start(tracks[len(tasks)])
+				task = tasks[i]
+				if task is None:
+					yield t  # type: ignore
+					continue
+				track_dl_search = await task
+				if track_dl_search is None or track_dl_search.available is False:
+					tracks_unfindable.append(t)
+					continue
+				yield track_dl_search
+		finally:
+			for task in searches.values():
+				task.cancel()
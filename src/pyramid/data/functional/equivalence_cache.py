@@ -0,0 +1,138 @@
+import json
+import logging
+import os
+import time
+
+from pyramid.data.track import TrackMinimal, TrackMinimalDeezer, TrackMinimalSpotify
+
+logger = logging.getLogger(__name__)
+
+
+class EquivalenceStats:
+	def __init__(self):
+		self.hits = 0
+		self.negative_hits = 0
+		self.misses = 0
+
+	def hit_rate(self) -> float:
+		total = self.hits + self.negative_hits + self.misses
+		if total == 0:
+			return 0.0
+		return (self.hits + self.negative_hits) / total
+
+	def __str__(self):
+		return (
+			f"{self.hits} hits, {self.negative_hits} negative hits, {self.misses} misses, "
+			f"hit rate {self.hit_rate() * 100:.1f}%"
+		)
+
+
+class EquivalenceCache:
+	"""
+	Persistent mapping of tracks from other sources to their Deezer equivalent.
+
+	Tracks are mapped by their id on their source and by their ISRC. Tracks not found
+	on Deezer are also kept, for a shorter time, to avoid searching them again each time
+	they are played.
+	"""
+
+	def __init__(
+		self,
+		file_path: str,
+		ttl: float = 30 * 24 * 3600,
+		negative_ttl: float = 24 * 3600,
+		autosave: int = 50,
+	):
+		"""
+		Parameters:
+		- file_path (str): JSON file where the mapping is saved.
+		- ttl (float): Seconds an equivalent is kept.
+		- negative_ttl (float): Seconds a track not found is kept.
+		- autosave (int): Number of changes after which the mapping is saved.
+		"""
+		self.file_path = file_path
+		self.ttl = ttl
+		self.negative_ttl = negative_ttl
+		self.autosave = autosave
+		self.stats = EquivalenceStats()
+		self.__entries: dict[str, dict] = {}
+		self.__changes = 0
+		self.load()
+
+	@staticmethod
+	def keys(track: TrackMinimal) -> list[str]:
+		if isinstance(track, TrackMinimalSpotify):
+			keys = [f"spotify:{track.id}"]
+		else:
+			keys = [f"{type(track).__name__}:{track.id}"]
+		isrc = getattr(track, "isrc", None)
+		if isrc:
+			keys.append(f"isrc:{isrc}")
+		return keys
+
+	def get(self, track: TrackMinimal) -> tuple[bool, TrackMinimalDeezer | None]:
+		"""
+		Returns:
+		- tuple[bool, TrackMinimalDeezer | None]: Whether the track is known, and its
+		  equivalent. The equivalent is None if the track has not been found on Deezer.
+		"""
+		now = time.time()
+		for key in self.keys(track):
+			entry = self.__entries.get(key)
+			if entry is None:
+				continue
+			if self.__expired(entry, now):
+				continue
+			deezer_track = entry["deezer"]
+			if deezer_track is None:
+				self.stats.negative_hits += 1
+				return True, None
+			self.stats.hits += 1
+			return True, TrackMinimalDeezer.from_dict(deezer_track)
+		self.stats.misses += 1
+		return False, None
+
+	def put(self, track: TrackMinimal, deezer_track: TrackMinimalDeezer | None):
+		entry = {
+			"deezer": deezer_track.to_dict() if deezer_track is not None else None,
+			"time": time.time(),
+		}
+		for key in self.keys(track):
+			self.__entries[key] = entry
+		self.__changes += 1
+		if self.__changes >= self.autosave:
+			self.save()
+
+	def count(self) -> int:
+		return len(self.__entries)
+
+	def load(self):
+		self.__entries = {}
+		try:
+			with open(self.file_path, "r", encoding="utf-8") as f:
+				self.__entries = json.load(f)
+		except FileNotFoundError:
+			pass
+		except ValueError as err:
+			logger.warning(
+				"Equivalence cache '%s' is invalid, it is cleared : %s", self.file_path, err
+			)
+
+	def save(self):
+		now = time.time()
+		entries = {
+			key: entry for key, entry in self.__entries.items() if not self.__expired(entry, now)
+		}
+		directory = os.path.dirname(self.file_path)
+		if directory:
+			os.makedirs(directory, exist_ok=True)
+		tmp_path = self.file_path + ".tmp"
+		with open(tmp_path, "w", encoding="utf-8") as f:
+			json.dump(entries, f)
+		os.replace(tmp_path, self.file_path)
+		self.__entries = entries
+		self.__changes = 0
+
+	def __expired(self, entry: dict, now: float) -> bool:
+		ttl = self.ttl if entry["deezer"] is not None else self.negative_ttl
+		return now - entry["time"] > ttl
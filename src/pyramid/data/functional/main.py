@@ -58,10 +58,6 @@ class Main:
 		thread = Thread(name="Socket", target=self.socket_server.start_server, daemon=True)
 		thread.start()
 
-	def clean_data(self):
-		# Songs folder clear
-		tools.clear_directory(self._config.deezer__folder)
-
 	def start(self):
 		# Discord Bot Instance
 		discord_bot = DiscordBot(self.logger.getChild("Discord"), self._info, self._config)
@@ -0,0 +1,186 @@
+import asyncio
+import logging
+from collections.abc import Callable
+
+from pyramid.data.functional.engine_source import EngineSource
+from pyramid.data.track import Track, TrackMinimal
+from pyramid.data.tracklist import TrackList
+
+logger = logging.getLogger(__name__)
+
+
+class PrefetchProgress:
+	"""
+	Progress of the prefetches of entries queued together, like the tracks of a playlist.
+	"""
+
+	def __init__(self, on_update: Callable[["PrefetchProgress"], None]):
+		"""
+		Parameters:
+		- on_update (Callable[[PrefetchProgress], None]): Called each time an entry is prefetched.
+		"""
+		self.total = 0
+		self.downloaded = 0
+		self.failed = 0
+		self.__on_update = on_update
+		self.__entries: dict[int, TrackMinimal] = {}
+
+	def add(self, entries: list[TrackMinimal]):
+		for entry in entries:
+			self.__entries[id(entry)] = entry
+		self.total += len(entries)
+
+	def is_pending(self) -> bool:
+		return len(self.__entries) > 0
+
+	def report(self, entry: TrackMinimal, track: Track | None):
+		if self.__entries.pop(id(entry), None) is None:
+			return
+		if track is None:
+			self.failed += 1
+		else:
+			self.downloaded += 1
+		self.__on_update(self)
+
+
+class TrackPrefetcher:
+	"""
+	Downloads in background the next tracks of a guild's TrackList.
+
+	Tracks can be queued with their metadata only. The prefetcher keeps the first entries
+	of the queue downloaded, so the next track is on disk when the current one ends.
+	Downloads share the guild's limit and the global limit of the EngineSource.
+	"""
+
+	def __init__(
+		self,
+		track_list: TrackList,
+		engine_source: EngineSource,
+		download_limit: asyncio.Semaphore,
+		size: int,
+	):
+		"""
+		Parameters:
+		- track_list (TrackList): Queue of the guild.
+		- engine_source (EngineSource): Source downloading the tracks.
+		- download_limit (Semaphore): Limit of simultaneous downloads of the guild.
+		- size (int): Number of tracks kept downloaded after the one playing.
+		"""
+		self.__track_list = track_list
+		self.__engine_source = engine_source
+		self.__download_limit = download_limit
+		self.size = size
+		# Keyed by track, the entries of a track queued twice share its download
+		self.__tasks: dict[
+			tuple[str, str], tuple[list[TrackMinimal], asyncio.Task[Track | None]]
+		] = {}
+		self.__progresses: list[PrefetchProgress] = []
+		# Tracks which couldn't be downloaded are not prefetched again
+		self.__failed: set[tuple[str, str]] = set()
+
+	def refresh(self):
+		"""
+		Start the downloads of the entries entering the window and cancel the ones
+		of the entries removed from the queue.
+		"""
+		for key, (entries, task) in list(self.__tasks.items()):
+			entries[:] = [entry for entry in entries if self.__track_list.contains(entry)]
+			if not entries:
+				task.cancel()
+				del self.__tasks[key]
+
+		for entry in self.__track_list.pending(self.size + 1):
+			key = self.__key(entry)
+			if key in self.__failed:
+				continue
+			pending = self.__tasks.get(key)
+			if pending is None:
+				self.__start(entry, False)
+			elif not any(e is entry for e in pending[0]):
+				pending[0].append(entry)
+
+	def watch(self, progress: PrefetchProgress):
+		"""
+		Report the prefetches of the entries of `progress` until all of them are done.
+		"""
+		if progress not in self.__progresses:
+			self.__progresses.append(progress)
+
+	async def get(self, entry: TrackMinimal) -> Track | None:
+		"""
+		Wait for the download of a queue entry and replace it by the downloaded track.
+		If it is not downloading yet, the track is streamed while it downloads.
+		"""
+		pending = self.__tasks.get(self.__key(entry))
+		if pending is None:
+			task = self.__start(entry, True)
+		else:
+			if not any(e is entry for e in pending[0]):
+				pending[0].append(entry)
+			task = pending[1]
+
+		track = await asyncio.shield(task)
+		if track is not None:
+			self.__track_list.replace(entry, track)
+		return track
+
+	def close(self):
+		"""
+		Cancel the pending prefetches, once the guild has left its voice channel.
+		"""
+		for _, task in self.__tasks.values():
+			task.cancel()
+		self.__tasks.clear()
+		self.__progresses.clear()
+		self.__failed.clear()
+
+	@staticmethod
+	def __key(entry: TrackMinimal) -> tuple[str, str]:
+		# Ids are only unique within a source
+		return type(entry).__name__, entry.id
+
+	def __start(self, entry: TrackMinimal, stream: bool) -> asyncio.Task[Track | None]:
+		key = self.__key(entry)
+		entries = [entry]
+		task = asyncio.create_task(self.__download(entry, stream))
+		self.__tasks[key] = (entries, task)
+
+		def on_done(task: asyncio.Task[Track | None]):
+			pending = self.__tasks.get(key)
+			if pending is not None and pending[1] is task:
+				del self.__tasks[key]
+			if task.cancelled():
+				return
+			err = task.exception()
+			if err is not None:
+				logger.warning("Unable to prefetch %s", entry, exc_info=err)
+				track = None
+			else:
+				track = task.result()
+			if track is None:
+				self.__failed.add(key)
+			for e in entries:
+				if track is not None:
+					self.__track_list.replace(e, track)
+				self.__report(e, track)
+
+		task.add_done_callback(on_done)
+		return task
+
+	def __report(self, entry: TrackMinimal, track: Track | None):
+		for progress in list(self.__progresses):
+			progress.report(entry, track)
+			if not progress.is_pending():
+				self.__progresses.remove(progress)
+
+	async def __download(self, entry: TrackMinimal, stream: bool) -> Track | None:
+		await self.__download_limit.acquire()
+		try:
+			track = await self.__engine_source.download_track(entry, stream)
+		except BaseException:
+			self.__download_limit.release()
+			raise
+		EngineSource.release_after_download(self.__download_limit, track)
+		if track is None:
+			logger.warning("Unable to prefetch %s", entry)
+		return track
@@ -1,7 +1,10 @@
+import asyncio
+
 from discord import Guild, VoiceClient
 
 from pyramid.data.tracklist import TrackList
 from pyramid.data.functional.engine_source import EngineSource
+from pyramid.data.functional.track_prefetcher import TrackPrefetcher
 
 
 class GuildData:
@@ -10,3 +13,7 @@ class GuildData:
 		self.track_list: TrackList = TrackList()
 		self.voice_client: VoiceClient = None  # type: ignore
 		self.search_engine = engine_source
+		self.download_limit = asyncio.Semaphore(engine_source.download_workers_guild)
+		self.prefetcher = TrackPrefetcher(
+			self.track_list, engine_source, self.download_limit, engine_source.prefetch_tracks
+		)
@@ -3,6 +3,7 @@ from datetime import datetime
 
 import deezer
 from pyramid.tools import utils
+from pyramid.tools.file_stream import FileStream
 
 
 class TrackMinimal(ABC):
@@ -82,6 +83,25 @@ class TrackMinimalDeezer(TrackMinimal):
 		else:
 			self.available = True
 
+	def to_dict(self) -> dict:
+		return {
+			"id": self.id,
+			"author_name": self.author_name,
+			"name": self.name,
+			"album_title": self.album_title,
+			"album_picture": self.album_picture,
+			"explicit": self.explicit,
+			"duration": self.duration,
+			"rank": self.rank,
+			"available": self.available,
+		}
+
+	@classmethod
+	def from_dict(cls, data: dict) -> "TrackMinimalDeezer":
+		track = cls.__new__(cls)
+		track.__dict__.update(data)
+		return track
+
 
 class Track(TrackMinimal):
 	def __init__(self, data, file_path):
@@ -100,6 +120,7 @@ class Track(TrackMinimal):
 		else:
 			self.date = None
 		self.file_local: str = file_path
+		self.stream: FileStream | None = None
 
 	def get_date(self, locale: str = "en-US") -> str | None:
 		if self.date is None:
@@ -6,17 +6,22 @@ from pyramid.data.track import Track, TrackMinimal, TrackMinimalDeezer
 
 
 class TrackList:
+	"""
+	Queue of a guild. Entries are either downloaded tracks, or tracks queued with their
+	metadata only, waiting to be downloaded.
+	"""
+
 	def __init__(self):
-		self.__tracks: list[Track] = []
+		self.__tracks: list[Track | TrackMinimal] = []
 
 	def add_track(self, track: Track) -> bool:
-		if not os.path.exists(track.file_local):
+		if not self.__is_playable(track):
 			return False
 		self.__tracks.append(track)
 		return True
 
 	def add_track_after(self, track: Track) -> bool:
-		if not os.path.exists(track.file_local):
+		if not self.__is_playable(track):
 			return False
 		self.__tracks.insert(1, track)
 		return True
@@ -24,6 +29,48 @@ class TrackList:
 	def add_tracks(self, tracks: list[Track]):
 		self.__tracks.extend(tracks)
 
+	def add_pending_tracks(
+		self,
+		tracks: list[TrackMinimal] | list[TrackMinimalDeezer],
+		at_end=True,
+		after: Track | TrackMinimal | None = None,
+	):
+		"""
+		Queue entries not downloaded yet.
+
+		When not added at the end, the entries are added after `after` if it is still queued,
+		so the pages of a playlist keep their order, else after the current track.
+		"""
+		if at_end or self.is_empty():
+			self.__tracks.extend(tracks)
+			return
+		index = 1
+		if after is not None:
+			for i, t in enumerate(self.__tracks):
+				if t is after:
+					index = i + 1
+					break
+		self.__tracks[index:index] = tracks
+
+	def pending(self, count: int) -> list[TrackMinimal]:
+		"""
+		Entries not downloaded yet among the first `count` of the queue.
+		"""
+		return [t for t in self.__tracks[:count] if not isinstance(t, Track)]
+
+	def replace(self, entry: TrackMinimal, track: Track) -> bool:
+		"""
+		Replace a pending entry by its downloaded track.
+		"""
+		for i, t in enumerate(self.__tracks):
+			if t is entry:
+				self.__tracks[i] = track
+				return True
+		return False
+
+	def contains(self, entry: Track | TrackMinimal) -> bool:
+		return any(t is entry for t in self.__tracks)
+
 	def clear(self) -> bool:
 		if self.is_empty():
 			return False
@@ -45,7 +92,7 @@ class TrackList:
 			random.shuffle(self.__tracks)
 		return True
 
-	def remove(self, index: int) -> Track | None:
+	def remove(self, index: int) -> Track | TrackMinimal | None:
 		length = len(self.__tracks)
 		if length <= index or index <= 0:
 			return None
@@ -71,14 +118,14 @@ class TrackList:
 	def has_next(self) -> bool:
 		return len(self.__tracks) >= 2
 
-	def first_song(self) -> Track:
+	def first_song(self) -> Track | TrackMinimal:
 		return self.__tracks[0]
 
 	def remove_song(self):
 		self.__tracks.pop(0)
 
 	def get_songs_str(self) -> str:
-		return to_str(self.__tracks)
+		return to_str(self.__tracks)  # type: ignore
 
 	def get_length(self) -> str:
 		length = len(self.__tracks)
@@ -88,7 +135,16 @@ class TrackList:
 			return f"{length} track"
 
 	def get_duration(self) -> str:
-		return tools.time_to_duration(sum(t.duration_seconds for t in self.__tracks))
+		return tools.time_to_duration(
+			sum(t.duration_seconds if isinstance(t, Track) else t.duration for t in self.__tracks)  # type: ignore
+		)
+
+	@staticmethod
+	def __is_playable(track: Track) -> bool:
+		# A streamed track is only at its path once completely downloaded
+		if track.stream is not None and (not track.stream.finished or track.stream.success):
+			return True
+		return os.path.exists(track.file_local)
 
 
 def to_str(list_of_track: list[TrackMinimal] | list[TrackMinimalDeezer] | list[Track]) -> str:
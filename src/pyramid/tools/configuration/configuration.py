@@ -19,9 +19,16 @@ class Configuration(ConfigurationFromYAML, ConfigurationToYAML, ConfigurationFro
 		self.discord__ffmpeg: str = ""
 		self.deezer__arl: str = ""
 		self.deezer__folder: str = ""
+		self.deezer__cache_size: int = 4096
 		self.spotify__client_id: str = ""
 		self.spotify__client_secret: str = ""
 		self.general__limit_tracks: int = 0
+		self.general__download_workers: int = 8
+		self.general__download_workers_guild: int = 3
+		self.general__prefetch_tracks: int = 3
+		self.general__convert_workers: int = 8
+		self.general__http_connections: int = 100
+		self.general__http_connections_per_host: int = 10
 		self.mode: Environment = Environment.PRODUCTION
 		self.version: str = ""
 
@@ -79,9 +79,16 @@ class ConfigurationFromYAML(ABC):
 		r.append(self.__check(v, "discord.ffmpeg", is_path=True))
 		r.append(self.__check(v, "deezer.arl", r"^[a-fA-F0-9]{192}$"))
 		r.append(self.__check(v, "deezer.folder", is_path=True))
+		r.append(self.__check(v, "deezer.cache_size", is_int=True))
 		r.append(self.__check(v, "spotify.client_id", r"^[a-zA-Z0-9]{32}$"))
 		r.append(self.__check(v, "spotify.client_secret", r"^[a-zA-Z0-9]{32}$"))
 		r.append(self.__check(v, "general.limit_tracks", is_int=True))
+		r.append(self.__check(v, "general.download_workers", is_int=True))
+		r.append(self.__check(v, "general.download_workers_guild", is_int=True))
+		r.append(self.__check(v, "general.prefetch_tracks", is_int=True))
+		r.append(self.__check(v, "general.convert_workers", is_int=True))
+		r.append(self.__check(v, "general.http_connections", is_int=True))
+		r.append(self.__check(v, "general.http_connections_per_host", is_int=True))
 		r.append(self.__check(v, "version"))
 
 		def mode_validation(input: str):
@@ -0,0 +1,136 @@
+import asyncio
+import io
+import logging
+import threading
+from collections.abc import Callable
+
+logger = logging.getLogger(__name__)
+
+
+class FileStream:
+	"""
+	Progress of a file being written, which can be read while it grows.
+
+	The writer reports the bytes written with `update` and calls `finish` at the end.
+	Readers opened with `open` follow the file and only reach its end once the
+	writer has finished, so the file can be given to a consumer like FFmpeg
+	before being complete.
+	"""
+
+	def __init__(self, file_path: str):
+		self.file_path = file_path
+		self.written = 0
+		self.finished = False
+		self.success = False
+		self.__condition = threading.Condition()
+		self.__waiters: list[tuple[int, asyncio.Future[bool]]] = []
+		self.__callbacks: list[Callable[[FileStream], None]] = []
+
+	def update(self, written: int):
+		"""
+		Called by the writer, from the event loop, once data is flushed to the file.
+		"""
+		with self.__condition:
+			self.written = written
+			self.__condition.notify_all()
+		self.__wake_waiters()
+
+	def finish(self, success: bool):
+		with self.__condition:
+			self.finished = True
+			self.success = success
+			self.__condition.notify_all()
+		self.__wake_waiters()
+		callbacks, self.__callbacks = self.__callbacks, []
+		for callback in callbacks:
+			callback(self)
+
+	def add_done_callback(self, callback: Callable[["FileStream"], None]):
+		"""
+		Call `callback` with the stream once the writer has finished,
+		immediately if it already has.
+		"""
+		if self.finished:
+			callback(self)
+		else:
+			self.__callbacks.append(callback)
+
+	async def wait_for(self, size: int) -> bool:
+		"""
+		Wait until at least `size` bytes are written or the writer has finished.
+
+		Returns:
+		- bool: False if the writer has failed.
+		"""
+		if self.written < size and not self.finished:
+			future: asyncio.Future[bool] = asyncio.get_running_loop().create_future()
+			self.__waiters.append((size, future))
+			await future
+		return not self.finished or self.success
+
+	def open(self) -> "FileStreamReader":
+		return FileStreamReader(self)
+
+	def wait_data(self, position: int, timeout: float) -> bool:
+		"""
+		Block the calling thread until data after `position` is available.
+
+		Returns:
+		- bool: False if no more data will be written.
+		"""
+		with self.__condition:
+			if self.written <= position and not self.finished:
+				self.__condition.wait(timeout)
+			return not self.finished or self.written > position
+
+	def __wake_waiters(self):
+		waiters = []
+		for size, future in self.__waiters:
+			if future.done():
+				continue
+			if self.finished or self.written >= size:
+				future.set_result(True)
+			else:
+				waiters.append((size, future))
+		self.__waiters = waiters
+
+
+class FileStreamReader(io.RawIOBase):
+	"""
+	Blocking reader of a `FileStream`, meant to be consumed from another thread.
+	"""
+
+	def __init__(self, stream: FileStream, timeout: float = 0.5):
+		self.__stream = stream
+		self.__timeout = timeout
+		# Kept open until the reader is closed
+		self.__file = open(stream.file_path, "rb")  # noqa: SIM115
+		self.__position = 0
+
+	def readable(self) -> bool:
+		return True
+
+	def read(self, size: int = -1) -> bytes:
+		while not self.closed:
+			data = self.__file.read(size)
+			if data:
+				self.__position += len(data)
+				return data
+			if not self.__stream.wait_data(self.__position, self.__timeout):
+				# Data written between the last read and the end of the writer
+				data = self.__file.read(size)
+				if data:
+					self.__position += len(data)
+					return data
+				if not self.__stream.success:
+					logger.warning(
+						"Stream of '%s' ended before the end of the file", self.__stream.file_path
+					)
+				self.close()
+				return b""
+		return b""
+
+	def close(self):
+		if not self.closed:
+			self.__file.close()
+		super().close()
@@ -0,0 +1,176 @@
+import asyncio
+import time
+from types import SimpleNamespace
+from typing import Any
+
+import aiohttp
+
+
+class HostStats:
+	"""
+	Latency and connection counters of the requests made to a single host.
+	"""
+
+	def __init__(self, host: str):
+		self.host = host
+		self.requests = 0
+		self.errors = 0
+		self.connections_created = 0
+		self.connections_reused = 0
+		self.total_latency = 0.0
+		self.max_latency = 0.0
+
+	def add_latency(self, latency: float):
+		self.requests += 1
+		self.total_latency += latency
+		self.max_latency = max(self.max_latency, latency)
+
+	def average_latency(self) -> float:
+		if self.requests == 0:
+			return 0.0
+		return self.total_latency / self.requests
+
+	def __str__(self):
+		return (
+			f"{self.host} : {self.requests} requests ({self.errors} errors), "
+			f"avg {self.average_latency() * 1000:.1f} ms, max {self.max_latency * 1000:.1f} ms, "
+			f"{self.connections_created} new connections, {self.connections_reused} reused"
+		)
+
+
+class PooledSession:
+	"""
+	Long-lived aiohttp session shared by every call of a client.
+
+	The session is created lazily on the running event loop, so that the owner
+	can be instantiated outside of any loop. Connections are kept alive and pooled
+	by host, avoiding a new TCP and TLS handshake for each request.
+	"""
+
+	def __init__(
+		self,
+		limit: int = 100,
+		limit_per_host: int = 10,
+		keepalive_timeout: float = 30,
+		ttl_dns_cache: int | None = 300,
+		store_cookies: bool = True,
+		**session_kwargs: Any,
+	):
+		"""
+		Parameters:
+		- limit (int): Total number of simultaneous connections.
+		- limit_per_host (int): Number of simultaneous connections to the same host.
+		- keepalive_timeout (float): Seconds an idle connection is kept open for reuse.
+		- ttl_dns_cache (int | None): Seconds a DNS resolution is cached. None caches forever.
+		- store_cookies (bool): If False, cookies received are not kept by the session.
+		- session_kwargs: Extra arguments given to `aiohttp.ClientSession`.
+		"""
+		self.limit = limit
+		self.limit_per_host = limit_per_host
+		self.keepalive_timeout = keepalive_timeout
+		self.ttl_dns_cache = ttl_dns_cache
+		self.store_cookies = store_cookies
+		self.stats: dict[str, HostStats] = {}
+		self.__session_kwargs = session_kwargs
+		self.__session: aiohttp.ClientSession | None = None
+		self.__loop: asyncio.AbstractEventLoop | None = None
+		self.__closing: set[asyncio.Task[None]] = set()
+
+	def get(self) -> aiohttp.ClientSession:
+		loop = asyncio.get_running_loop()
+		if self.__session is None or self.__session.closed or self.__loop is not loop:
+			if self.__session is not None and self.__loop is not None:
+				self.__discard(self.__session, self.__loop)
+			connector = aiohttp.TCPConnector(
+				limit=self.limit,
+				limit_per_host=self.limit_per_host,
+				keepalive_timeout=self.keepalive_timeout,
+				use_dns_cache=True,
+				ttl_dns_cache=self.ttl_dns_cache,
+			)
+			# Cookie jars are bound to the running loop
+			cookie_jar = None if self.store_cookies else aiohttp.DummyCookieJar()
+			self.__session = aiohttp.ClientSession(
+				connector=connector,
+				cookie_jar=cookie_jar,
+				trace_configs=[self.__trace_config()],
+				**self.__session_kwargs,
+			)
+			self.__loop = loop
+		return self.__session
+
+	async def close(self):
+		if self.__closing:
+			await asyncio.gather(*self.__closing, return_exceptions=True)
+		session = self.__session
+		self.__session = None
+		if session is None or session.closed:
+			return
+		if self.__loop is not asyncio.get_running_loop():
+			# The session belongs to another loop, it can't be awaited from here
+			return
+		await session.close()
+
+	def __discard(self, session: aiohttp.ClientSession, loop: asyncio.AbstractEventLoop):
+		"""
+		Close a session created on another loop. Its connections belong to that loop, so the
+		session is closed there while the loop runs. Otherwise the loop has nothing left to wait
+		for, and the session is closed from the current one.
+		"""
+		if session.closed:
+			return
+		if loop.is_running():
+			loop.call_soon_threadsafe(loop.create_task, session.close())
+			return
+		task = asyncio.get_running_loop().create_task(session.close())
+		self.__closing.add(task)
+		task.add_done_callback(self.__closing.discard)
+
+	def host_stats(self, host: str) -> HostStats:
+		stats = self.stats.get(host)
+		if stats is None:
+			stats = HostStats(host)
+			self.stats[host] = stats
+		return stats
+
+	def __trace_config(self) -> aiohttp.TraceConfig:
+		trace_config = aiohttp.TraceConfig()
+
+		async def on_request_start(
+			session: aiohttp.ClientSession,
+			ctx: SimpleNamespace,
+			params: aiohttp.TraceRequestStartParams,
+		):
+			ctx.start = time.perf_counter()
+			ctx.host = params.url.host or ""
+
+		async def on_request_end(
+			session: aiohttp.ClientSession,
+			ctx: SimpleNamespace,
+			params: aiohttp.TraceRequestEndParams,
+		):
+			self.host_stats(ctx.host).add_latency(time.perf_counter() - ctx.start)
+
+		async def on_request_exception(
+			session: aiohttp.ClientSession,
+			ctx: SimpleNamespace,
+			params: aiohttp.TraceRequestExceptionParams,
+		):
+			self.host_stats(ctx.host).errors += 1
+
+		async def on_connection_create_end(
+			session: aiohttp.ClientSession, ctx: SimpleNamespace, params: Any
+		):
+			self.host_stats(ctx.host).connections_created += 1
+
+		async def on_connection_reuseconn(
+			session: aiohttp.ClientSession, ctx: SimpleNamespace, params: Any
+		):
+			self.host_stats(ctx.host).connections_reused += 1
+
+		trace_config.on_request_start.append(on_request_start)
+		trace_config.on_request_end.append(on_request_end)
+		trace_config.on_request_exception.append(on_request_exception)
+		trace_config.on_connection_create_end.append(on_connection_create_end)
+		trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
+		return trace_config
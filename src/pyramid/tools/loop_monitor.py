@@ -0,0 +1,69 @@
+import asyncio
+import logging
+import time
+
+
+class LoopLagMonitor:
+	"""
+	Measures how late the event loop wakes up a task sleeping at a fixed interval.
+
+	A lag above the budget means a callback has blocked the loop, delaying the
+	Discord heartbeat and the audio packets sent to the voice gateway.
+	"""
+
+	def __init__(
+		self, interval: float = 0.1, budget: float = 0.1, logger: logging.Logger | None = None
+	):
+		"""
+		Parameters:
+		- interval (float): Seconds between two measures.
+		- budget (float): Lag in seconds above which a warning is logged.
+		- logger (Logger | None): Logger of the warnings, the root logger by default.
+		"""
+		self.interval = interval
+		self.budget = budget
+		self.samples = 0
+		self.total_lag = 0.0
+		self.max_lag = 0.0
+		self.over_budget = 0
+		self.__logger = logger or logging.getLogger()
+		self.__task: asyncio.Task | None = None
+
+	def start(self):
+		if self.__task is None or self.__task.done():
+			self.__task = asyncio.create_task(self.__run())
+
+	async def stop(self):
+		task = self.__task
+		self.__task = None
+		if task is None:
+			return
+		task.cancel()
+		try:
+			await task
+		except asyncio.CancelledError:
+			pass
+
+	def average_lag(self) -> float:
+		if self.samples == 0:
+			return 0.0
+		return self.total_lag / self.samples
+
+	def __str__(self):
+		return (
+			f"Event loop lag : avg {self.average_lag() * 1000:.1f} ms, "
+			f"max {self.max_lag * 1000:.1f} ms, "
+			f"{self.over_budget}/{self.samples} over {self.budget * 1000:.0f} ms"
+		)
+
+	async def __run(self):
+		while True:
+			expected = time.perf_counter() + self.interval
+			await asyncio.sleep(self.interval)
+			lag = max(0.0, time.perf_counter() - expected)
+			self.samples += 1
+			self.total_lag += lag
+			self.max_lag = max(self.max_lag, lag)
+			if lag > self.budget:
+				self.over_budget += 1
+				self.__logger.warning("Event loop blocked for %.1f ms", lag * 1000)
@@ -0,0 +1,63 @@
+import asyncio
+from collections.abc import Awaitable, Callable, Hashable
+from typing import TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+	"""
+	Coalesces concurrent identical calls : while a call with a key is running, the next
+	callers with the same key wait for its result instead of running their own.
+
+	The call runs in its own task, so a caller being cancelled doesn't cancel it for the
+	others. Once the call has finished, the next caller with the key runs it again.
+	"""
+
+	def __init__(self, cancel_abandoned: bool = False):
+		"""
+		Parameters:
+		- cancel_abandoned (bool): Cancel a call once all its callers have been cancelled.
+		"""
+		self.calls = 0
+		self.shared = 0
+		self.cancel_abandoned = cancel_abandoned
+		self.__running: dict[Hashable, asyncio.Task] = {}
+		self.__callers: dict[asyncio.Task, int] = {}
+
+	async def run(self, key: Hashable, func: Callable[[], Awaitable[T]]) -> T:
+		task = self.__running.get(key)
+		if task is not None:
+			self.shared += 1
+		else:
+			self.calls += 1
+			task = asyncio.ensure_future(func())
+			self.__running[key] = task
+			task.add_done_callback(lambda t: self.__done(key, t))
+		return await self.__wait(task)
+
+	async def __wait(self, task: asyncio.Task[T]) -> T:
+		self.__callers[task] = self.__callers.get(task, 0) + 1
+		try:
+			return await asyncio.shield(task)
+		except asyncio.CancelledError:
+			if self.cancel_abandoned and self.__callers[task] == 1:
+				task.cancel()
+			raise
+		finally:
+			self.__callers[task] -= 1
+			if self.__callers[task] == 0:
+				del self.__callers[task]
+
+	def running(self) -> int:
+		return len(self.__running)
+
+	def __done(self, key: Hashable, task: asyncio.Task):
+		if self.__running.get(key) is task:
+			del self.__running[key]
+		if not task.cancelled():
+			# Retrieved even if every caller has been cancelled
+			task.exception()
+
+	def __str__(self):
+		return f"{self.calls} calls, {self.shared} shared"
@@ -6,7 +6,6 @@ def startup():
 	main.args()
 	main.logs()
 	main.config()
-	main.clean_data()
 
 	main.open_socket()
 	main.start()
@@ -0,0 +1,13 @@
+import logging
+import os
+import unittest
+
+# Timings depend on the load of the machine, so benchmarks only run when asked for
+ENABLED = os.getenv("BENCHMARK", "") not in ("", "0")
+
+logger = logging.getLogger("benchmark")
+if ENABLED:
+	logger.setLevel(logging.INFO)
+	logger.addHandler(logging.StreamHandler())
+
+benchmark = unittest.skipUnless(ENABLED, "benchmark, run with BENCHMARK=1")
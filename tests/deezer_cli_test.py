@@ -0,0 +1,169 @@
+import asyncio
+import time
+import unittest
+
+import aiohttp
+from benchmark import benchmark, logger
+from fake_deezer_api import FakeDeezerApi
+
+from pyramid.connector.deezer.cli_deezer import CliDeezer
+from pyramid.tools.http_session import PooledSession
+
+REQUESTS = 200
+CONCURRENCY = 20
+
+
+class CliDeezerSessionTest(unittest.IsolatedAsyncioTestCase):
+	async def asyncSetUp(self):
+		self.api = FakeDeezerApi()
+		self.base_url = await self.api.start()
+		self.cli = CliDeezer(limit_per_host=CONCURRENCY)
+		self.cli.base_url = self.base_url
+		# The benchmark measures the transport, not the Deezer quota
+		self.cli.rate_limiter.max_requests = REQUESTS * 10
+
+	async def asyncTearDown(self):
+		await self.cli.close()
+		await self.api.stop()
+
+	async def _run(self, func) -> float:
+		semaphore = asyncio.Semaphore(CONCURRENCY)
+
+		async def bounded(track_id: int):
+			async with semaphore:
+				await func(track_id)
+
+		start = time.perf_counter()
+		await asyncio.gather(*(bounded(i) for i in range(REQUESTS)))
+		return REQUESTS / (time.perf_counter() - start)
+
+	async def test_session_reused(self):
+		track = await self.cli.async_get_track(1)
+		self.assertEqual(track.id, 1)
+		await self.cli.async_get_track(2)
+		self.assertEqual(len(self.api.connections), 1)
+
+		stats = self.cli.async_session.stats["127.0.0.1"]
+		self.assertEqual(stats.requests, 2)
+		self.assertEqual(stats.connections_created, 1)
+		self.assertEqual(stats.connections_reused, 1)
+
+	async def test_benchmark_pooled_session(self):
+		async def session_per_request(track_id: int):
+			async with (
+				aiohttp.ClientSession() as session,
+				session.get(f"{self.base_url}/track/{track_id}") as response,
+			):
+				await response.json()
+
+		async def pooled_session(track_id: int):
+			await self.cli.async_get_track(track_id)
+
+		before = await self._run(session_per_request)
+		connections_before = len(self.api.connections)
+		self.api.connections.clear()
+
+		after = await self._run(pooled_session)
+		connections_after = len(self.api.connections)
+
+		logger.info(
+			"Deezer API %d requests: session per request %.0f req/s (%d connections), "
+			"pooled session %.0f req/s (%d connections)",
+			REQUESTS,
+			before,
+			connections_before,
+			after,
+			connections_after,
+		)
+		self.assertGreater(connections_before, connections_after)
+		self.assertLessEqual(connections_after, CONCURRENCY)
+
+
+class PooledSessionLoopTest(unittest.TestCase):
+	def test_session_of_previous_loop_released(self):
+		pooled = PooledSession(limit=5, limit_per_host=2)
+
+		async def get() -> aiohttp.ClientSession:
+			return pooled.get()
+
+		async def get_and_close() -> aiohttp.ClientSession:
+			session = pooled.get()
+			await pooled.close()
+			return session
+
+		first = asyncio.run(get())
+		second = asyncio.run(get_and_close())
+
+		self.assertIsNot(first, second)
+		self.assertTrue(first.closed)
+		self.assertTrue(second.closed)
+
+
+class CliPaginatedListTest(unittest.IsolatedAsyncioTestCase):
+	PLAYLIST_SIZE = 500
+	LATENCY = 0.02
+
+	async def asyncSetUp(self):
+		self.api = FakeDeezerApi(latency=self.LATENCY, playlist_size=self.PLAYLIST_SIZE)
+		self.cli = CliDeezer()
+		self.cli.base_url = await self.api.start()
+		self.cli.rate_limiter.max_requests = self.PLAYLIST_SIZE
+
+	async def asyncTearDown(self):
+		await self.cli.close()
+		await self.api.stop()
+
+	async def _get_all(self, max_in_flight: int) -> list:
+		playlist = await self.cli.async_get_playlist(1)
+		return await playlist.get_tracks().get_all(max_in_flight)  # type: ignore
+
+	async def test_order_and_in_flight(self):
+		tracks = await self._get_all(3)
+		expected = [self.api.playlist_track_payload(i)["title"] for i in range(self.PLAYLIST_SIZE)]
+		self.assertEqual([t.title for t in tracks], expected)
+		self.assertEqual(self.api.max_in_flight, 3)
+
+	async def test_short_pages(self):
+		self.api.missing = {3, 60}
+		tracks = await self._get_all(3)
+		expected = [
+			self.api.playlist_track_payload(i)["title"]
+			for i in range(self.PLAYLIST_SIZE)
+			if i not in self.api.missing
+		]
+		self.assertEqual([t.title for t in tracks], expected)
+
+	async def test_iterated_list(self):
+		playlist = await self.cli.async_get_playlist(1)
+		pagination = playlist.get_tracks()  # type: ignore
+		first_page = await anext(pagination)
+		# The pages left follow the next links
+		tracks = first_page + await pagination.get_all()
+		self.assertEqual(len(tracks), self.PLAYLIST_SIZE)
+		self.assertEqual(self.api.max_in_flight, 1)
+
+	@benchmark
+	async def test_benchmark(self):
+		start = time.perf_counter()
+		reference = await self._get_all(1)
+		duration_serial = time.perf_counter() - start
+		self.cli.response_cache.clear()
+
+		start = time.perf_counter()
+		tracks = await self._get_all(4)
+		duration = time.perf_counter() - start
+
+		logger.info(
+			"Playlist of %d tracks (%d pages, %.0f ms each): sequential %.2fs, concurrent %.2fs",
+			self.PLAYLIST_SIZE,
+			self.PLAYLIST_SIZE // self.api.page_size,
+			self.LATENCY * 1000,
+			duration_serial,
+			duration,
+		)
+		self.assertEqual([t.id for t in tracks], [t.id for t in reference])
+		self.assertGreater(duration_serial, duration * 2)
+
+
+if __name__ == "__main__":
+	unittest.main(failfast=True)
@@ -0,0 +1,85 @@
+import asyncio
+import unittest
+from unittest.mock import AsyncMock, patch
+
+from pyramid.connector.deezer.client_pool import DeezerClientPool
+from pyramid.connector.deezer.py_deezer import PyDeezer
+from pyramid.data.exceptions import DeezerTokenInvalidException
+
+
+class DeezerClientPoolTest(unittest.IsolatedAsyncioTestCase):
+	def setUp(self):
+		self.transport = PyDeezer.create_transport()
+
+	async def asyncTearDown(self):
+		await self.transport.close()
+
+	@patch.object(PyDeezer, "get_user_data", new_callable=AsyncMock)
+	async def test_client_reused(self, mock_get_user_data: AsyncMock):
+		pool = DeezerClientPool(["arl"], self.transport)
+
+		client = await pool.get()
+		self.assertIs(await pool.get(), client)
+		mock_get_user_data.assert_awaited_once()
+
+	@patch.object(PyDeezer, "get_user_data", new_callable=AsyncMock)
+	async def test_rotation(self, mock_get_user_data: AsyncMock):
+		pool = DeezerClientPool(["arl1", "arl2"], self.transport)
+
+		first = await pool.get()
+		second = await pool.get()
+		self.assertNotEqual(first.arl, second.arl)
+		self.assertIs(await pool.get(), first)
+		self.assertEqual(mock_get_user_data.await_count, 2)
+
+	@patch.object(PyDeezer, "get_user_data", new_callable=AsyncMock)
+	async def test_invalidate(self, mock_get_user_data: AsyncMock):
+		pool = DeezerClientPool(["arl1", "arl2"], self.transport)
+
+		first = await pool.get()
+		pool.invalidate(first)
+		self.assertEqual(pool.count(), 1)
+		self.assertIsNot(await pool.get(), first)
+
+	@patch.object(PyDeezer, "get_user_data", new_callable=AsyncMock)
+	async def test_ttl_revalidation(self, mock_get_user_data: AsyncMock):
+		pool = DeezerClientPool(["arl1", "arl2"], self.transport, ttl=0)
+
+		await pool.get()
+		# Both ARLs validated by the pool, then the expired client validated again
+		self.assertEqual(mock_get_user_data.await_count, 3)
+
+		mock_get_user_data.side_effect = DeezerTokenInvalidException("ARL invalid : %s", "arl")
+		with patch.object(
+			DeezerClientPool, "_DeezerClientPool__fill", new_callable=AsyncMock
+		) as fill:
+			fill.side_effect = DeezerTokenInvalidException("ARL invalid : %s", "arl")
+			with self.assertRaises(DeezerTokenInvalidException):
+				await pool.get()
+		self.assertEqual(pool.count(), 0)
+
+	async def test_validation_outside_of_pool_lock(self):
+		blocked = asyncio.Event()
+		released = asyncio.Event()
+
+		async def get_user_data(client: PyDeezer):
+			if client.arl == "arl1" and blocked.is_set():
+				await released.wait()
+
+		with patch.object(PyDeezer, "get_user_data", get_user_data):
+			pool = DeezerClientPool(["arl1", "arl2"], self.transport, ttl=0)
+			self.assertEqual((await pool.get()).arl, "arl1")
+			self.assertEqual((await pool.get()).arl, "arl2")
+
+			blocked.set()
+			first = asyncio.create_task(pool.get())
+			await asyncio.sleep(0)
+			# The other client is given while the first one is validated
+			self.assertEqual((await asyncio.wait_for(pool.get(), 1)).arl, "arl2")
+			self.assertFalse(first.done())
+			released.set()
+			self.assertEqual((await first).arl, "arl1")
+
+
+if __name__ == "__main__":
+	unittest.main(failfast=True)
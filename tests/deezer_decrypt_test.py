@@ -0,0 +1,208 @@
+import asyncio
+import os
+import tempfile
+import time
+import tracemalloc
+import unittest
+import warnings
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import aiofiles
+from benchmark import benchmark, logger
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives.ciphers import Cipher, modes
+from pydeezer.ProgressHandler import BaseProgressHandler
+
+from pyramid.connector.deezer.py_deezer import DecryptDeezer
+from pyramid.tools.loop_monitor import LoopLagMonitor
+
+with warnings.catch_warnings():
+	warnings.simplefilter("ignore")
+	from cryptography.hazmat.primitives.ciphers.algorithms import Blowfish
+
+KEY = b"0123456789abcdef"
+IV = bytes(range(8))
+FILE_SIZE = 10 * 1024 * 1024 + 1000
+NETWORK_CHUNK = 16 * 1024
+CONCURRENT_DOWNLOADS = 4
+LAG_BUDGET = 0.05
+
+
+def encrypt(data: bytes) -> bytes:
+	cipher = Cipher(Blowfish(KEY), modes.CBC(IV), default_backend())
+	out = bytearray(data)
+	for start in range(0, len(data) - 2048 + 1, 6144):
+		encryptor = cipher.encryptor()
+		out[start : start + 2048] = (
+			encryptor.update(data[start : start + 2048]) + encryptor.finalize()
+		)
+	return bytes(out)
+
+
+def decrypt_by_stripe(data: bytes) -> bytes:
+	"""Previous implementation : a decryptor and a write for every stripe."""
+	cipher = Cipher(Blowfish(KEY), modes.CBC(IV), default_backend())
+	out = []
+	for start in range(0, len(data), 6144):
+		chunk = data[start : start + 6144]
+		if len(chunk) < 2048:
+			out.append(chunk)
+			continue
+		decryptor = cipher.decryptor()
+		out.append(decryptor.update(chunk[:2048]) + decryptor.finalize())
+		out.append(chunk[2048:])
+	return b"".join(out)
+
+
+async def output_file_by_stripe(data: bytes, path: str):
+	"""Previous implementation of DecryptDeezer.output_file."""
+	cipher = Cipher(Blowfish(KEY), modes.CBC(IV), default_backend())
+
+	async def write(f, chunk: bytes):
+		if len(chunk) < 2048:
+			await f.write(chunk)
+			return
+		decryptor = cipher.decryptor()
+		await f.write(decryptor.update(chunk[:2048]) + decryptor.finalize())
+		await f.write(chunk[2048:])
+
+	async with aiofiles.open(path, "wb") as f:
+		previous_chunk = b""
+		async for chunk, _ in FakeContent(data).iter_chunks():
+			chunk = previous_chunk + chunk
+			full_length = len(chunk) - len(chunk) % 6144
+			for start in range(0, full_length, 6144):
+				await write(f, chunk[start : start + 6144])
+			previous_chunk = chunk[full_length:]
+		await write(f, previous_chunk)
+
+
+class FakeContent:
+	def __init__(self, data: bytes):
+		self.data = data
+
+	async def iter_chunks(self):
+		for start in range(0, len(self.data), NETWORK_CHUNK):
+			# Let the other tasks run, like a socket waiting for data
+			await asyncio.sleep(0)
+			yield self.data[start : start + NETWORK_CHUNK], True
+
+
+class FakeResponse:
+	def __init__(self, data: bytes):
+		self.content = FakeContent(data)
+
+
+class SilentProgressHandler(BaseProgressHandler):
+	def update(self, *args, **kwargs):
+		pass
+
+
+class DecryptDeezerTest(unittest.IsolatedAsyncioTestCase):
+	@classmethod
+	def setUpClass(cls):
+		cls.plain = os.urandom(FILE_SIZE)
+		cls.encrypted = encrypt(cls.plain)
+
+	def setUp(self):
+		fd, self.path = tempfile.mkstemp()
+		os.close(fd)
+
+	def tearDown(self):
+		os.remove(self.path)
+
+	def test_decrypt_buffer(self):
+		decrypter = DecryptDeezer(KEY, SilentProgressHandler())
+		for length in (0, 100, 2048, 6144, 6144 + 2047, 6144 * 3 + 4000):
+			buffer = bytearray(self.encrypted[:length])
+			decrypter.decrypt_buffer(memoryview(buffer))
+			self.assertEqual(
+				bytes(buffer), decrypt_by_stripe(self.encrypted[:length]), f"length {length}"
+			)
+
+	def _assert_decrypted(self, path: str):
+		with open(path, "rb") as f:
+			self.assertEqual(f.read(), self.plain)
+
+	async def _measure(self, func) -> tuple[float, int]:
+		tracemalloc.start()
+		start = time.perf_counter()
+		await func()
+		duration = time.perf_counter() - start
+		_, peak = tracemalloc.get_traced_memory()
+		tracemalloc.stop()
+		return FILE_SIZE / 1024 / 1024 / duration, peak // 1024
+
+	@benchmark
+	async def test_benchmark_output_file(self):
+		decrypter = DecryptDeezer(KEY, SilentProgressHandler())
+
+		async def by_stripe():
+			await output_file_by_stripe(self.encrypted, self.path)
+
+		async def buffered():
+			await decrypter.output_file(FILE_SIZE, self.path, FakeResponse(self.encrypted))  # type: ignore
+
+		speed_reference, peak_reference = await self._measure(by_stripe)
+		speed, peak = await self._measure(buffered)
+
+		self._assert_decrypted(self.path)
+
+		logger.info(
+			"Decrypt %.0f MB to disk: by stripe %.1f MB/s (peak %d KB allocated), "
+			"buffered %.1f MB/s (peak %d KB allocated)",
+			FILE_SIZE / 1024 / 1024,
+			speed_reference,
+			peak_reference,
+			speed,
+			peak,
+		)
+		self.assertGreater(speed, speed_reference)
+
+	async def test_process_pool(self):
+		with ProcessPoolExecutor(1) as executor:
+			decrypter = DecryptDeezer(KEY, SilentProgressHandler(), executor=executor)
+			await decrypter.output_file(FILE_SIZE, self.path, FakeResponse(self.encrypted))  # type: ignore
+
+		self._assert_decrypted(self.path)
+
+	@benchmark
+	async def test_loop_lag_concurrent_downloads(self):
+		paths = [f"{self.path}.{i}" for i in range(CONCURRENT_DOWNLOADS)]
+		monitor = LoopLagMonitor(interval=0.01, budget=LAG_BUDGET)
+
+		with ThreadPoolExecutor(2) as executor:
+			monitor.start()
+			try:
+				await asyncio.gather(
+					*(
+						DecryptDeezer(KEY, SilentProgressHandler(), executor=executor).output_file(
+							FILE_SIZE,
+							path,
+							FakeResponse(self.encrypted),  # type: ignore
+						)
+						for path in paths
+					)
+				)
+			finally:
+				await monitor.stop()
+
+		try:
+			for path in paths:
+				self._assert_decrypted(path)
+		finally:
+			for path in paths:
+				os.remove(path)
+
+		logger.info(
+			"%d concurrent decryptions of %.0f MB: %s",
+			CONCURRENT_DOWNLOADS,
+			FILE_SIZE / 1024 / 1024,
+			monitor,
+		)
+		self.assertGreater(monitor.samples, 0)
+		self.assertLess(monitor.max_lag, LAG_BUDGET)
+
+
+if __name__ == "__main__":
+	unittest.main(failfast=True)
@@ -1,8 +1,18 @@
+import asyncio
 import os
 import shutil
+import sys
+import tempfile
 import unittest
+from typing import Any, ClassVar
+from unittest.mock import AsyncMock, patch
 
+from urllib3.exceptions import MaxRetryError
+
+from pyramid.connector.deezer.client_pool import DeezerClientPool
 from pyramid.connector.deezer.downloader import DeezerDownloader
+from pyramid.connector.deezer.track_cache import TrackCache
+from pyramid.tools.file_stream import FileStream
 
 class DeezerDownloadTest(unittest.IsolatedAsyncioTestCase):
 	def __init__(self, methodName: str = "runTest") -> None:
@@ -20,5 +30,172 @@ class DeezerDownloadTest(unittest.IsolatedAsyncioTestCase):
 		shutil.rmtree(self.path)
 
 
+class DeezerDownloadCacheTest(unittest.IsolatedAsyncioTestCase):
+	TRACK_INFO: ClassVar[dict[str, Any]] = {
+		"SNG_ID": "2308590",
+		"SNG_TITLE": "Title",
+		"ART_NAME": "Artist",
+		"ART_PICTURE": "",
+		"ARTISTS": [{"ART_NAME": "Artist"}],
+		"ALB_TITLE": "Album",
+		"ALB_PICTURE": "",
+		"DURATION": "180",
+		"FILESIZE": "3",
+		"FILESIZE_MP3_128": "3",
+		"PHYSICAL_RELEASE_DATE": "0000-00-00",
+	}
+
+	def setUp(self):
+		self.tmp = tempfile.TemporaryDirectory()
+		cache = TrackCache(self.tmp.name, 1024)
+		key = TrackCache.key(2308590, "MP3_128")
+		with open(cache.path(key), "wb") as f:
+			f.write(b"mp3")
+		cache.add(key, cache.path(key), self.TRACK_INFO)
+
+	def tearDown(self):
+		self.tmp.cleanup()
+
+	@patch.object(DeezerClientPool, "get", new_callable=AsyncMock)
+	async def test_cache_hit_without_network(self, mock_get: AsyncMock):
+		cli = DeezerDownloader(self.tmp.name, cache_size=1024)
+		try:
+			track = await cli.dl_track_by_id(2308590)
+		finally:
+			await cli.close()
+
+		assert track is not None
+		self.assertEqual(track.get_full_name(), "Artist - Title")
+		self.assertTrue(os.path.isfile(track.file_local))
+		mock_get.assert_not_awaited()
+
+
+class FakeDeezerClient:
+	def __init__(self, track_info: dict):
+		self.track_info = track_info
+		self.downloads = 0
+		self.cancelled = 0
+		self.content = b"mp3"
+		self.error: Exception | None = None
+		self.download_retries = 2
+
+	async def get_track_info(self, track_id):
+		await asyncio.sleep(0.01)
+		return self.track_info
+
+	async def download_track(self, track_info, download_dir, quality, fallback, filename, *args):
+		stream: FileStream | None = args[6]
+		self.downloads += 1
+		if self.error is not None:
+			raise self.error
+		download_path = os.path.join(download_dir, filename + ".mp3")
+		with await asyncio.to_thread(open, download_path, "wb") as f:
+			for i in range(len(self.content)):
+				try:
+					await asyncio.sleep(0.02)
+				except asyncio.CancelledError:
+					self.cancelled += 1
+					raise
+				f.write(self.content[i : i + 1])
+				f.flush()
+				if stream is not None:
+					stream.update(i + 1)
+		return download_path, "MP3_128"
+
+	def _retry_delay(self, retries: int) -> float:
+		return 0
+
+
+class DeezerDownloadSharedTest(unittest.IsolatedAsyncioTestCase):
+	async def asyncSetUp(self):
+		self.tmp = tempfile.TemporaryDirectory()
+		self.client = FakeDeezerClient(DeezerDownloadCacheTest.TRACK_INFO)
+		patcher = patch.object(DeezerClientPool, "get", new=AsyncMock(return_value=self.client))
+		patcher.start()
+		self.addCleanup(patcher.stop)
+		self.cli = DeezerDownloader(self.tmp.name, cache_size=1024, stream_buffer_size=1)
+
+	async def asyncTearDown(self):
+		await self.cli.close()
+		self.tmp.cleanup()
+
+	async def test_concurrent_downloads_shared(self):
+		tracks = await asyncio.gather(*(self.cli.dl_track_by_id(2308590) for _ in range(5)))
+
+		self.assertEqual(self.client.downloads, 1)
+		self.assertTrue(all(t is not None for t in tracks))
+		# Each caller has its own track
+		self.assertEqual(len({id(t) for t in tracks}), 5)
+		self.assertEqual({t.file_local for t in tracks if t}, {tracks[0].file_local})  # type: ignore
+		# No partial file left
+		files = sorted(os.listdir(self.tmp.name))
+		self.assertEqual(files, ["2308590_MP3_128.mp3", "cache_index.json"])
+
+	async def test_stream_shares_download(self):
+		streamed, complete = await asyncio.gather(
+			self.cli.dl_track_by_id(2308590, stream=True), self.cli.dl_track_by_id(2308590)
+		)
+
+		self.assertEqual(self.client.downloads, 1)
+		assert streamed is not None and complete is not None
+		self.assertIsNone(complete.stream)
+		self.assertEqual(os.path.getsize(complete.file_local), 3)
+		# Returned after the first byte, while the track was still being written
+		assert streamed.stream is not None
+		self.assertTrue(streamed.stream.success)
+		self.assertEqual(streamed.file_local, complete.file_local)
+		with streamed.stream.open() as reader:
+			self.assertEqual(reader.read(), b"mp3")
+
+	async def test_cancelled_download(self):
+		self.client.content = b"mp3" * 10
+		self.client.track_info = dict(self.client.track_info, FILESIZE_MP3_128="30")
+		request = asyncio.create_task(self.cli.dl_track_by_id(2308590))
+		await asyncio.sleep(0.05)
+		request.cancel()
+		await asyncio.sleep(0.05)
+
+		self.assertEqual(self.client.cancelled, 1)
+		self.assertEqual([f for f in os.listdir(self.tmp.name) if f.endswith(".mp3")], [])
+
+	async def test_streamed_download_not_cancelled(self):
+		streamed = await self.cli.dl_track_by_id(2308590, stream=True)
+		request = asyncio.create_task(self.cli.dl_track_by_id(2308590))
+		await asyncio.sleep(0.01)
+		request.cancel()
+
+		assert streamed is not None and streamed.stream is not None
+		self.assertTrue(await streamed.stream.wait_for(sys.maxsize))
+		self.assertEqual(self.client.cancelled, 0)
+
+	async def test_background_error_logged(self):
+		with (
+			patch("os.replace", side_effect=OSError("disk full")),
+			self.assertLogs(level="WARNING") as logs,
+		):
+			track = await self.cli.dl_track_by_id(2308590)
+			await asyncio.sleep(0.01)
+
+		self.assertIsNone(track)
+		self.assertIn("disk full", "\n".join(logs.output))
+		self.assertEqual(os.listdir(self.tmp.name), ["cache_index.json"])
+
+	async def test_retries_bounded(self):
+		self.client.error = MaxRetryError(None, "https://cdn", None)  # type: ignore
+		with self.assertLogs(level="WARNING"):
+			track = await self.cli.dl_track_by_id(2308590)
+
+		self.assertIsNone(track)
+		# The first attempt and its retries
+		self.assertEqual(self.client.downloads, 3)
+
+	async def test_truncated_download_rejected(self):
+		self.client.content = b"mp"
+		track = await self.cli.dl_track_by_id(2308590)
+
+		self.assertIsNone(track)
+		self.assertEqual(os.listdir(self.tmp.name), ["cache_index.json"])
+
+
 if __name__ == "__main__":
 	unittest.main(failfast=True)
@@ -0,0 +1,136 @@
+import asyncio
+import time
+import unittest
+
+from benchmark import benchmark, logger
+from fake_deezer_api import UNKNOWN_TITLE, FakeDeezerApi
+
+from pyramid.connector.deezer.search import CascadeMode, DeezerSearch
+from pyramid.data.track import TrackMinimalDeezer
+
+PLAYLIST_SIZE = 200
+LATENCY = 0.005
+
+
+class DeezerPlaylistTest(unittest.IsolatedAsyncioTestCase):
+	async def asyncSetUp(self):
+		self.api = FakeDeezerApi(latency=LATENCY, playlist_size=PLAYLIST_SIZE)
+		base_url = await self.api.start()
+		self.search = DeezerSearch(100)
+		self.search.client.base_url = base_url
+		# The benchmark measures the resolution, not the Deezer quota
+		self.search.client.rate_limiter.max_requests = PLAYLIST_SIZE * 10
+
+	async def asyncTearDown(self):
+		await self.search.close()
+		await self.api.stop()
+
+	async def _serial(
+		self, playlist_id: int
+	) -> tuple[list[TrackMinimalDeezer], list[TrackMinimalDeezer]]:
+		"""Previous implementation : each track is searched after the previous one."""
+		playlist = await self.search.client.async_get_playlist(playlist_id)
+		real_tracks: list[TrackMinimalDeezer] = []
+		unfindable_track: list[TrackMinimalDeezer] = []
+		async for chunk_tracks in playlist.get_tracks():  # type: ignore
+			for t in chunk_tracks:
+				track = await self.search.search_exact_track(
+					t.artist.name, t.album.title, t.title, CascadeMode.SEQUENTIAL
+				)
+				if track is None:
+					unfindable_track.append(TrackMinimalDeezer(t))
+					continue
+				real_tracks.append(track)
+		return real_tracks, unfindable_track
+
+	async def test_order_and_progress(self):
+		progress: list[tuple[int, int]] = []
+		result = await self.search.get_playlist_tracks_by_id(
+			1, lambda r, u: progress.append((r, u))
+		)
+		assert result is not None
+		tracks, unfindable = result
+
+		unknown = PLAYLIST_SIZE // 10
+		self.assertEqual(len(tracks), PLAYLIST_SIZE - unknown)
+		self.assertEqual(len(unfindable), unknown)
+		expected_ids = [str(i) for i in range(PLAYLIST_SIZE) if i % 10 != 9]
+		self.assertEqual([t.id for t in tracks], expected_ids)
+		self.assertTrue(all(UNKNOWN_TITLE in t.name for t in unfindable))
+
+		self.assertEqual(len(progress), PLAYLIST_SIZE)
+		self.assertEqual(progress[-1], (PLAYLIST_SIZE - unknown, unknown))
+
+	async def test_progress_by_url(self):
+		progress: list[tuple[int, int]] = []
+		pages = await self.search.get_by_url_stream(
+			"https://www.deezer.com/fr/playlist/1", lambda r, u: progress.append((r, u))
+		)
+		assert pages is not None and not isinstance(pages, TrackMinimalDeezer)
+		async for _ in pages:
+			pass
+
+		unknown = PLAYLIST_SIZE // 10
+		self.assertEqual(progress[-1], (PLAYLIST_SIZE - unknown, unknown))
+
+	async def test_stream_pages(self):
+		pages = self.search.iter_playlist_tracks_by_id(1)
+		start = time.perf_counter()
+		first_tracks, first_unfindable = await anext(pages)
+		first_duration = time.perf_counter() - start
+		requests_first = self.api.requests
+		tracks = first_tracks + [t async for page in pages for t in page[0]]
+		duration = time.perf_counter() - start
+
+		logger.info(
+			"Playlist of %d tracks streamed: first page after %.2fs, all after %.2fs",
+			PLAYLIST_SIZE,
+			first_duration,
+			duration,
+		)
+		# The first page is given before the whole playlist is searched
+		self.assertEqual(len(first_tracks) + len(first_unfindable), self.api.page_size)
+		self.assertLess(requests_first, self.api.requests)
+		expected_ids = [str(i) for i in range(PLAYLIST_SIZE) if i % 10 != 9]
+		self.assertEqual([t.id for t in tracks], expected_ids)
+
+	async def test_stream_closed_early(self):
+		pages = self.search.iter_playlist_tracks_by_id(1)
+		await anext(pages)
+		await pages.aclose()
+		# Requests already sent may still reach the API
+		await asyncio.sleep(LATENCY * 2)
+		requests = self.api.requests
+		await asyncio.sleep(LATENCY * 10)
+		# Nothing is searched anymore
+		self.assertEqual(self.api.requests, requests)
+		self.assertLess(requests, PLAYLIST_SIZE)
+
+	@benchmark
+	async def test_benchmark_concurrent_resolution(self):
+		start = time.perf_counter()
+		reference = await self._serial(1)
+		duration_serial = time.perf_counter() - start
+		requests_serial = self.api.requests
+		self.search.client.response_cache.clear()
+
+		start = time.perf_counter()
+		result = await self.search.get_playlist_tracks_by_id(1)
+		duration = time.perf_counter() - start
+		assert result is not None
+
+		logger.info(
+			"Playlist of %d tracks (%d requests, %.0f ms each): serial %.2fs, concurrent %.2fs",
+			PLAYLIST_SIZE,
+			requests_serial,
+			LATENCY * 1000,
+			duration_serial,
+			duration,
+		)
+		self.assertEqual([t.id for t in result[0]], [t.id for t in reference[0]])
+		self.assertEqual([t.id for t in result[1]], [t.id for t in reference[1]])
+		self.assertGreater(duration_serial, duration * 2)
+
+
+if __name__ == "__main__":
+	unittest.main(failfast=True)
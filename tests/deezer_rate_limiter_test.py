@@ -0,0 +1,131 @@
+import asyncio
+import time
+import unittest
+
+from benchmark import benchmark, logger
+
+from pyramid.connector.deezer.cli_deezer import AsyncRateLimiter, RequestPriority, request_priority
+
+
+class AsyncRateLimiterTest(unittest.IsolatedAsyncioTestCase):
+	async def _run(self, limiter: AsyncRateLimiter, count: int) -> list[float]:
+		times: list[float] = []
+
+		async def request():
+			await limiter.check()
+			times.append(time.monotonic())
+
+		await asyncio.gather(*(request() for _ in range(count)))
+		return times
+
+	async def test_window(self):
+		limiter = AsyncRateLimiter(10, 0.1)
+		times = sorted(await self._run(limiter, 35))
+		for i in range(len(times) - 10):
+			# Never more than 10 requests in any window
+			self.assertGreaterEqual(times[i + 10] - times[i], 0.1 - 0.005)
+		self.assertEqual(len(times), 35)
+
+	async def test_fifo(self):
+		limiter = AsyncRateLimiter(1, 0.02)
+		order: list[int] = []
+
+		async def request(i: int):
+			await limiter.check()
+			order.append(i)
+
+		tasks = []
+		for i in range(5):
+			tasks.append(asyncio.create_task(request(i)))
+			await asyncio.sleep(0)
+		await asyncio.gather(*tasks)
+		self.assertEqual(order, list(range(5)))
+
+	async def test_priority(self):
+		limiter = AsyncRateLimiter(1, 0.02)
+		await limiter.check()
+		order: list[str] = []
+
+		async def request(name: str, priority: RequestPriority):
+			request_priority.set(priority)
+			await limiter.check()
+			order.append(name)
+
+		bulk = [asyncio.create_task(request(f"bulk{i}", RequestPriority.BULK)) for i in range(3)]
+		await asyncio.sleep(0)
+		interactive = asyncio.create_task(request("search", RequestPriority.INTERACTIVE))
+		await asyncio.gather(interactive, *bulk)
+		self.assertEqual(order, ["search", "bulk0", "bulk1", "bulk2"])
+
+	async def test_cancelled_waiter(self):
+		limiter = AsyncRateLimiter(1, 0.02)
+		await limiter.check()
+		waiter = asyncio.create_task(limiter.check())
+		await asyncio.sleep(0)
+		waiter.cancel()
+		await asyncio.gather(waiter, return_exceptions=True)
+		await asyncio.sleep(0.02)
+		# The cancelled request neither waits in the queue nor takes the next slot
+		self.assertEqual(limiter.available(), 1)
+		await limiter.check()
+		self.assertEqual(limiter.available(), 0)
+
+	async def test_adaptive_backoff(self):
+		limiter = AsyncRateLimiter(100, 0.1, min_backoff=0.05, max_backoff=0.15)
+		limiter.penalize()
+		# Errors of the requests already sent don't extend the backoff
+		limiter.penalize()
+		self.assertEqual(limiter.backoff, 0.05)
+		self.assertEqual(limiter.available(), 0)
+
+		start = time.monotonic()
+		await limiter.check()
+		self.assertGreaterEqual(time.monotonic() - start, 0.04)
+
+		limiter.penalize()
+		self.assertEqual(limiter.backoff, 0.1)
+		await limiter.check()
+		limiter.penalize()
+		self.assertEqual(limiter.backoff, 0.15)
+
+		# Reset after a window without error
+		await asyncio.sleep(0.3)
+		await limiter.check()
+		self.assertEqual(limiter.backoff, 0)
+
+	async def _throughput(self, limiter: AsyncRateLimiter, count: int) -> tuple[float, float]:
+		"""
+		Returns:
+		- tuple[float, float]: Duration of the requests, and the minimum allowed by the quota.
+		"""
+		times = await self._run(limiter, count)
+		# From the first request, the creation of the tasks is slow in debug mode
+		duration = max(times) - min(times)
+		# 50 requests per 50 ms at most, so 1000 requests take 19 windows
+		expected = (count // limiter.max_requests - 1) * limiter.time_interval
+		return duration, expected
+
+	async def test_throughput(self):
+		duration, expected = await self._throughput(AsyncRateLimiter(50, 0.05), 1000)
+		self.assertGreaterEqual(duration, expected - 0.01)
+
+	@benchmark
+	async def test_benchmark_throughput(self):
+		limiter = AsyncRateLimiter(50, 0.05)
+		count = 1000
+		duration, expected = await self._throughput(limiter, count)
+		logger.info(
+			"%d requests at %d per %.0f ms: %.2fs (%.0f req/s, quota %.0f req/s)",
+			count,
+			limiter.max_requests,
+			limiter.time_interval * 1000,
+			duration,
+			count / duration,
+			limiter.max_requests / limiter.time_interval,
+		)
+		# The waiters are woken together, the quota is used almost entirely
+		self.assertLess(duration, expected * 1.5)
+
+
+if __name__ == "__main__":
+	unittest.main(failfast=True)
@@ -0,0 +1,79 @@
+import asyncio
+import unittest
+
+from fake_deezer_api import MISSING_TRACK_ID, FakeDeezerApi
+
+from pyramid.connector.deezer.cli_deezer import CliDeezer, CliDeezerNoDataException
+from pyramid.connector.deezer.response_cache import ResponseCache
+
+
+class ResponseCacheTest(unittest.TestCase):
+	def test_size_bounded(self):
+		cache = ResponseCache(max_size=10)
+		cache.put("a", b"12345")
+		cache.put("b", b"12345")
+		cache.get("a")
+		cache.put("c", b"12345")
+
+		# The least recently used is evicted
+		self.assertIsNone(cache.get("b"))
+		self.assertEqual(cache.get("a"), b"12345")
+		self.assertEqual(cache.size, 10)
+		self.assertEqual(cache.stats.evictions, 1)
+
+		cache.put("d", b"x" * 11)
+		self.assertIsNone(cache.get("d"))
+
+	def test_key(self):
+		self.assertEqual(
+			ResponseCache.key("GET", "search", {"q": "a", "limit": 1}),
+			ResponseCache.key("GET", "search", {"limit": 1, "q": "a"}),
+		)
+
+
+class CliDeezerResponseCacheTest(unittest.IsolatedAsyncioTestCase):
+	async def asyncSetUp(self):
+		self.api = FakeDeezerApi()
+		self.cli = CliDeezer(response_cache=ResponseCache(ttl=0.1, negative_ttl=0.05))
+		self.cli.base_url = await self.api.start()
+		self.cache = self.cli.response_cache
+
+	async def asyncTearDown(self):
+		await self.cli.close()
+		await self.api.stop()
+
+	async def test_hit(self):
+		first = await self.cli.async_get_track(1)
+		second = await self.cli.async_get_track(1)
+		self.assertEqual(self.api.requests, 1)
+		self.assertEqual(second.title, first.title)
+		self.assertIsNot(second, first)
+		self.assertEqual((self.cache.stats.hits, self.cache.stats.misses), (1, 1))
+
+		await asyncio.sleep(0.1)
+		await self.cli.async_get_track(1)
+		self.assertEqual(self.api.requests, 2)
+		self.assertEqual(self.cache.stats.expirations, 1)
+
+	async def test_paginated_hit(self):
+		playlist = await self.cli.async_get_playlist(1)
+		first = await playlist.get_tracks().get_all()  # type: ignore
+		second = await playlist.get_tracks().get_all()  # type: ignore
+		self.assertEqual([t.id for t in first], [t.id for t in second])
+		self.assertEqual(self.api.requests, 3)
+
+	async def test_negative(self):
+		for _ in range(2):
+			with self.assertRaises(CliDeezerNoDataException):
+				await self.cli.async_get_track(MISSING_TRACK_ID)
+		self.assertEqual(self.api.requests, 1)
+		self.assertEqual(self.cache.stats.negative_hits, 1)
+
+		await asyncio.sleep(0.05)
+		with self.assertRaises(CliDeezerNoDataException):
+			await self.cli.async_get_track(MISSING_TRACK_ID)
+		self.assertEqual(self.api.requests, 2)
+
+
+if __name__ == "__main__":
+	unittest.main(failfast=True)
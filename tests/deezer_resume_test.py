@@ -0,0 +1,285 @@
+import asyncio
+import os
+import tempfile
+import unittest
+import warnings
+from unittest.mock import patch
+
+from aiohttp import web
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives.ciphers import Cipher, modes
+from pydeezer import util
+from pydeezer.ProgressHandler import BaseProgressHandler
+
+from pyramid.connector.deezer.py_deezer import DlDeezerInterruptedException, PyDeezer
+from pyramid.tools.file_stream import FileStream
+
+with warnings.catch_warnings():
+	warnings.simplefilter("ignore")
+	from cryptography.hazmat.primitives.ciphers.algorithms import Blowfish
+
+TRACK = {"SNG_ID": "3135556", "SNG_TITLE": "Title"}
+FILE_SIZE = 500 * 1024 + 1000
+DROP_AFTER = 100 * 1000
+
+
+def encrypt(data: bytes) -> bytes:
+	key = util.get_blowfish_key(TRACK["SNG_ID"])
+	cipher = Cipher(Blowfish(key), modes.CBC(bytes(range(8))), default_backend())
+	out = bytearray(data)
+	for start in range(0, len(data) - 2048 + 1, 6144):
+		encryptor = cipher.encryptor()
+		out[start : start + 2048] = (
+			encryptor.update(data[start : start + 2048]) + encryptor.finalize()
+		)
+	return bytes(out)
+
+
+class SilentProgressHandler(BaseProgressHandler):
+	def update(self, *args, **kwargs):
+		pass
+
+	def close(self, *args, **kwargs):
+		pass
+
+
+class FlakyCdn:
+	"""
+	Local stand-in for a Deezer CDN, whose responses are cut before their end.
+	"""
+
+	def __init__(self, data: bytes):
+		self.data = data
+		# Number of next responses cut after `drop_after` bytes
+		self.failures = 0
+		# Number of next responses stalled after `drop_after` bytes, without being closed
+		self.stalls = 0
+		# Number of next requests whose connection is closed before any response
+		self.disconnects = 0
+		self.drop_after = DROP_AFTER
+		self.stopped = asyncio.Event()
+		self.accept_ranges = True
+		# Whether the ranges are sent without a Content-Length
+		self.chunked_ranges = False
+		# Codes of the qualities not available
+		self.unavailable: set[str] = set()
+		self.requests: list[tuple[str, str | None]] = []
+		self.app = web.Application()
+		self.app.router.add_get("/track/{code}", self._track)
+		self.runner: web.AppRunner | None = None
+
+	async def start(self) -> str:
+		self.runner = web.AppRunner(self.app)
+		await self.runner.setup()
+		site = web.TCPSite(self.runner, "127.0.0.1", 0)
+		await site.start()
+		port = site._server.sockets[0].getsockname()[1]  # type: ignore
+		return f"http://127.0.0.1:{port}/track"
+
+	@property
+	def ranges(self) -> list[str | None]:
+		return [range_header for _, range_header in self.requests]
+
+	async def stop(self):
+		self.stopped.set()
+		if self.runner is not None:
+			await self.runner.cleanup()
+
+	async def _track(self, request: web.Request):
+		range_header = request.headers.get("Range")
+		self.requests.append((request.match_info["code"], range_header))
+		if self.disconnects > 0:
+			self.disconnects -= 1
+			assert request.transport is not None
+			request.transport.close()
+			return web.Response()
+		if request.match_info["code"] in self.unavailable:
+			return web.Response(status=403)
+		start = 0
+		response = web.StreamResponse()
+		if range_header is not None and self.accept_ranges:
+			first, _, last = range_header.removeprefix("bytes=").partition("-")
+			start = int(first)
+			end = int(last) + 1 if last else len(self.data)
+			response.set_status(206)
+			response.headers["Content-Range"] = f"bytes {start}-{end - 1}/{len(self.data)}"
+		else:
+			end = len(self.data)
+		body = self.data[start:end]
+		if range_header is not None and self.chunked_ranges:
+			response.enable_chunked_encoding()
+		else:
+			response.content_length = len(body)
+		await response.prepare(request)
+
+		if self.failures > 0:
+			self.failures -= 1
+			await response.write(body[: self.drop_after])
+			assert request.transport is not None
+			request.transport.close()
+			return response
+		if self.stalls > 0:
+			self.stalls -= 1
+			await response.write(body[: self.drop_after])
+			await self.stopped.wait()
+			return response
+		await response.write(body)
+		await response.write_eof()
+		return response
+
+
+class DeezerResumeTest(unittest.IsolatedAsyncioTestCase):
+	@classmethod
+	def setUpClass(cls):
+		cls.plain = os.urandom(FILE_SIZE)
+		cls.encrypted = encrypt(cls.plain)
+
+	async def asyncSetUp(self):
+		self.tmp = tempfile.TemporaryDirectory()
+		self.cdn = FlakyCdn(self.encrypted)
+		url = await self.cdn.start()
+		self.client = PyDeezer(
+			transport=PyDeezer.create_transport(),
+			retry_backoff=0.01,
+			max_retry_backoff=0.05,
+			read_timeout=0.2,
+		)
+		patcher = patch.object(self.client, "_download_url", lambda track, code: f"{url}/{code}")
+		patcher.start()
+		self.addCleanup(patcher.stop)
+
+	async def asyncTearDown(self):
+		await self.client.transport.close()
+		await self.cdn.stop()
+		self.tmp.cleanup()
+
+	async def _download(
+		self, stream: FileStream | None = None, quality: str = "MP3_128", expected: str = "MP3_128"
+	) -> str:
+		download_path, quality = await self.client.download_track(
+			TRACK,
+			self.tmp.name,
+			quality,
+			True,
+			"track",
+			False,
+			False,
+			False,
+			", ",
+			False,
+			SilentProgressHandler(),
+			stream,
+		)
+		self.assertEqual(quality, expected)
+		return download_path
+
+	def _assert_downloaded(self, download_path: str):
+		with open(download_path, "rb") as f:
+			self.assertEqual(f.read(), self.plain)
+
+	async def test_resume_after_drops(self):
+		self.cdn.failures = 2
+		stream = FileStream(os.path.join(self.tmp.name, "track.mp3"))
+		download_path = await self._download(stream)
+
+		self._assert_downloaded(download_path)
+		self.assertEqual(stream.written, FILE_SIZE)
+		# Resumed at the end of the last complete chunk received
+		first = DROP_AFTER - DROP_AFTER % 6144
+		second = first + DROP_AFTER - (first + DROP_AFTER) % 6144
+		self.assertEqual(self.cdn.ranges, [None, f"bytes={first}-", f"bytes={second}-"])
+
+	async def test_resume_after_stall(self):
+		self.cdn.stalls = 1
+		download_path = await self._download()
+
+		self._assert_downloaded(download_path)
+		first = DROP_AFTER - DROP_AFTER % 6144
+		self.assertEqual(self.cdn.ranges, [None, f"bytes={first}-"])
+
+	async def test_first_request_retried(self):
+		self.cdn.disconnects = 2
+		download_path = await self._download()
+
+		self._assert_downloaded(download_path)
+		self.assertEqual(self.cdn.requests, [("1", None)] * 3)
+
+	async def test_range_not_supported(self):
+		self.cdn.failures = 1
+		self.cdn.accept_ranges = False
+		download_path = await self._download()
+
+		self._assert_downloaded(download_path)
+		self.assertEqual(len(self.cdn.ranges), 2)
+
+	async def test_range_without_length(self):
+		self.cdn.failures = 1
+		self.cdn.chunked_ranges = True
+		download_path = await self._download()
+
+		self._assert_downloaded(download_path)
+		first = DROP_AFTER - DROP_AFTER % 6144
+		self.assertEqual(self.cdn.ranges, [None, f"bytes={first}-"])
+
+	async def test_retry_budget(self):
+		self.client.download_retries = 2
+		self.cdn.failures = 10
+		self.cdn.drop_after = 1000
+
+		with self.assertRaises(DlDeezerInterruptedException) as context:
+			await self._download()
+		self.assertEqual(context.exception.position, 0)
+		self.assertEqual(len(self.cdn.ranges), 3)
+
+	async def test_single_request(self):
+		download_path = await self._download()
+
+		self._assert_downloaded(download_path)
+		self.assertEqual(self.cdn.requests, [("1", None)])
+
+	async def test_fallback_cached(self):
+		self.cdn.unavailable = {"9", "3"}
+		download_path = await self._download(quality="FLAC")
+		self._assert_downloaded(download_path)
+		# FLAC, then the fallback qualities MP3_320 and MP3_128
+		self.assertEqual([code for code, _ in self.cdn.requests], ["9", "3", "1"])
+
+		self.cdn.requests.clear()
+		await self._download(quality="FLAC")
+		self.assertEqual(self.cdn.requests, [("1", None)])
+
+	async def test_cached_url_expired(self):
+		self.client.download_url_ttl = 0
+		await self._download()
+		self.cdn.unavailable = {"1"}
+		await self._download(expected="MP3_320")
+		self.assertEqual([code for code, _ in self.cdn.requests], ["1", "1", "3"])
+
+	async def test_cached_url_invalid(self):
+		await self._download()
+		self.cdn.unavailable = {"1"}
+		await self._download(expected="MP3_320")
+		# The cached URL, then each quality again
+		self.assertEqual([code for code, _ in self.cdn.requests], ["1", "1", "1", "3"])
+
+	async def test_get_track_download_url(self):
+		self.cdn.unavailable = {"1"}
+		url, quality = await self.client.get_track_download_url(TRACK)
+		self.assertEqual(quality, "MP3_320")
+		self.assertTrue(url.endswith("/3"))
+		# Probed with their first byte only
+		self.assertEqual(self.cdn.requests, [("1", "bytes=0-0"), ("3", "bytes=0-0")])
+
+		self.assertEqual(await self.client.get_track_download_url(TRACK), (url, quality))
+		self.assertEqual(len(self.cdn.requests), 2)
+
+	def test_retry_delay(self):
+		client = PyDeezer(retry_backoff=0.5, max_retry_backoff=8)
+		for retries, delay in ((1, 0.5), (2, 1), (3, 2), (6, 8), (10, 8)):
+			for _ in range(20):
+				self.assertGreaterEqual(client._retry_delay(retries), delay / 2)
+				self.assertLessEqual(client._retry_delay(retries), delay)
+
+
+if __name__ == "__main__":
+	unittest.main(failfast=True)
@@ -0,0 +1,76 @@
+import time
+import unittest
+
+from benchmark import benchmark, logger
+from fake_deezer_api import UNKNOWN_TITLE, FakeDeezerApi
+
+from pyramid.connector.deezer.search import CascadeMode, DeezerSearch
+
+LATENCY = 0.02
+
+
+class DeezerSearchCascadeTest(unittest.IsolatedAsyncioTestCase):
+	async def asyncSetUp(self):
+		self.api = FakeDeezerApi(latency=LATENCY)
+		self.base_url = await self.api.start()
+		self.searches: list[DeezerSearch] = []
+
+	async def asyncTearDown(self):
+		for search in self.searches:
+			await search.close()
+		await self.api.stop()
+
+	def _search(self, cascade: CascadeMode) -> DeezerSearch:
+		search = DeezerSearch(100, cascade=cascade)
+		search.client.base_url = self.base_url
+		self.searches.append(search)
+		return search
+
+	async def _miss(self, cascade: CascadeMode) -> tuple[float, int]:
+		search = self._search(cascade)
+		self.api.searches = 0
+		start = time.perf_counter()
+		track = await search.search_exact_track("Artist", "Album", f"Title 1 {UNKNOWN_TITLE}")
+		self.assertIsNone(track)
+		return time.perf_counter() - start, self.api.searches
+
+	async def test_same_result(self):
+		for cascade in CascadeMode:
+			track = await self._search(cascade).search_exact_track("Artist", "Album", "Title 5")
+			assert track is not None
+			self.assertEqual(track.id, "5", cascade)
+
+	async def test_duplicated_queries(self):
+		search = self._search(CascadeMode.SEQUENTIAL)
+		track = await search.search_exact_track("Artist", None, f"Title 1 {UNKNOWN_TITLE}")
+		self.assertIsNone(track)
+		self.assertEqual(self.api.searches, 2)
+
+	async def test_rate_limit_aware(self):
+		search = self._search(CascadeMode.PARALLEL)
+		search.client.rate_limiter.max_requests = 3
+		track = await search.search_exact_track("Artist", "Album", "Title 5")
+		self.assertIsNotNone(track)
+		# Not enough quota for the 4 queries, only the first one is sent
+		self.assertEqual(self.api.searches, 1)
+
+	@benchmark
+	async def test_benchmark_miss(self):
+		durations = {}
+		for cascade in CascadeMode:
+			durations[cascade], searches = await self._miss(cascade)
+			self.assertEqual(searches, 4)
+
+		logger.info(
+			"Search miss (%.0f ms per request): %s",
+			LATENCY * 1000,
+			", ".join(
+				f"{cascade.name.lower()} {d * 1000:.0f} ms" for cascade, d in durations.items()
+			),
+		)
+		self.assertGreater(durations[CascadeMode.SEQUENTIAL], durations[CascadeMode.WAVES])
+		self.assertGreater(durations[CascadeMode.SEQUENTIAL], durations[CascadeMode.PARALLEL] * 2)
+
+
+if __name__ == "__main__":
+	unittest.main(failfast=True)
@@ -0,0 +1,155 @@
+import asyncio
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+from benchmark import benchmark, logger
+from equivalence_cache_test import deezer_track, spotify_track
+
+from pyramid.data.exceptions import TrackNotFoundException
+from pyramid.data.functional.engine_source import EngineSource
+from pyramid.data.track import TrackMinimal, TrackMinimalDeezer
+from pyramid.tools.configuration.configuration import Configuration
+
+TRACKS = 100
+LATENCY = 0.01
+WORKERS = 8
+
+
+class EngineSourceEquivalentsTest(unittest.IsolatedAsyncioTestCase):
+	async def asyncSetUp(self):
+		self.tmp = tempfile.TemporaryDirectory()
+		config = Configuration()
+		config.deezer__folder = self.tmp.name
+		config.spotify__client_id = "id"
+		config.spotify__client_secret = "secret"
+		config.general__convert_workers = WORKERS
+		self.engine = EngineSource(config)
+		self.searched: list[str] = []
+		self.running = 0
+		self.max_running = 0
+
+		async def equivalent(track: TrackMinimal) -> TrackMinimalDeezer:
+			self.searched.append(track.id)
+			self.running += 1
+			self.max_running = max(self.max_running, self.running)
+			try:
+				await asyncio.sleep(LATENCY)
+			finally:
+				self.running -= 1
+			if track.id.startswith("unknown"):
+				raise TrackNotFoundException("Not found")
+			return deezer_track(int(track.id))
+
+		patcher = patch.object(self.engine, "_equivalent_for_download", equivalent)
+		patcher.start()
+		self.addCleanup(patcher.stop)
+
+	async def asyncTearDown(self):
+		await self.engine.close()
+		self.tmp.cleanup()
+
+	def _stream_pages(self, pages):
+		"""Patch the Spotify search to give the pages of a playlist."""
+
+		async def get_by_url_stream(url, progress=None):
+			return pages()
+
+		spotify_search = self.engine._EngineSource__spotify_search  # type: ignore
+		return patch.object(spotify_search, "get_by_url_stream", get_by_url_stream)
+
+	async def test_order_and_unfindable(self):
+		tracks: list[TrackMinimal] = [spotify_track(str(i)) for i in range(TRACKS)]
+		tracks[10] = spotify_track("unknown")
+		tracks[20] = deezer_track(1000)
+		unfindable: list[TrackMinimal] = []
+
+		result = await self.engine._equivalents_for_download(tracks, unfindable)
+
+		expected = [str(i) for i in range(TRACKS) if i != 10]
+		expected[19] = "1000"
+		self.assertEqual([t.id for t in result], expected)
+		self.assertEqual([t.id for t in unfindable], ["unknown"])
+		self.assertLessEqual(self.max_running, WORKERS)
+
+	async def test_same_isrc_searched_once(self):
+		tracks: list[TrackMinimal] = [spotify_track(str(i), "FR0001") for i in range(3)]
+		result = await self.engine._equivalents_for_download(tracks, [])
+
+		self.assertEqual(self.searched, ["0"])
+		self.assertEqual([t.id for t in result], ["0", "0", "0"])
+
+	async def test_early_yield(self):
+		tracks: list[TrackMinimal] = [spotify_track(str(i)) for i in range(TRACKS)]
+		iterator = self.engine._iter_equivalents_for_download(tracks, [])
+		first = await anext(iterator)
+		self.assertEqual(first.id, "0")
+		# Conversions don't run far ahead of the consumer
+		self.assertLess(len(self.searched), TRACKS)
+		await iterator.aclose()
+
+	async def test_stream_by_url(self):
+		async def pages():
+			yield [spotify_track("0"), spotify_track("unknown")], []
+			yield [spotify_track("1")], []
+
+		with self._stream_pages(pages):
+			result = await self.engine.search_by_url_stream("https://open.spotify.com/playlist/x")
+			assert not isinstance(result, TrackMinimal)
+			converted = [
+				([t.id for t in tracks], [t.id for t in unfindable])
+				async for tracks, unfindable in result
+			]
+
+		self.assertEqual(converted, [(["0"], ["unknown"]), (["1"], [])])
+
+	async def test_stream_by_url_chunks(self):
+		async def pages():
+			yield [spotify_track(str(i)) for i in range(TRACKS)], []
+
+		with self._stream_pages(pages):
+			result = await self.engine.search_by_url_stream("https://open.spotify.com/playlist/x")
+			assert not isinstance(result, TrackMinimal)
+			first_tracks, _ = await anext(result)
+			# Given before the whole page is converted
+			self.assertEqual([t.id for t in first_tracks], [str(i) for i in range(WORKERS)])
+			self.assertLess(len(self.searched), TRACKS)
+			ids = [t.id for t in first_tracks]
+			ids += [t.id async for tracks, _ in result for t in tracks]
+
+		self.assertEqual(ids, [str(i) for i in range(TRACKS)])
+
+	async def test_stream_by_url_empty(self):
+		async def pages():
+			return
+			yield
+
+		with self._stream_pages(pages), self.assertRaises(TrackNotFoundException):
+			await self.engine.search_by_url_stream("https://open.spotify.com/playlist/x")
+
+	@benchmark
+	async def test_benchmark(self):
+		tracks: list[TrackMinimal] = [spotify_track(str(i)) for i in range(TRACKS)]
+
+		start = time.perf_counter()
+		for t in tracks:
+			await self.engine._equivalent_for_download(t)
+		duration_serial = time.perf_counter() - start
+
+		start = time.perf_counter()
+		await self.engine._equivalents_for_download(tracks, [])
+		duration = time.perf_counter() - start
+
+		logger.info(
+			"Conversion of %d tracks (%.0f ms each): serial %.2fs, concurrent %.2fs",
+			TRACKS,
+			LATENCY * 1000,
+			duration_serial,
+			duration,
+		)
+		self.assertGreater(duration_serial, duration * 2)
+
+
+if __name__ == "__main__":
+	unittest.main(failfast=True)
@@ -0,0 +1,95 @@
+import os
+import tempfile
+import time
+import unittest
+
+import deezer
+from fake_deezer_api import FakeDeezerApi
+
+from pyramid.data.functional.equivalence_cache import EquivalenceCache
+from pyramid.data.track import TrackMinimalDeezer, TrackMinimalSpotify
+
+
+def spotify_track(id: str, isrc: str | None = None) -> TrackMinimalSpotify:
+	return TrackMinimalSpotify(
+		{
+			"id": id,
+			"name": f"Title {id}",
+			"artists": [{"name": "Artist"}],
+			"album": {"name": "Album", "images": []},
+			"disc_number": 1,
+			"track_number": 1,
+			"explicit": False,
+			"duration_ms": 180000,
+			"external_ids": {"isrc": isrc} if isrc else {},
+			"is_local": False,
+		}
+	)
+
+
+def deezer_track(id: int) -> TrackMinimalDeezer:
+	track: deezer.Track = deezer.Client()._process_json(FakeDeezerApi.track_payload(id))  # type: ignore
+	return TrackMinimalDeezer(track)
+
+
+class EquivalenceCacheTest(unittest.TestCase):
+	def setUp(self):
+		self.tmp = tempfile.TemporaryDirectory()
+		self.path = os.path.join(self.tmp.name, "equivalences.json")
+
+	def tearDown(self):
+		self.tmp.cleanup()
+
+	def test_persistent(self):
+		cache = EquivalenceCache(self.path)
+		self.assertEqual(cache.get(spotify_track("a", "FR0001")), (False, None))
+		cache.put(spotify_track("a", "FR0001"), deezer_track(42))
+		cache.save()
+
+		cache = EquivalenceCache(self.path)
+		known, track = cache.get(spotify_track("a"))
+		self.assertTrue(known)
+		assert track is not None
+		self.assertEqual(track.id, "42")
+		self.assertEqual(track.get_full_name(), "Artist - Title 42")
+		self.assertEqual(track.to_dict(), deezer_track(42).to_dict())
+
+		# Another Spotify id with the same ISRC
+		known, track = cache.get(spotify_track("b", "FR0001"))
+		self.assertTrue(known)
+		self.assertIsNotNone(track)
+
+	def test_negative_ttl(self):
+		cache = EquivalenceCache(self.path, negative_ttl=0.05)
+		cache.put(spotify_track("a"), None)
+		self.assertEqual(cache.get(spotify_track("a")), (True, None))
+
+		time.sleep(0.1)
+		self.assertEqual(cache.get(spotify_track("a")), (False, None))
+		cache.save()
+		self.assertEqual(cache.count(), 0)
+
+	def test_stats(self):
+		cache = EquivalenceCache(self.path)
+		cache.put(spotify_track("a"), deezer_track(1))
+		cache.put(spotify_track("b"), None)
+		cache.get(spotify_track("a"))
+		cache.get(spotify_track("b"))
+		cache.get(spotify_track("c"))
+		cache.get(spotify_track("d"))
+
+		self.assertEqual(cache.stats.hits, 1)
+		self.assertEqual(cache.stats.negative_hits, 1)
+		self.assertEqual(cache.stats.misses, 2)
+		self.assertEqual(cache.stats.hit_rate(), 0.5)
+
+	def test_autosave(self):
+		cache = EquivalenceCache(self.path, autosave=2)
+		cache.put(spotify_track("a"), None)
+		self.assertFalse(os.path.exists(self.path))
+		cache.put(spotify_track("b"), None)
+		self.assertEqual(EquivalenceCache(self.path).count(), 2)
+
+
+if __name__ == "__main__":
+	unittest.main(failfast=True)
@@ -0,0 +1,131 @@
+import asyncio
+import re
+from typing import Any
+
+from aiohttp import web
+
+# Playlist tracks whose title contains it are not found by the search
+UNKNOWN_TITLE = "Unknown"
+# Tracks from this id have no data
+MISSING_TRACK_ID = 1_000_000
+
+
+class FakeDeezerApi:
+	"""
+	Local stand-in for api.deezer.com, serving tiny JSON payloads.
+	"""
+
+	def __init__(self, latency: float = 0, playlist_size: int = 50, page_size: int = 25):
+		self.latency = latency
+		self.playlist_size = playlist_size
+		self.page_size = page_size
+		# Positions of the playlist tracks left out of their page, like unavailable tracks
+		self.missing: set[int] = set()
+		self.requests = 0
+		self.searches = 0
+		self.in_flight = 0
+		self.max_in_flight = 0
+		self.connections: set[Any] = set()
+		self.app = web.Application()
+		self.app.router.add_get("/track/{id}", self._track)
+		self.app.router.add_get("/playlist/{id}", self._playlist)
+		self.app.router.add_get("/playlist/{id}/tracks", self._playlist_tracks)
+		self.app.router.add_get("/search", self._search)
+		self.runner: web.AppRunner | None = None
+		self.base_url = ""
+
+	async def start(self) -> str:
+		self.runner = web.AppRunner(self.app)
+		await self.runner.setup()
+		site = web.TCPSite(self.runner, "127.0.0.1", 0)
+		await site.start()
+		port = site._server.sockets[0].getsockname()[1]  # type: ignore
+		self.base_url = f"http://127.0.0.1:{port}"
+		return self.base_url
+
+	async def stop(self):
+		if self.runner is not None:
+			await self.runner.cleanup()
+
+	async def _count(self, request: web.Request):
+		self.requests += 1
+		if request.transport is not None:
+			self.connections.add(request.transport.get_extra_info("peername"))
+		if self.latency:
+			self.in_flight += 1
+			self.max_in_flight = max(self.max_in_flight, self.in_flight)
+			try:
+				await asyncio.sleep(self.latency)
+			finally:
+				self.in_flight -= 1
+
+	async def _track(self, request: web.Request):
+		await self._count(request)
+		track_id = int(request.match_info["id"])
+		if track_id >= MISSING_TRACK_ID:
+			return web.json_response(
+				{"error": {"type": "DataException", "message": "no data", "code": 800}}
+			)
+		return web.json_response(self.track_payload(track_id))
+
+	async def _playlist(self, request: web.Request):
+		await self._count(request)
+		playlist_id = int(request.match_info["id"])
+		return web.json_response(
+			{
+				"id": playlist_id,
+				"type": "playlist",
+				"title": f"Playlist {playlist_id}",
+				"nb_tracks": self.playlist_size,
+			}
+		)
+
+	async def _playlist_tracks(self, request: web.Request):
+		await self._count(request)
+		playlist_id = int(request.match_info["id"])
+		index = int(request.query.get("index", 0))
+		limit = int(request.query.get("limit", self.page_size))
+		end = min(index + limit, self.playlist_size)
+		payload: dict[str, Any] = {
+			"data": [
+				self.playlist_track_payload(i) for i in range(index, end) if i not in self.missing
+			],
+			"total": self.playlist_size,
+		}
+		if end < self.playlist_size:
+			payload["next"] = (
+				f"{self.base_url}/playlist/{playlist_id}/tracks?index={end}&limit={limit}"
+			)
+		return web.json_response(payload)
+
+	async def _search(self, request: web.Request):
+		await self._count(request)
+		self.searches += 1
+		match = re.search(r'track:"Title (\d+)[^"]*"', request.query.get("q", ""))
+		if match is None or UNKNOWN_TITLE in request.query.get("q", ""):
+			return web.json_response({"data": [], "total": 0})
+		return web.json_response({"data": [self.track_payload(int(match.group(1)))], "total": 1})
+
+	def playlist_track_payload(self, index: int) -> dict[str, Any]:
+		"""
+		Track of a playlist, with an id which is not the one of the searchable track.
+		"""
+		payload = self.track_payload(-index)
+		payload["title"] = f"Title {index}"
+		if index % 10 == 9:
+			payload["title"] += f" {UNKNOWN_TITLE}"
+		return payload
+
+	@staticmethod
+	def track_payload(track_id: int) -> dict[str, Any]:
+		return {
+			"id": track_id,
+			"type": "track",
+			"title": f"Title {track_id}",
+			"readable": True,
+			"duration": 180,
+			"rank": 1,
+			"explicit_lyrics": False,
+			"artist": {"id": 1, "type": "artist", "name": "Artist"},
+			"album": {"id": 1, "type": "album", "title": "Album", "cover_xl": ""},
+		}
@@ -0,0 +1,186 @@
+import asyncio
+from typing import Any
+
+from aiohttp import web
+
+
+class FakeSpotifyApi:
+	"""
+	Local stand-in for api.spotify.com, serving tiny JSON payloads.
+	"""
+
+	def __init__(
+		self,
+		latency: float = 0,
+		playlist_size: int = 250,
+		page_size: int = 100,
+		album_size: int = 20,
+	):
+		self.latency = latency
+		self.playlist_size = playlist_size
+		self.album_size = album_size
+		self.page_size = page_size
+		# Number of next requests answered with a 429
+		self.throttle = 0
+		self.retry_after = "0.05"
+		self.throttled = 0
+		self.requests = 0
+		# Token given by the accounts service, expected by the API when set
+		self.token_expires_in = 3600
+		self.token_latency = 0.0
+		self.tokens = 0
+		self.authorizations: list[str] = []
+		self.connections: set[Any] = set()
+		self.in_flight = 0
+		self.max_in_flight = 0
+		self.app = web.Application()
+		self.app.router.add_get("/v1/playlists/{id}/tracks", self._playlist_tracks)
+		self.app.router.add_get("/v1/albums/{id}/tracks/", self._album_tracks)
+		self.app.router.add_get("/v1/albums", self._albums)
+		self.app.router.add_get("/v1/tracks/{id}", self._track)
+		self.app.router.add_get("/v1/tracks", self._tracks)
+		self.app.router.add_get("/v1/search", self._search)
+		self.app.router.add_post("/api/token", self._token)
+		self.runner: web.AppRunner | None = None
+		self.base_url = ""
+
+	async def start(self) -> str:
+		self.runner = web.AppRunner(self.app)
+		await self.runner.setup()
+		site = web.TCPSite(self.runner, "127.0.0.1", 0)
+		await site.start()
+		port = site._server.sockets[0].getsockname()[1]  # type: ignore
+		self.base_url = f"http://127.0.0.1:{port}"
+		return self.base_url
+
+	async def stop(self):
+		if self.runner is not None:
+			await self.runner.cleanup()
+
+	async def _token(self, request: web.Request):
+		data = await request.post()
+		if data.get("grant_type") != "client_credentials" or not request.headers.get(
+			"Authorization", ""
+		).startswith("Basic "):
+			return web.json_response({"error": "invalid_client"}, status=400)
+		if self.token_latency:
+			await asyncio.sleep(self.token_latency)
+		self.tokens += 1
+		return web.json_response(
+			{
+				"access_token": f"token{self.tokens}",
+				"token_type": "Bearer",
+				"expires_in": self.token_expires_in,
+			}
+		)
+
+	async def _count(self, request: web.Request) -> web.Response | None:
+		self.requests += 1
+		self.authorizations.append(request.headers.get("Authorization", ""))
+		if request.transport is not None:
+			self.connections.add(request.transport.get_extra_info("peername"))
+		self.in_flight += 1
+		self.max_in_flight = max(self.max_in_flight, self.in_flight)
+		try:
+			if self.latency:
+				await asyncio.sleep(self.latency)
+		finally:
+			self.in_flight -= 1
+		if self.throttle > 0:
+			self.throttle -= 1
+			self.throttled += 1
+			return web.json_response(
+				{"error": {"status": 429, "message": "API rate limit exceeded"}},
+				status=429,
+				headers={"Retry-After": self.retry_after},
+			)
+		return None
+
+	def _page(
+		self, request: web.Request, items: list[dict[str, Any]], total: int
+	) -> dict[str, Any]:
+		offset = int(request.query.get("offset", 0))
+		limit = int(request.query.get("limit", self.page_size))
+		end = min(offset + limit, total)
+		query = {k: v for k, v in request.query.items() if k not in ("offset", "limit")}
+		base = f"{self.base_url}{request.path}?" + "".join(f"{k}={v}&" for k, v in query.items())
+		return {
+			"href": f"{base}offset={offset}&limit={limit}",
+			"items": items[offset:end],
+			"limit": limit,
+			"offset": offset,
+			"total": total,
+			"next": f"{base}offset={end}&limit={limit}" if end < total else None,
+			"previous": None,
+		}
+
+	async def _playlist_tracks(self, request: web.Request):
+		throttled = await self._count(request)
+		if throttled is not None:
+			return throttled
+		items = [{"track": self.track_payload(str(i))} for i in range(self.playlist_size)]
+		return web.json_response(self._page(request, items, self.playlist_size))
+
+	async def _album_tracks(self, request: web.Request):
+		throttled = await self._count(request)
+		if throttled is not None:
+			return throttled
+		# The tracks of an album are simplified, without album nor external ids
+		items = []
+		for i in range(self.album_size):
+			track = self.track_payload(str(i))
+			del track["album"]
+			del track["external_ids"]
+			items.append(track)
+		return web.json_response(self._page(request, items, self.album_size))
+
+	async def _albums(self, request: web.Request):
+		throttled = await self._count(request)
+		if throttled is not None:
+			return throttled
+		ids = request.query["ids"].split(",")
+		return web.json_response({"albums": [self.album_payload(id) for id in ids]})
+
+	async def _track(self, request: web.Request):
+		throttled = await self._count(request)
+		if throttled is not None:
+			return throttled
+		return web.json_response(self.track_payload(request.match_info["id"]))
+
+	async def _tracks(self, request: web.Request):
+		throttled = await self._count(request)
+		if throttled is not None:
+			return throttled
+		ids = request.query["ids"].split(",")
+		if len(ids) > 50:
+			return web.json_response(
+				{"error": {"status": 400, "message": "Too many ids"}}, status=400
+			)
+		tracks = [None if id.startswith("unknown") else self.track_payload(id) for id in ids]
+		return web.json_response({"tracks": tracks})
+
+	async def _search(self, request: web.Request):
+		throttled = await self._count(request)
+		if throttled is not None:
+			return throttled
+		items = [self.track_payload(str(i)) for i in range(self.playlist_size)]
+		return web.json_response({"tracks": self._page(request, items, self.playlist_size)})
+
+	@staticmethod
+	def track_payload(track_id: str) -> dict[str, Any]:
+		return {
+			"id": track_id,
+			"name": f"Title {track_id}",
+			"artists": [{"name": "Artist"}],
+			"album": {"name": "Album", "images": []},
+			"disc_number": 1,
+			"track_number": 1,
+			"explicit": False,
+			"duration_ms": 180000,
+			"external_ids": {"isrc": f"FR{track_id}"},
+			"is_local": False,
+		}
+
+	@staticmethod
+	def album_payload(album_id: str) -> dict[str, Any]:
+		return {"id": album_id, "name": f"Album {album_id}", "images": [], "total_tracks": 0}
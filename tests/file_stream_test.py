@@ -0,0 +1,71 @@
+import asyncio
+import os
+import tempfile
+import unittest
+
+from pyramid.tools.file_stream import FileStream
+
+
+class FileStreamTest(unittest.IsolatedAsyncioTestCase):
+	def setUp(self):
+		fd, self.path = tempfile.mkstemp()
+		os.close(fd)
+
+	def tearDown(self):
+		if os.path.exists(self.path):
+			os.remove(self.path)
+
+	async def _write(self, stream: FileStream, chunks: list[bytes], success=True):
+		written = 0
+		with await asyncio.to_thread(open, self.path, "wb") as f:
+			for chunk in chunks:
+				await asyncio.sleep(0.01)
+				f.write(chunk)
+				f.flush()
+				written += len(chunk)
+				stream.update(written)
+		stream.finish(success)
+
+	async def test_read_while_writing(self):
+		chunks = [bytes([i]) * 1000 for i in range(20)]
+		stream = FileStream(self.path)
+		writer = asyncio.create_task(self._write(stream, chunks))
+
+		self.assertTrue(await stream.wait_for(3000))
+		self.assertFalse(stream.finished)
+
+		def read_all() -> bytes:
+			reader = stream.open()
+			data = b""
+			while True:
+				chunk = reader.read(512)
+				if not chunk:
+					return data
+				data += chunk
+
+		data = await asyncio.to_thread(read_all)
+		await writer
+		self.assertEqual(data, b"".join(chunks))
+
+	async def test_failed_writer(self):
+		stream = FileStream(self.path)
+		writer = asyncio.create_task(self._write(stream, [b"a" * 100], success=False))
+
+		self.assertFalse(await stream.wait_for(1000))
+		await writer
+		self.assertEqual(stream.open().read(), b"a" * 100)
+
+	async def test_done_callback(self):
+		stream = FileStream(self.path)
+		done: list[bool] = []
+		stream.add_done_callback(lambda s: done.append(s.success))
+		stream.update(10)
+		self.assertEqual(done, [])
+
+		stream.finish(True)
+		stream.add_done_callback(lambda s: done.append(s.success))
+		self.assertEqual(done, [True, True])
+
+
+if __name__ == "__main__":
+	unittest.main(failfast=True)
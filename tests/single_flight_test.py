@@ -0,0 +1,100 @@
+import asyncio
+import unittest
+
+from fake_deezer_api import FakeDeezerApi
+
+from pyramid.connector.deezer.cli_deezer import CliDeezer
+from pyramid.tools.single_flight import SingleFlight
+
+
+class SingleFlightTest(unittest.IsolatedAsyncioTestCase):
+	async def test_shared(self):
+		flight = SingleFlight()
+		calls = 0
+
+		async def call() -> int:
+			nonlocal calls
+			calls += 1
+			await asyncio.sleep(0.01)
+			return calls
+
+		results = await asyncio.gather(
+			*(flight.run("a", call) for _ in range(5)), flight.run("b", call)
+		)
+		self.assertEqual(results[:5], [results[0]] * 5)
+		self.assertEqual(calls, 2)
+		self.assertEqual((flight.calls, flight.shared), (2, 4))
+
+		# Once finished, the call runs again
+		await flight.run("a", call)
+		self.assertEqual(calls, 3)
+		self.assertEqual(flight.running(), 0)
+
+	async def test_error_shared(self):
+		flight = SingleFlight()
+
+		async def call():
+			await asyncio.sleep(0.01)
+			raise ValueError("failed")
+
+		results = await asyncio.gather(
+			*(flight.run("a", call) for _ in range(3)), return_exceptions=True
+		)
+		self.assertTrue(all(isinstance(r, ValueError) for r in results))
+
+	async def test_cancelled_caller(self):
+		flight = SingleFlight()
+
+		async def call() -> str:
+			await asyncio.sleep(0.02)
+			return "done"
+
+		first = asyncio.create_task(flight.run("a", call))
+		second = asyncio.create_task(flight.run("a", call))
+		await asyncio.sleep(0)
+		first.cancel()
+		# The other caller still gets the result
+		self.assertEqual(await second, "done")
+
+	async def test_abandoned_call_cancelled(self):
+		flight = SingleFlight(cancel_abandoned=True)
+		cancelled = asyncio.Event()
+
+		async def call():
+			try:
+				await asyncio.sleep(1)
+			except asyncio.CancelledError:
+				cancelled.set()
+				raise
+
+		callers = [asyncio.create_task(flight.run("a", call)) for _ in range(2)]
+		await asyncio.sleep(0)
+		callers[0].cancel()
+		await asyncio.sleep(0)
+		self.assertFalse(cancelled.is_set())
+
+		callers[1].cancel()
+		await asyncio.wait_for(cancelled.wait(), 1)
+		self.assertEqual(flight.running(), 0)
+
+
+class CliDeezerSingleFlightTest(unittest.IsolatedAsyncioTestCase):
+	async def asyncSetUp(self):
+		self.api = FakeDeezerApi(latency=0.02)
+		self.cli = CliDeezer()
+		self.cli.base_url = await self.api.start()
+
+	async def asyncTearDown(self):
+		await self.cli.close()
+		await self.api.stop()
+
+	async def test_identical_requests(self):
+		tracks = await asyncio.gather(*(self.cli.async_get_track(1) for _ in range(10)))
+		self.assertEqual(self.api.requests, 1)
+		# Each caller parses its own objects
+		self.assertEqual(len({id(t) for t in tracks}), 10)
+		self.assertEqual(self.cli.in_flight.shared, 9)
+
+
+if __name__ == "__main__":
+	unittest.main(failfast=True)
@@ -0,0 +1,63 @@
+import asyncio
+import unittest
+
+from fake_spotify_api import FakeSpotifyApi
+
+from pyramid.connector.spotify.search import SpotifySearch
+
+
+class CliSpotifyTokenTest(unittest.IsolatedAsyncioTestCase):
+	async def asyncSetUp(self):
+		self.api = FakeSpotifyApi(latency=0.01)
+		base_url = await self.api.start()
+		self.search = SpotifySearch(100, "id", "secret")
+		self.search.client.prefix = f"{base_url}/v1/"
+		credentials = self.search.client.async_credentials
+		assert credentials is not None
+		credentials.token_url = f"{base_url}/api/token"
+		self.credentials = credentials
+
+	async def asyncTearDown(self):
+		await self.search.close()
+		await self.api.stop()
+
+	async def test_token_shared(self):
+		self.api.token_latency = 0.05
+		await asyncio.gather(*(self.search.get_track_by_id(str(i)) for i in range(10)))
+
+		self.assertEqual(self.api.tokens, 1)
+		self.assertEqual(self.api.authorizations, ["Bearer token1"] * 10)
+		self.assertEqual(self.credentials.stats.refreshes, 1)
+
+	async def test_token_refreshed_before_expiration(self):
+		self.api.token_expires_in = 60
+		self.credentials.refresh_margin = 59
+		await self.search.get_track_by_id("1")
+		await asyncio.sleep(1.1)
+
+		# The current token is still used while the next one is requested
+		await self.search.get_track_by_id("2")
+		self.assertEqual(self.api.authorizations, ["Bearer token1", "Bearer token1"])
+		await asyncio.sleep(0.05)
+		await self.search.get_track_by_id("3")
+		self.assertEqual(self.api.authorizations[-1], "Bearer token2")
+		self.assertEqual(self.credentials.stats.waits, 1)
+
+	async def test_identical_requests_shared(self):
+		await asyncio.gather(*(self.search.get_track_by_id("1") for _ in range(5)))
+		self.assertEqual(self.api.requests, 1)
+		self.assertEqual(self.search.client.in_flight.shared, 4)
+
+	async def test_session_reused(self):
+		for i in range(5):
+			await self.search.get_track_by_id(str(i))
+		self.assertEqual(len(self.api.connections), 1)
+
+		stats = self.search.client.async_session.stats["127.0.0.1"]
+		# The token and the tracks
+		self.assertEqual(stats.requests, 6)
+		self.assertEqual(stats.connections_created, 1)
+
+
+if __name__ == "__main__":
+	unittest.main(failfast=True)
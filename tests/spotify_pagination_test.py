@@ -0,0 +1,107 @@
+import time
+import unittest
+
+from benchmark import benchmark, logger
+from fake_spotify_api import FakeSpotifyApi
+from spotipy.exceptions import SpotifyException
+
+from pyramid.connector.spotify.cli_spotify import CliSpotify
+from pyramid.connector.spotify.search import SpotifySearch
+
+PLAYLIST_SIZE = 1000
+LATENCY = 0.05
+MAX_PAGES_IN_FLIGHT = 4
+
+
+class SpotifyPaginationTest(unittest.IsolatedAsyncioTestCase):
+	async def asyncSetUp(self):
+		self.api = FakeSpotifyApi(latency=LATENCY, playlist_size=PLAYLIST_SIZE)
+		base_url = await self.api.start()
+		self.search = self._search(MAX_PAGES_IN_FLIGHT, base_url)
+
+	async def asyncTearDown(self):
+		await self.search.close()
+		await self.api.stop()
+
+	@staticmethod
+	def _search(max_pages_in_flight: int, base_url: str) -> SpotifySearch:
+		search = SpotifySearch(100, "id", "secret", max_pages_in_flight)
+		# A static token, no request is sent to the accounts service
+		search.client = CliSpotify(auth="token")
+		search.client.prefix = f"{base_url}/v1/"
+		return search
+
+	async def test_order_and_in_flight(self):
+		result = await self.search.get_playlist_tracks_by_id("playlist")
+		assert result is not None
+		self.assertEqual([t.id for t in result[0]], [str(i) for i in range(PLAYLIST_SIZE)])
+		self.assertEqual(self.api.requests, PLAYLIST_SIZE // self.api.page_size)
+		self.assertEqual(self.api.max_in_flight, MAX_PAGES_IN_FLIGHT)
+
+	async def test_search_limit(self):
+		tracks = await self.search.search_tracks("Title", 75)
+		assert tracks is not None
+		self.assertEqual([t.id for t in tracks], [str(i) for i in range(75)])
+		self.assertEqual(self.api.requests, 2)
+
+	async def test_retry_after(self):
+		self.api.throttle = 3
+		result = await self.search.get_playlist_tracks_by_id("playlist")
+		assert result is not None
+		self.assertEqual(len(result[0]), PLAYLIST_SIZE)
+		self.assertEqual(self.api.throttled, 3)
+
+	async def test_retry_after_too_long(self):
+		self.api.throttle = 1
+		self.api.retry_after = "3600"
+		with self.assertRaises(SpotifyException) as context:
+			await self.search.get_playlist_tracks_by_id("playlist")
+		self.assertEqual(context.exception.http_status, 429)
+
+	async def test_album_batch(self):
+		result = await self.search.get_album_tracks_by_id("album")
+		assert result is not None
+		tracks, unfindable = result
+		self.assertEqual([t.id for t in tracks], [str(i) for i in range(self.api.album_size)])
+		self.assertEqual(tracks[0].isrc, "FR0")
+		self.assertEqual(unfindable, [])
+		# The album tracks, then the full tracks at once
+		self.assertEqual(self.api.requests, 2)
+
+	async def test_several_tracks(self):
+		ids = [str(i) for i in range(120)]
+		ids[60] = "unknown"
+		tracks = await self.search.client.async_tracks(ids)
+		self.assertEqual([t["id"] if t else None for t in tracks], ids[:60] + [None] + ids[61:])
+		self.assertEqual(self.api.requests, 3)
+
+		albums = await self.search.client.async_albums(["a", "b"])
+		self.assertEqual([a["name"] for a in albums if a], ["Album a", "Album b"])
+
+	@benchmark
+	async def test_benchmark(self):
+		serial = self._search(1, self.api.base_url)
+		start = time.perf_counter()
+		reference = await serial.get_playlist_tracks_by_id("playlist")
+		duration_serial = time.perf_counter() - start
+		await serial.close()
+
+		start = time.perf_counter()
+		result = await self.search.get_playlist_tracks_by_id("playlist")
+		duration = time.perf_counter() - start
+
+		assert reference is not None and result is not None
+		logger.info(
+			"Spotify playlist of %d tracks (%d pages, %.0f ms each): sequential %.2fs, concurrent %.2fs",
+			PLAYLIST_SIZE,
+			PLAYLIST_SIZE // self.api.page_size,
+			LATENCY * 1000,
+			duration_serial,
+			duration,
+		)
+		self.assertEqual([t.id for t in result[0]], [t.id for t in reference[0]])
+		self.assertGreater(duration_serial, duration * 1.5)
+
+
+if __name__ == "__main__":
+	unittest.main(failfast=True)
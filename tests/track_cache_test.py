@@ -0,0 +1,186 @@
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from pyramid.connector.deezer.track_cache import TrackCache
+from pyramid.data.track import Track
+
+SIZE = 1000
+
+
+class TrackCacheTest(unittest.TestCase):
+	def setUp(self):
+		self.tmp = tempfile.TemporaryDirectory()
+		self.folder = self.tmp.name
+
+	def tearDown(self):
+		self.tmp.cleanup()
+
+	def _download(
+		self, cache: TrackCache, track_id: int, size: int = SIZE, track_info: dict | None = None
+	) -> str:
+		key = TrackCache.key(track_id, "MP3_128")
+		file_path = cache.path(key)
+		with open(file_path, "wb") as f:
+			f.write(b"\0" * size)
+		cache.add(key, file_path, track_info)
+		return key
+
+	def test_survives_restart(self):
+		cache = TrackCache(self.folder, SIZE * 10)
+		key = self._download(cache, 1)
+		self.assertIsNotNone(cache.get(key))
+
+		cache = TrackCache(self.folder, SIZE * 10)
+		self.assertEqual(cache.count(), 1)
+		self.assertEqual(cache.size, SIZE)
+		self.assertEqual(cache.get(key), cache.path(key))
+		self.assertIsNone(cache.get(TrackCache.key(1, "FLAC")))
+
+	def test_orphans_removed(self):
+		orphan = os.path.join(self.folder, "Artist - Title.mp3")
+		with open(orphan, "wb") as f:
+			f.write(b"\0")
+		open(os.path.join(self.folder, ".gitkeep"), "w").close()
+		open(os.path.join(self.folder, "equivalences.json"), "w").close()
+
+		TrackCache(self.folder, SIZE * 10)
+		self.assertFalse(os.path.exists(orphan))
+		self.assertTrue(os.path.exists(os.path.join(self.folder, ".gitkeep")))
+		self.assertTrue(os.path.exists(os.path.join(self.folder, "equivalences.json")))
+
+	def test_evict_least_recently_used(self):
+		cache = TrackCache(self.folder, SIZE * 3, min_age=0)
+		keys = [self._download(cache, i) for i in range(3)]
+		cache.get(keys[0])
+
+		new_key = self._download(cache, 3)
+		self.assertEqual(cache.count(), 3)
+		self.assertEqual(cache.size, SIZE * 3)
+		self.assertIsNone(cache.get(keys[1]))
+		self.assertFalse(os.path.exists(cache.path(keys[1])))
+		for key in (keys[0], keys[2], new_key):
+			self.assertIsNotNone(cache.get(key))
+
+	def test_evict_low_disk_space(self):
+		cache = TrackCache(self.folder, SIZE * 10, min_age=0)
+		keys = [self._download(cache, i) for i in range(3)]
+
+		with patch("pyramid.tools.utils.get_available_space", return_value=0) as available_space:
+			self._download(cache, 3)
+		# The track just downloaded is kept
+		self.assertEqual(cache.count(), 1)
+		self.assertTrue(all(cache.get(key) is None for key in keys))
+		self.assertEqual(available_space.call_count, 1)
+
+	def test_recent_tracks_kept(self):
+		cache = TrackCache(self.folder, SIZE * 2, min_age=60)
+		keys = [self._download(cache, i) for i in range(3)]
+		# Queued or playing, they are kept over the budget
+		self.assertEqual(cache.count(), 3)
+
+		cache.min_age = 0
+		cache.evict()
+		self.assertEqual(cache.count(), 2)
+		self.assertIsNone(cache.get(keys[0]))
+
+	def test_track_info(self):
+		track_info = {
+			"SNG_ID": "1",
+			"SNG_TITLE": "Title",
+			"ART_NAME": "Artist",
+			"ART_PICTURE": "art",
+			"ARTISTS": [{"ART_NAME": "Artist", "ART_ID": "1"}, {"ART_NAME": "Featuring"}],
+			"ALB_TITLE": "Album",
+			"ALB_PICTURE": "alb",
+			"DURATION": "180",
+			"FILESIZE": str(SIZE),
+			"PHYSICAL_RELEASE_DATE": "2020-01-31",
+			"MEDIA": [{"TYPE": "preview"}],
+		}
+		cache = TrackCache(self.folder, SIZE * 10)
+		key_without_info = self._download(cache, 2)
+		key = self._download(cache, 1, track_info=track_info)
+		self.assertIsNone(cache.get_track_info(key_without_info))
+
+		cache = TrackCache(self.folder, SIZE * 10)
+		cached = cache.get_track_info(key)
+		assert cached is not None
+		file_path, info = cached
+		self.assertNotIn("MEDIA", info)
+
+		track = Track(info, file_path)
+		self.assertEqual(track.file_local, cache.path(key))
+		self.assertEqual(track.authors, ["Artist", "Featuring"])
+		self.assertEqual(track.get_full_name(), "Artist - Title")
+		self.assertEqual(track.duration_seconds, 180)
+		self.assertIsNotNone(track.date)
+
+	def test_missing_file(self):
+		cache = TrackCache(self.folder, SIZE * 10)
+		key = self._download(cache, 1)
+		os.remove(cache.path(key))
+
+		self.assertIsNone(cache.get(key))
+		self.assertEqual(cache.size, 0)
+
+	def test_truncated_file_removed(self):
+		cache = TrackCache(self.folder, SIZE * 10)
+		key = self._download(cache, 1)
+		kept = self._download(cache, 2)
+		with open(cache.path(key), "r+b") as f:
+			f.truncate(SIZE // 2)
+
+		cache = TrackCache(self.folder, SIZE * 10)
+		self.assertIsNone(cache.get(key))
+		self.assertFalse(os.path.exists(cache.path(key)))
+		self.assertIsNotNone(cache.get(kept))
+		self.assertEqual(cache.size, SIZE)
+
+
+class TrackCacheSaveTest(unittest.IsolatedAsyncioTestCase):
+	def setUp(self):
+		self.tmp = tempfile.TemporaryDirectory()
+		self.folder = self.tmp.name
+
+	def tearDown(self):
+		self.tmp.cleanup()
+
+	_download = TrackCacheTest._download
+
+	def _indexed(self, cache: TrackCache) -> list[str]:
+		with open(cache.index_path, "r", encoding="utf-8") as f:
+			return sorted(json.load(f))
+
+	def _hits(self, cache: TrackCache, key: str) -> int:
+		with open(cache.index_path, "r", encoding="utf-8") as f:
+			return json.load(f)[key]["hits"]
+
+	async def test_save_delayed(self):
+		cache = TrackCache(self.folder, SIZE * 10, save_delay=0.05)
+		keys = [self._download(cache, i) for i in range(3)]
+		# A single save, once the downloads are done
+		self.assertEqual(self._indexed(cache), [])
+		await asyncio.sleep(0.2)
+		self.assertEqual(self._indexed(cache), sorted(keys))
+
+	async def test_hit_saved(self):
+		cache = TrackCache(self.folder, SIZE * 10, save_delay=0.05)
+		key = self._download(cache, 1)
+		cache.flush()
+		cache.get(key)
+		await asyncio.sleep(0.2)
+		self.assertEqual(self._hits(cache, key), 1)
+
+	async def test_flush(self):
+		cache = TrackCache(self.folder, SIZE * 10, save_delay=60)
+		key = self._download(cache, 1)
+		cache.flush()
+		self.assertEqual(self._indexed(cache), [key])
+
+
+if __name__ == "__main__":
+	unittest.main(failfast=True)
@@ -0,0 +1,176 @@
+import asyncio
+import os
+import tempfile
+import unittest
+
+from pyramid.data.functional.track_prefetcher import PrefetchProgress, TrackPrefetcher
+from pyramid.data.track import Track, TrackMinimal
+from pyramid.data.tracklist import TrackList
+from pyramid.tools.file_stream import FileStream
+
+
+class FakeTrackMinimal(TrackMinimal):
+	def __init__(self, id: int):
+		self.id = str(id)
+		self.author_name = "Artist"
+		self.author_picture = ""
+		self.name = f"Title {id}"
+		self.album_title = "Album"
+		self.album_picture = ""
+		self.duration = 180
+		self.available = True
+
+
+class FakeEngineSource:
+	def __init__(self, file_path: str):
+		self.file_path = file_path
+		self.downloads: list[tuple[str, bool]] = []
+		self.cancelled: list[str] = []
+		self.release = asyncio.Event()
+
+	async def download_track(self, track: TrackMinimal, stream: bool = False) -> Track | None:
+		self.downloads.append((track.id, stream))
+		try:
+			await self.release.wait()
+		except asyncio.CancelledError:
+			self.cancelled.append(track.id)
+			raise
+		data = {
+			"ART_NAME": track.author_name,
+			"ART_PICTURE": "",
+			"ARTISTS": [],
+			"SNG_TITLE": track.name,
+			"ALB_TITLE": track.album_title,
+			"ALB_PICTURE": "",
+			"DURATION": "180",
+			"FILESIZE": "0",
+			"PHYSICAL_RELEASE_DATE": "",
+		}
+		track = Track(data, self.file_path)
+		if stream:
+			track.stream = FileStream(self.file_path)
+		return track
+
+
+class TrackPrefetcherTest(unittest.IsolatedAsyncioTestCase):
+	async def asyncSetUp(self):
+		fd, self.path = tempfile.mkstemp()
+		os.close(fd)
+		self.engine = FakeEngineSource(self.path)
+		self.tl = TrackList()
+		self.prefetcher = TrackPrefetcher(
+			self.tl,
+			self.engine,  # type: ignore
+			asyncio.Semaphore(10),
+			2,
+		)
+		self.entries = [FakeTrackMinimal(i) for i in range(5)]
+		self.tl.add_pending_tracks(self.entries)
+
+	async def asyncTearDown(self):
+		self.prefetcher.close()
+		os.remove(self.path)
+
+	async def test_window(self):
+		self.prefetcher.refresh()
+		await asyncio.sleep(0)
+		self.assertEqual(self.engine.downloads, [("0", False), ("1", False), ("2", False)])
+
+		self.engine.release.set()
+		await asyncio.sleep(0.01)
+		self.assertEqual(self.tl.pending(5), self.entries[3:])
+		self.assertIsInstance(self.tl.first_song(), Track)
+
+		self.tl.remove_song()
+		self.prefetcher.refresh()
+		await asyncio.sleep(0.01)
+		self.assertEqual(self.tl.pending(5), self.entries[4:])
+
+	async def test_removed_entry_cancelled(self):
+		self.prefetcher.refresh()
+		await asyncio.sleep(0)
+
+		self.tl.remove(1)
+		self.prefetcher.refresh()
+		await asyncio.sleep(0)
+		self.assertEqual(self.engine.cancelled, ["1"])
+		self.assertEqual(self.engine.downloads[-1], ("3", False))
+
+	async def test_close(self):
+		self.prefetcher.refresh()
+		await asyncio.sleep(0)
+
+		self.prefetcher.close()
+		await asyncio.sleep(0)
+		self.assertEqual(self.engine.cancelled, ["0", "1", "2"])
+
+	async def test_same_track_downloaded_once(self):
+		tl = TrackList()
+		prefetcher = TrackPrefetcher(tl, self.engine, asyncio.Semaphore(10), 2)  # type: ignore
+		self.addCleanup(prefetcher.close)
+		# The same track, found twice by different searches
+		entries = [FakeTrackMinimal(1), FakeTrackMinimal(1)]
+		tl.add_pending_tracks(entries)
+		prefetcher.refresh()
+		self.engine.release.set()
+		await asyncio.sleep(0.01)
+
+		self.assertEqual(self.engine.downloads, [("1", False)])
+		self.assertEqual(tl.pending(2), [])
+
+	async def test_done_tasks_dropped(self):
+		self.engine.release.set()
+		self.prefetcher.refresh()
+		await asyncio.sleep(0.01)
+		self.assertEqual(self.prefetcher._TrackPrefetcher__tasks, {})  # type: ignore
+
+	async def test_progress(self):
+		updates: list[tuple[int, int]] = []
+		progress = PrefetchProgress(lambda p: updates.append((p.downloaded, p.total)))
+		progress.add(self.entries[1:3])
+		self.prefetcher.watch(progress)
+		self.prefetcher.refresh()
+		self.engine.release.set()
+		await asyncio.sleep(0.01)
+
+		# Only the entries of the progress are reported
+		self.assertEqual(updates, [(1, 2), (2, 2)])
+		self.assertFalse(progress.is_pending())
+
+	async def test_get_streams_first(self):
+		self.engine.release.set()
+		track = await self.prefetcher.get(self.entries[0])
+
+		self.assertIsNotNone(track)
+		self.assertEqual(self.engine.downloads, [("0", True)])
+		self.assertIs(self.tl.first_song(), track)
+
+	async def test_limit_held_while_streaming(self):
+		limit = asyncio.Semaphore(1)
+		prefetcher = TrackPrefetcher(self.tl, self.engine, limit, 2)  # type: ignore
+		self.addCleanup(prefetcher.close)
+		self.engine.release.set()
+		track = await prefetcher.get(self.entries[0])
+
+		assert track is not None and track.stream is not None
+		self.assertTrue(limit.locked())
+		track.stream.finish(True)
+		self.assertFalse(limit.locked())
+
+	async def test_added_after_current(self):
+		self.tl.add_pending_tracks([FakeTrackMinimal(10), FakeTrackMinimal(11)], at_end=False)
+		self.prefetcher.refresh()
+		await asyncio.sleep(0)
+		self.assertEqual(self.engine.downloads, [("0", False), ("10", False), ("11", False)])
+
+	async def test_pages_added_after_current(self):
+		first_page = [FakeTrackMinimal(10), FakeTrackMinimal(11)]
+		self.tl.add_pending_tracks(first_page, at_end=False)
+		self.tl.add_pending_tracks([FakeTrackMinimal(12)], at_end=False, after=first_page[-1])
+		self.assertEqual(
+			[t.id for t in self.tl.pending(10)], ["0", "10", "11", "12", "1", "2", "3", "4"]
+		)
+
+
+if __name__ == "__main__":
+	unittest.main(failfast=True)